@@ -0,0 +1,4 @@
+#!/bin/bash
+# Allows the streaming replication connections of the db-replica service
+set -e
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
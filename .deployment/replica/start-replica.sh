@@ -0,0 +1,14 @@
+#!/bin/bash
+# Clones the primary on the first start and follows it as a hot standby
+set -e
+
+if [ ! -s "$PGDATA/PG_VERSION" ]; then
+    until pg_basebackup -h db -U postgres -D "$PGDATA" -R -X stream; do
+        echo "Waiting for the primary"
+        sleep 2
+    done
+
+    chmod 700 "$PGDATA"
+fi
+
+exec postgres
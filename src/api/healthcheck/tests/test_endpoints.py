@@ -23,3 +23,10 @@ class TestHelathcheckEndpoints(unittest.TestCase):
         self.assertListEqual(list(body.keys()), expected_keys)
         self.assertEqual(body.get("detail"), settings.PROJECT_NAME)
         self.assertEqual(body.get("version"), settings.VERSION)
+
+    def test_healthcheck_trailing_slash(self):
+        url = "/health-check/?verbose=true"
+        response = self.client.get(url, follow_redirects=False)
+
+        self.assertEqual(response.status_code, status.HTTP_308_PERMANENT_REDIRECT)
+        self.assertEqual(response.headers["location"], "http://testserver/health-check?verbose=true")
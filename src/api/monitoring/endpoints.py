@@ -0,0 +1,43 @@
+from fastapi import APIRouter, status
+from fastapi.responses import PlainTextResponse
+
+from core.cache import cache
+from core.metrics import CONTENT_TYPE, registry
+from core.utils.responses import EnvelopeResponse
+from db.pool import pool_status
+from db.session import async_engine, engine, replicas
+
+router = APIRouter(prefix="/monitoring", tags=["Monitoring"])
+
+
+@router.get(
+    "/cache", status_code=status.HTTP_200_OK, summary="Retrieve cache counters", response_model=EnvelopeResponse
+)
+async def cache_stats() -> EnvelopeResponse:
+    return EnvelopeResponse(errors=None, body=cache.stats())
+
+
+@router.get(
+    "/pool", status_code=status.HTTP_200_OK, summary="Retrieve connection pool status", response_model=EnvelopeResponse
+)
+async def pool_stats() -> EnvelopeResponse:
+    # The async engine serves the API, the sync one the imports and the schema management
+    result = {"async": pool_status(async_engine.sync_engine), "sync": pool_status(engine)}
+    return EnvelopeResponse(errors=None, body=result)
+
+
+@router.get(
+    "/replicas",
+    status_code=status.HTTP_200_OK,
+    summary="Retrieve read replicas health",
+    response_model=EnvelopeResponse,
+)
+async def replicas_stats() -> EnvelopeResponse:
+    return EnvelopeResponse(errors=None, body=replicas.status())
+
+
+@router.get(
+    "/metrics", status_code=status.HTTP_200_OK, summary="Retrieve Prometheus metrics", response_class=PlainTextResponse
+)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.render(), media_type=CONTENT_TYPE)
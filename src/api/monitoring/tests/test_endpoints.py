@@ -0,0 +1,49 @@
+import unittest
+
+from fastapi import status
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+class TestMonitoringEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = TestClient(app)
+
+    def test_cache_stats(self):
+        url = "/monitoring/cache"
+        response = self.client.get(url)
+
+        body = response.json().get("body")
+        expected_keys = ["backend", "hits", "misses", "writes", "invalidations", "evictions", "entries", "hit_ratio"]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(list(body.keys()), expected_keys)
+        self.assertEqual(body.get("backend"), "memory")
+
+    def test_pool_stats(self):
+        url = "/monitoring/pool"
+        response = self.client.get(url)
+
+        body = response.json().get("body")
+        expected_keys = ["pool", "size", "checked_in", "checked_out", "overflow", "metrics"]
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(list(body.keys()), ["async", "sync"])
+        self.assertListEqual(list(body.get("sync").keys()), expected_keys)
+        self.assertEqual(body.get("sync").get("pool"), "InstrumentedQueuePool")
+
+    def test_metrics(self):
+        self.client.get("/v1/customers/retrieve/1")
+
+        url = "/monitoring/metrics"
+        response = self.client.get(url)
+
+        expected_series = 'http_requests_total{method="GET",route="/v1/customers/retrieve/{id}",status="200"}'
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.headers["content-type"].startswith("text/plain; version=0.0.4"))
+        self.assertIn("# TYPE http_request_duration_seconds histogram", response.text)
+        self.assertIn(expected_series, response.text)
+        self.assertIn('db_queries_total{engine="async"}', response.text)
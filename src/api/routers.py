@@ -1,15 +1,25 @@
 from fastapi import APIRouter
 
 from api.healthcheck.endpoints import router as healthcheck_endpoints
+from api.monitoring.endpoints import router as monitoring_endpoints
 from api.v1.customers.endpoints import router as customer_endpoints
+from api.v1.imports.endpoints import router as imports_endpoints
+from api.v1.jobs.endpoints import router as jobs_endpoints
 from api.v1.loans.endpoints import router as loan_endpoints
 from api.v1.payments.endpoints import router as payments_endpoints
+from api.v1.reports.endpoints import router as reports_endpoints
 from core.settings import settings
 
 healthcheck_router = APIRouter()
 healthcheck_router.include_router(healthcheck_endpoints)
 
+monitoring_router = APIRouter()
+monitoring_router.include_router(monitoring_endpoints)
+
 api_v1_router = APIRouter(prefix=f"/{settings.API_V1}")
 api_v1_router.include_router(customer_endpoints)
 api_v1_router.include_router(loan_endpoints)
 api_v1_router.include_router(payments_endpoints)
+api_v1_router.include_router(imports_endpoints)
+api_v1_router.include_router(reports_endpoints)
+api_v1_router.include_router(jobs_endpoints)
@@ -1,25 +1,138 @@
-from fastapi import APIRouter, status, Response, Depends, HTTPException, Query
-from fastapi_pagination.ext.sqlalchemy import paginate
-from email_validator import validate_email, EmailNotValidError
-from sqlalchemy import select, func
-from sqlalchemy.orm import Session
-
+from typing import Literal
+
+from email_validator import EmailNotValidError, validate_email
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload, selectinload
+
+from api.v1.customers.schemas import (
+    CustomerFullSchema,
+    CustomerSchema,
+    CustomerSummarySchema,
+    LoanFullSchema,
+)
+from api.v1.payments.schemas import PaymentsSchema
+from core.cache import cache, cache_key
+from core.metrics.timing import serializing
+from core.settings import settings
+from core.utils.bulk import chunked, row_error
+from core.utils.conditional import (
+    CachedRecord,
+    fetch_record_validators,
+    is_conditional,
+    is_not_modified,
+    not_modified_response,
+    page_validators,
+    record_validators,
+    validators_query,
+)
 from core.utils.exceptions import *
-
-from api.v1.customers.schemas import CustomerSchema
-from core.utils.responses import PaginationParams, default_pagination_params, EnvelopeResponse
-from db.models import CustomerORM
-from db.session import get_session
+from core.utils.pagination import count_records, paginate
+from core.utils.responses import (
+    CursorParams,
+    EnvelopeJSONResponse,
+    EnvelopeResponse,
+    PaginationParams,
+    default_cursor_params,
+    default_pagination_params,
+)
+from db.exports import MEDIA_TYPES, ExportFormat, stream_export
+from db.models import CustomerORM, CustomerSummaryORM, LoanORM, PaymentsORM
+from db.search import apply_customer_search, order_by_relevance
+from db.session import bound_to_primary, get_read_session, get_session, reads_primary
 
 router = APIRouter(prefix="/customers", tags=["Customers"])
 
 
+def filtered_customers(filter: str, *, status: bool) -> Select:
+    customers = select(CustomerORM).order_by(CustomerORM.id).filter(CustomerORM.status == status)
+
+    if filter != "":
+        # Served by the trigram indexes of the customers table
+        customers = apply_customer_search(customers, filter)
+
+    return customers
+
+
+def customer_graph() -> Select:
+    """The function `customer_graph` selects customers with their loans and the
+    payments of every loan. The collections are loaded with one `SELECT ... IN`
+    per level, so the graph costs three queries whatever its fan-out, and only
+    the columns of the schemas are read.
+
+    Returns
+    -------
+        the select statement of the customers, lazy loads are forbidden.
+    """
+
+    return select(CustomerORM).options(
+        load_only(CustomerORM.id, CustomerORM.full_name, CustomerORM.email, CustomerORM.status),
+        selectinload(CustomerORM.loans)
+        .load_only(
+            LoanORM.id, LoanORM.customer_id, LoanORM.amount, LoanORM.issued, LoanORM.status, LoanORM.rate, LoanORM.term,
+            LoanORM.method, LoanORM.tax_rate, LoanORM.paid_total, LoanORM.outstanding
+        )
+        .selectinload(LoanORM.payments)
+        .load_only(PaymentsORM.id, PaymentsORM.loan_id, PaymentsORM.amount, PaymentsORM.issued, PaymentsORM.status),
+        raiseload("*"),
+    )
+
+
+def full_customer(customer: CustomerORM) -> CustomerFullSchema:
+    loans = [
+        LoanFullSchema(
+            id=loan.id, customer_id=loan.customer_id, amount=loan.amount, issued=loan.issued, status=loan.status,
+            rate=loan.rate, term=loan.term, method=loan.method, tax_rate=loan.tax_rate, paid_total=loan.paid_total,
+            outstanding=loan.outstanding,
+            payments=[
+                PaymentsSchema(
+                    id=payment.id, loan_id=payment.loan_id, amount=payment.amount, issued=payment.issued,
+                    status=payment.status
+                )
+                for payment in sorted(loan.payments, key=lambda payment: payment.id)
+            ]
+        )
+        for loan in sorted(customer.loans, key=lambda loan: loan.id)
+    ]
+
+    return CustomerFullSchema(
+        id=customer.id, full_name=customer.full_name, email=customer.email, status=customer.status, loans=loans
+    )
+
+
 @router.get("/retrieve/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def retrieve_customer(id: int = 0, db: Session = Depends(get_session)):
+async def retrieve_customer(
+        request: Request, id: int = 0, db: AsyncSession = Depends(get_read_session)
+    ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        customer = db.query(CustomerORM).filter(CustomerORM.id == id).first()
+        # Serve the record from the cache when possible, read-your-writes requests go to the primary
+        cached = None if reads_primary(request) else await cache.get(cache_key("customers", id))
+
+        if cached is not None:
+            entry = CachedRecord.model_validate_json(cached)
+
+            if is_not_modified(request, entry.validators):
+                return not_modified_response(entry.validators)
+
+            # The cached body is already in its JSON form
+            response.body = entry.body
+            return EnvelopeJSONResponse(response, headers=entry.validators.headers())
+
+        # Answer conditional requests from the id/modified index before loading the record
+        if is_conditional(request):
+            validators = await fetch_record_validators(db, CustomerORM, id)
+
+            if validators is not None and is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+        customer = await db.scalar(select(CustomerORM).filter(CustomerORM.id == id))
 
         if customer is None:
             raise Exception("Record not found")
@@ -28,44 +141,169 @@ async def retrieve_customer(id: int = 0, db: Session = Depends(get_session)):
             id=customer.id, full_name=customer.full_name, email=customer.email, status=customer.status
         )
 
+        validators = record_validators(customer)
+
+        # Keep the serialized record and its validators for the next lookups, replica rows may be stale
+        entry = CachedRecord(body=result.model_dump(mode="json"), validators=validators)
+        if bound_to_primary(db):
+            await cache.set(cache_key("customers", id), entry.model_dump_json())
+
+        headers = validators.headers()
         response.body = result
 
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
 
 
 @router.get("/list", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def list_customers(
-        filter: str = '', status: bool = Query(True), db: Session = Depends(get_session),
-        params: PaginationParams = Depends(default_pagination_params)
+async def list_customers(  # noqa: PLR0913
+        request: Request,
+        filter: str = "", status: bool = Query(True), db: AsyncSession = Depends(get_read_session),
+        sort: Literal["id", "relevance"] = Query("id", description="Order of the filtered records"),
+        params: PaginationParams = Depends(default_pagination_params),
+        cursor: CursorParams = Depends(default_cursor_params)
     ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        customers = db.query(CustomerORM).order_by(CustomerORM.id).filter(CustomerORM.status == status)
+        customers = filtered_customers(filter, status=status)
 
-        if filter != '':
-            customers = customers.filter(
-                CustomerORM.full_name.ilike(f'%{filter}%') | CustomerORM.email.ilike(f'%{filter}%')
-            )
+        if filter != "" and sort == "relevance":
+            if cursor.enabled:
+                raise Exception("Relevance sorting is not available with cursor pagination")
+
+            customers = order_by_relevance(customers, filter, CustomerORM.id)
+
+        # Counting is skipped unless the client asks for it, the probe and the page share the count
+        response.total = await count_records(db, customers, params.total)
+
+        # Answer conditional requests from the id/modified values of the page before loading the records
+        if is_conditional(request):
+            probe = validators_query(customers, CustomerORM)
+            validators = page_validators(*await paginate(db, probe, CustomerORM, params, cursor), response.total)
+
+            if is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+            # Drop the partially loaded records
+            db.expunge_all()
 
-        # Working but not receiving query params to alter amounts
-        records = paginate(customers, params=params)
+        items, response.next_cursor = await paginate(db, customers, CustomerORM, params, cursor)
+        headers = page_validators(items, response.next_cursor, response.total).headers()
 
         # Convert models to schemas
-        result = [CustomerSchema(**item.dict()) for item in records.items]
+        with serializing():
+            result = [CustomerSchema(**item.dict()) for item in items]
 
         response.body = result
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
+
+
+@router.get("/summary", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def bulk_customer_summary(
+        ids: list[int] = Query(..., max_length=500, description="Customer ids, repeated"),
+        db: AsyncSession = Depends(get_read_session)
+    ):
+    response = EnvelopeResponse()
+
+    try:
+        # Primary key lookups on the read model, the loans and payments are never aggregated
+        records = await db.scalars(select(CustomerSummaryORM).filter(CustomerSummaryORM.customer_id.in_(ids)))
+        summaries = {record.customer_id: record for record in records}
+
+        # Keep the requested order and report the unknown ids
+        response.body = [
+            CustomerSummarySchema.model_validate(summaries[id]) for id in dict.fromkeys(ids) if id in summaries
+        ]
+        missing = [row_error(index, "Record not found") for index, id in enumerate(ids) if id not in summaries]
+        response.errors = missing or None
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/{id}/summary", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def customer_summary(id: int, db: AsyncSession = Depends(get_read_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Primary key lookup on the read model, the loans and payments are never aggregated
+        record = await db.scalar(select(CustomerSummaryORM).filter(CustomerSummaryORM.customer_id == id))
+
+        if record is None:
+            raise Exception("Record not found")
+
+        response.body = CustomerSummarySchema.model_validate(record)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/full", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def bulk_full_customers(
+        ids: list[int] = Query(..., max_length=100, description="Customer ids, repeated"),
+        db: AsyncSession = Depends(get_read_session)
+    ):
+    response = EnvelopeResponse()
+
+    try:
+        # Same three queries for any amount of customers
+        records = await db.scalars(customer_graph().filter(CustomerORM.id.in_(ids)))
+        customers = {record.id: record for record in records}
+
+        # Keep the requested order and report the unknown ids
+        with serializing():
+            response.body = [full_customer(customers[id]) for id in dict.fromkeys(ids) if id in customers]
+        missing = [row_error(index, "Record not found") for index, id in enumerate(ids) if id not in customers]
+        response.errors = missing or None
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/{id}/full", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def full_customer_detail(id: int, db: AsyncSession = Depends(get_read_session)):
+    response = EnvelopeResponse()
+
+    try:
+        customer = await db.scalar(customer_graph().filter(CustomerORM.id == id))
+
+        if customer is None:
+            raise Exception("Record not found")
+
+        with serializing():
+            response.body = full_customer(customer)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_customers(
+        request: Request, filter: str = "", status: bool = Query(True),
+        format: ExportFormat = Query("csv", description="File format, csv or ndjson")
+    ):
+    return StreamingResponse(
+        stream_export(
+            filtered_customers(filter, status=status), CustomerSchema, format, primary=reads_primary(request)
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="customers.{format}"'},
+    )
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
-async def create_customer(customer: CustomerSchema, db: Session = Depends(get_session)):
+async def create_customer(customer: CustomerSchema, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
@@ -76,24 +314,24 @@ async def create_customer(customer: CustomerSchema, db: Session = Depends(get_se
         # Validate email format
         email = validate_email(customer.email, check_deliverability=False)
 
-        # Validate email unique record
-        validation = select(CustomerORM).filter(CustomerORM.email == email.normalized)
-        already_registered = db.execute(validation).first()
+        # Insert new record, the unique index on email rejects registered addresses
+        statement = (
+            insert(CustomerORM)
+            .values(full_name=customer.full_name, email=email.normalized)
+            .on_conflict_do_nothing(index_elements=[CustomerORM.email])
+            .returning(CustomerORM.id, CustomerORM.full_name, CustomerORM.email, CustomerORM.status)
+        )
+        new_record = (await db.execute(statement)).first()
 
-        if already_registered:
+        if new_record is None:
             raise Exception("Email already registered")
 
-        # Generate customer record
-        new_record = CustomerORM(full_name=customer.full_name, email=email.normalized)
+        await db.commit()
 
-        # Insert new record
-        db.add(new_record)
-        db.commit()
+        # Drop any cached copy of the record
+        await cache.delete(cache_key("customers", new_record.id))
 
-        # Recover new data
-        db.refresh(new_record)
-
-        # Convert from model to schema
+        # Convert from row to schema
         new_customer = CustomerSchema(
             id=new_record.id, full_name=new_record.full_name, email=new_record.email, status=new_record.status
         )
@@ -102,45 +340,126 @@ async def create_customer(customer: CustomerSchema, db: Session = Depends(get_se
     except EmailNotValidError:
         response.errors = "Invalid email address"
     except Exception as exc:
+        await db.rollback()
         response.errors = str(exc)
 
     return response
 
 
-@router.put("/update", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def update_customer(customer: CustomerSchema, db: Session = Depends(get_session)):
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
+async def bulk_create_customers(  # noqa: C901, PLR0912
+        customers: list[CustomerSchema], db: AsyncSession = Depends(get_session),
+        chunk_size: int = Query(settings.BULK_CHUNK_SIZE, ge=1, le=5000, description="Records per INSERT statement")
+    ):
     response = EnvelopeResponse()
 
     try:
-        # Validate record existence
-        record = db.query(CustomerORM).filter(CustomerORM.id == customer.id).first()
+        errors = []
+        valid = {}
+
+        # Validate every record in a single pass
+        for index, customer in enumerate(customers):
+            if customer.full_name is None or customer.email is None:
+                errors.append(row_error(index, "Missing parameter"))
+                continue
+
+            try:
+                email = validate_email(customer.email, check_deliverability=False).normalized
+            except EmailNotValidError:
+                errors.append(row_error(index, "Invalid email address"))
+                continue
+
+            if email in valid:
+                errors.append(row_error(index, "Email already registered"))
+                continue
+
+            valid[email] = (index, customer.full_name)
+
+        # Validate email unique records with set based queries
+        for emails in chunked(list(valid), chunk_size):
+            registered = await db.scalars(select(CustomerORM.email).filter(CustomerORM.email.in_(emails)))
+
+            for email in registered:
+                index, _ = valid.pop(email)
+                errors.append(row_error(index, "Email already registered"))
+
+        created = {}
+
+        # Insert new records with multi-row statements
+        for emails in chunked(list(valid), chunk_size):
+            statement = (
+                insert(CustomerORM)
+                .values([{"full_name": valid[email][1], "email": email} for email in emails])
+                .on_conflict_do_nothing(index_elements=[CustomerORM.email])
+                .returning(CustomerORM.id, CustomerORM.full_name, CustomerORM.email, CustomerORM.status)
+            )
 
-        if record is None:
-            raise Exception("Record not found")
+            for record in await db.execute(statement):
+                created[record.email] = CustomerSchema(
+                    id=record.id, full_name=record.full_name, email=record.email, status=record.status
+                )
 
-        # Validate email format
-        email = validate_email(customer.email, check_deliverability=False)
+        await db.commit()
 
-        # Validate email duplication
-        duplicated = db.query(func.count(CustomerORM.email)).filter(CustomerORM.email == email.normalized).scalar()
+        # Emails registered by a concurrent request after the validation
+        for email, (index, _) in valid.items():
+            if email not in created:
+                errors.append(row_error(index, "Email already registered"))
 
-        if duplicated > 1:
-            raise Exception("Email already registered")
+        response.body = [created[email] for email in valid if email in created]
+        response.errors = sorted(errors, key=lambda error: error["index"]) or None
+    except Exception as exc:
+        await db.rollback()
+        response.errors = str(exc)
+
+    return response
+
+
+@router.put("/update", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def update_customer(customer: CustomerSchema, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Validate record existence before the parameters, unknown ids are reported first
+        if await db.scalar(select(literal(1)).filter(CustomerORM.id == customer.id)) is None:
+            raise Exception("Record not found")
+
+        values = {}
 
         # Change customer data
         if customer.full_name is not None:
-            record.full_name = customer.full_name
+            values["full_name"] = customer.full_name
 
         if customer.email is not None:
-            record.email = email.normalized
+            # Validate email format
+            values["email"] = validate_email(customer.email, check_deliverability=False).normalized
 
-        # Update record on DB
-        db.commit()
+        if not values:
+            raise Exception("Missing parameter")
 
-        # Recover new data
-        db.refresh(record)
+        # Update record on DB, the unique index on email rejects registered addresses
+        statement = (
+            update(CustomerORM)
+            .filter(CustomerORM.id == customer.id)
+            .values(**values)
+            .returning(CustomerORM.id, CustomerORM.full_name, CustomerORM.email, CustomerORM.status)
+        )
 
-        # Convert from model to schema
+        try:
+            record = (await db.execute(statement)).first()
+        except IntegrityError:
+            raise Exception("Email already registered") from None
+
+        # The record may be deleted since the existence check
+        if record is None:
+            raise Exception("Record not found")
+
+        await db.commit()
+
+        # Drop the cached copy of the record
+        await cache.delete(cache_key("customers", record.id))
+
+        # Convert from row to schema
         updated_customer = CustomerSchema(
             id=record.id, full_name=record.full_name, email=record.email, status=record.status
         )
@@ -149,27 +468,37 @@ async def update_customer(customer: CustomerSchema, db: Session = Depends(get_se
     except EmailNotValidError:
         response.errors = "Invalid email address"
     except Exception as exc:
+        await db.rollback()
         response.errors = str(exc)
 
     return response
 
 
 @router.delete("/delete/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def delete_customer(id: int, db: Session = Depends(get_session)):
+async def delete_customer(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
-        # Validate record existence
-        record = db.query(CustomerORM).filter(CustomerORM.id == id).first()
+        # The record may be deleted since the existence check
+        record = await db.scalar(select(CustomerORM).filter(CustomerORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
 
+        # Loans and payments removed by the cascade
+        loan_ids = (await db.scalars(select(LoanORM.id).filter(LoanORM.customer_id == id))).all()
+        payment_ids = await db.scalars(select(PaymentsORM.id).filter(PaymentsORM.loan_id.in_(loan_ids)))
+        cascaded = [cache_key("loans", loan_id) for loan_id in loan_ids]
+        cascaded += [cache_key("payments", payment_id) for payment_id in payment_ids]
+
         # Physical deletion
-        db.delete(record)
+        await db.delete(record)
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copies of the record and of the ones removed by the cascade
+        await cache.delete(cache_key("customers", record.id), *cascaded)
 
         # Convert from model to schema
         deleted_customer = CustomerSchema(
@@ -180,18 +509,18 @@ async def delete_customer(id: int, db: Session = Depends(get_session)):
     except Exception as exc:
         response.errors = str(exc)
     finally:
-        db.close()
+        await db.close()
 
     return response
 
 
 @router.delete("/disable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def disable_customer(id: int, db: Session = Depends(get_session)):
+async def disable_customer(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
-        # Validate record existence
-        record = db.query(CustomerORM).filter(CustomerORM.id == id).first()
+        # The record may be deleted since the existence check
+        record = await db.scalar(select(CustomerORM).filter(CustomerORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -200,10 +529,13 @@ async def disable_customer(id: int, db: Session = Depends(get_session)):
         record.status = False
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copy of the record
+        await cache.delete(cache_key("customers", record.id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         disabled_customer = CustomerSchema(
@@ -218,12 +550,12 @@ async def disable_customer(id: int, db: Session = Depends(get_session)):
 
 
 @router.patch("/enable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def enable_customer(id: int, db: Session = Depends(get_session)):
+async def enable_customer(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
-        # Validate record existence
-        record = db.query(CustomerORM).filter(CustomerORM.id == id).first()
+        # The record may be deleted since the existence check
+        record = await db.scalar(select(CustomerORM).filter(CustomerORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -232,10 +564,13 @@ async def enable_customer(id: int, db: Session = Depends(get_session)):
         record.status = True
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copy of the record
+        await cache.delete(cache_key("customers", record.id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         enabled_customer = CustomerSchema(
@@ -1,9 +1,31 @@
-from pydantic import BaseModel
 from typing import Optional
 
+from pydantic import BaseModel, ConfigDict
+
+from api.v1.loans.schemas import LoanSchema
+from api.v1.payments.schemas import PaymentsSchema
+
 
 class CustomerSchema(BaseModel):
     id: Optional[int] = None
     full_name: Optional[str] = None
     email: Optional[str] = None
     status: Optional[bool] = True
+
+
+class CustomerSummarySchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    customer_id: int
+    total_lent: float
+    total_paid: float
+    outstanding: float
+    active_loans: int
+
+
+class LoanFullSchema(LoanSchema):
+    payments: list[PaymentsSchema] = []  # noqa: RUF012
+
+
+class CustomerFullSchema(CustomerSchema):
+    loans: list[LoanFullSchema] = []  # noqa: RUF012
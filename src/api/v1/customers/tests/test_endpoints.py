@@ -1,16 +1,30 @@
+import json
 import unittest
 import os
 
 from fastapi import status
 from fastapi.testclient import TestClient
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy import event
 
-from core.settings import settings
-from main import app
-from db.utils import populate_db
 from db.models.base import Base
-from db.session import engine
+from db.session import async_engine, engine
+from db.utils import populate_db
+from main import app
+
+
+class QueryCounter:
+    def __init__(self) -> None:
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(async_engine.sync_engine, "before_cursor_execute", self.increment)
+        return self
+
+    def __exit__(self, *_args) -> None:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", self.increment)
+
+    def increment(self, *_args) -> None:
+        self.count += 1
 
 
 class TestCustomersEndpoints(unittest.TestCase):
@@ -106,4 +120,330 @@ class TestCustomersEndpoints(unittest.TestCase):
         self.assertEqual(body.get("id"), 2)
         self.assertEqual(body.get("full_name"), "Maria Rodriguez")
         self.assertEqual(body.get("email"), "maria@email.com")
-        self.assertEqual(body.get("status"), True)
\ No newline at end of file
+        self.assertEqual(body.get("status"), True)
+
+    def test_customer_list_cursor(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"page_size": 500})
+        expected_ids = [item.get("id") for item in response.json().get("body")]
+
+        ids = []
+        params = {"pagination": "cursor", "page_size": 3}
+
+        while True:
+            response = self.client.get(url, params=params)
+            data = response.json()
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertIsNone(data.get("errors"))
+            self.assertLessEqual(len(data.get("body")), 3)
+
+            ids.extend(item.get("id") for item in data.get("body"))
+
+            if data.get("next_cursor") is None:
+                break
+
+            params = {"cursor": data.get("next_cursor"), "page_size": 3}
+
+        self.assertListEqual(ids, expected_ids)
+
+    def test_customer_list_server_timing(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"page_size": 2, "total": "exact"})
+        phases = {metric.split(";")[0]: metric for metric in response.headers["server-timing"].split(", ")}
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertListEqual(list(phases.keys()), ["db", "serialize", "app", "total"])
+        # The page and the COUNT
+        self.assertIn('desc="2 queries"', phases.get("db"))
+
+    def test_customer_list_invalid_cursor(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"cursor": "not-a-cursor"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get("errors"), "Invalid cursor")
+        self.assertIsNone(response.json().get("body"))
+
+    def test_customer_list_total(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"page_size": 2})
+        self.assertIsNone(response.json().get("total"))
+
+        response = self.client.get(url, params={"page_size": 500})
+        expected_total = len(response.json().get("body"))
+
+        response = self.client.get(url, params={"page_size": 2, "total": "exact"})
+        self.assertEqual(response.json().get("total"), expected_total)
+        self.assertEqual(len(response.json().get("body")), 2)
+
+        response = self.client.get(url, params={"page_size": 2, "total": "estimate", "filter": "o'connor:%"})
+        self.assertIsNone(response.json().get("errors"))
+        self.assertIsInstance(response.json().get("total"), int)
+
+    def test_customer_list_search_relevance(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"filter": "laura", "sort": "relevance"})
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body[0].get("full_name"), "Laura Sanchez")
+
+        response = self.client.get(url, params={"filter": "%"})
+
+        self.assertListEqual(response.json().get("body"), [])
+
+    def test_customer_bulk_create(self):
+        url = "/v1/customers/bulk"
+
+        json_data = [
+            {"full_name": "Bulk One", "email": "bulk.one@email.com"},
+            {"full_name": "Registered", "email": "laura@email.com"},
+            {"full_name": "Invalid", "email": "not-an-email"},
+            {"full_name": "Bulk One Again", "email": "bulk.one@email.com"},
+            {"email": "missing.name@email.com"},
+            {"full_name": "Bulk Two", "email": "bulk.two@email.com"},
+        ]
+
+        response = self.client.post(url, json=json_data, params={"chunk_size": 1})
+
+        body = response.json().get("body")
+        errors = response.json().get("errors")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertListEqual([item.get("email") for item in body], ["bulk.one@email.com", "bulk.two@email.com"])
+        self.assertTrue(all(isinstance(item.get("id"), int) for item in body))
+        self.assertListEqual(
+            errors,
+            [
+                {"index": 1, "error": "Email already registered"},
+                {"index": 2, "error": "Invalid email address"},
+                {"index": 3, "error": "Email already registered"},
+                {"index": 4, "error": "Missing parameter"},
+            ],
+        )
+
+    def test_customer_export(self):
+        url = "/v1/customers/export"
+
+        response = self.client.get("/v1/customers/list", params={"page_size": 500, "filter": "email.com"})
+        expected = response.json().get("body")
+
+        response = self.client.get(url, params={"filter": "email.com"})
+        lines = response.text.splitlines()
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.headers["content-type"].startswith("text/csv"))
+        self.assertEqual(lines[0], "id,full_name,email,status")
+        self.assertEqual(len(lines) - 1, len(expected))
+
+        response = self.client.get(url, params={"filter": "email.com", "format": "ndjson"})
+        records = [json.loads(line) for line in response.text.splitlines()]
+
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        self.assertListEqual(records, expected)
+
+    def test_customer_retrieve_cache(self):
+        url = "/v1/customers/retrieve/8"
+
+        self.client.get(url)
+        hits = self.client.get("/monitoring/cache").json().get("body").get("hits")
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.json().get("body").get("full_name"), "Sofia Diaz")
+        self.assertEqual(self.client.get("/monitoring/cache").json().get("body").get("hits"), hits + 1)
+
+        # Writes drop the cached copy
+        self.client.delete("/v1/customers/disable/8")
+        response = self.client.get(url)
+
+        self.assertEqual(response.json().get("body").get("status"), False)
+
+        self.client.patch("/v1/customers/enable/8")
+        response = self.client.get(url)
+
+        self.assertEqual(response.json().get("body").get("status"), True)
+
+    def test_customer_retrieve_cache_read_primary(self):
+        url = "/v1/customers/retrieve/9"
+
+        self.client.get(url)
+        hits = self.client.get("/monitoring/cache").json().get("body").get("hits")
+
+        # Read-your-writes requests bypass the cache
+        response = self.client.get(url, headers={"x-read-primary": "1"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get("body").get("id"), 9)
+        self.assertEqual(self.client.get("/monitoring/cache").json().get("body").get("hits"), hits)
+
+    def test_customer_retrieve_conditional(self):
+        url = "/v1/customers/retrieve/7"
+
+        response = self.client.get(url)
+        etag = response.headers["etag"]
+
+        self.assertIn("last-modified", response.headers)
+
+        response = self.client.get(url, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(url, headers={"If-Modified-Since": response.headers["last-modified"]})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(url, headers={"If-None-Match": 'W/"7-0"'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get("body").get("id"), 7)
+
+    def test_customer_list_conditional(self):
+        url = "/v1/customers/list"
+
+        response = self.client.get(url, params={"page_size": 3})
+        etag = response.headers["etag"]
+
+        response = self.client.get(url, params={"page_size": 3}, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        # A different page has different validators
+        response = self.client.get(url, params={"page_size": 4}, headers={"If-None-Match": etag})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.json().get("body")), 4)
+
+    def test_customer_list_conditional_total(self):
+        url = "/v1/customers/list"
+        params = {"page_size": 4, "total": "exact"}
+
+        with QueryCounter() as unconditional:
+            expected = self.client.get(url, params=params).json()
+
+        # A missed conditional request adds the probe, not a second count
+        with QueryCounter() as conditional:
+            response = self.client.get(url, params=params, headers={"If-None-Match": 'W/"stale"'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json().get("total"), expected.get("total"))
+        self.assertEqual(conditional.count, unconditional.count + 1)
+
+    def test_customer_summary(self):
+        json_data = {"full_name": "Summary Test", "email": "summary@email.com"}
+        customer = self.client.post("/v1/customers/create", json=json_data)
+        customer_id = customer.json().get("body").get("id")
+        url = f"/v1/customers/{customer_id}/summary"
+
+        loan = self.client.post("/v1/loans/create", json={"customer_id": customer_id, "amount": 1000})
+        loan_id = loan.json().get("body").get("id")
+        other = self.client.post("/v1/loans/create", json={"customer_id": customer_id, "amount": 500})
+        other_id = other.json().get("body").get("id")
+        payment = self.client.post("/v1/payments/create", json={"loan_id": loan_id, "amount": 250})
+        paid = payment.json().get("body").get("amount")
+
+        response = self.client.get(url)
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body.get("total_lent"), 1500)
+        self.assertEqual(body.get("total_paid"), paid)
+        self.assertEqual(body.get("active_loans"), 2)
+
+        # The balances of the loans, their schedules minus the payments
+        loans = [self.client.get(f"/v1/loans/retrieve/{id_}").json().get("body") for id_ in (loan_id, other_id)]
+
+        self.assertEqual(body.get("outstanding"), round(sum(loan.get("outstanding") for loan in loans), 2))
+        self.assertGreater(body.get("outstanding"), 1500 - paid)
+
+        # Disabled loans and their payments leave the totals
+        self.client.delete(f"/v1/loans/disable/{loan_id}")
+        body = self.client.get(url).json().get("body")
+
+        self.assertEqual(body.get("outstanding"), loans[1].get("outstanding"))
+        self.assertEqual(body.get("active_loans"), 1)
+
+        response = self.client.get("/v1/customers/summary", params={"ids": [customer_id, 0]})
+
+        self.assertEqual([summary.get("customer_id") for summary in response.json().get("body")], [customer_id])
+        self.assertEqual(response.json().get("errors"), [{"index": 1, "error": "Record not found"}])
+
+    def test_customer_full(self):
+        url = "/v1/customers/3/full"
+
+        with QueryCounter() as queries:
+            response = self.client.get(url)
+
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(queries.count, 3)
+        self.assertEqual(body.get("id"), 3)
+        self.assertEqual(len(body.get("loans")), 3)
+        self.assertListEqual(
+            list(body.get("loans")[0].keys()),
+            [
+                "id", "customer_id", "amount", "issued", "status", "rate", "term", "method", "tax_rate", "paid_total",
+                "outstanding", "payments"
+            ],
+        )
+
+    def test_customer_full_bulk(self):
+        url = "/v1/customers/full"
+
+        with QueryCounter() as queries:
+            response = self.client.get(url, params={"ids": [2, 3, 4, 5, 6]})
+
+        body = response.json().get("body")
+
+        self.assertEqual(queries.count, 3)
+        self.assertListEqual([customer.get("id") for customer in body], [2, 3, 4, 5, 6])
+        self.assertTrue(
+            all(loan.get("customer_id") == customer.get("id") for customer in body for loan in customer.get("loans"))
+        )
+
+    def test_customer_create_duplicated(self):
+        url = "/v1/customers/create"
+
+        response = self.client.post(url, json={"full_name": "Luis M", "email": "luis@email.com"})
+
+        self.assertIsNone(response.json().get("body"))
+        self.assertEqual(response.json().get("errors"), "Email already registered")
+
+    def test_customer_update(self):
+        url = "/v1/customers/update"
+
+        response = self.client.put(url, json={"id": 4, "full_name": "Ana G. Garcia"})
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body.get("full_name"), "Ana G. Garcia")
+        self.assertEqual(body.get("email"), "ana@email.com")
+
+        response = self.client.put(url, json={"id": 4, "email": "pedro@email.com"})
+
+        self.assertEqual(response.json().get("errors"), "Email already registered")
+
+        response = self.client.put(url, json={"id": 0, "email": "nobody@email.com"})
+
+        self.assertEqual(response.json().get("errors"), "Record not found")
+
+        # Unknown ids are reported before the parameter errors
+        response = self.client.put(url, json={"id": 0, "email": "not-an-email"})
+
+        self.assertEqual(response.json().get("errors"), "Record not found")
+
+        response = self.client.put(url, json={"id": 0})
+
+        self.assertEqual(response.json().get("errors"), "Record not found")
+
+        response = self.client.put(url, json={"id": 4, "email": "not-an-email"})
+
+        self.assertEqual(response.json().get("errors"), "Invalid email address")
@@ -0,0 +1,35 @@
+import io
+from typing import Optional
+
+from fastapi import APIRouter, File, Query, UploadFile, status
+from starlette.concurrency import run_in_threadpool
+
+from core.utils.responses import EnvelopeResponse
+from db.imports import ImportEntity, ImportFormat, detect_format, import_stream
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+
+@router.post("/{entity}", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
+async def import_records(
+    entity: ImportEntity,
+    file: UploadFile = File(...),
+    format: Optional[ImportFormat] = Query(None, description="File format, guessed from the file name when missing"),
+):
+    response = EnvelopeResponse()
+
+    try:
+        # Decode the spooled upload lazily, line by line
+        stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+
+        try:
+            # COPY runs on the sync psycopg2 connection, keep it out of the event loop
+            report = await run_in_threadpool(import_stream, entity, stream, format or detect_format(file.filename))
+        finally:
+            stream.detach()
+
+        response.body = report
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return response
@@ -0,0 +1,97 @@
+import json
+import unittest
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from db.models import LoanORM, LoanScheduleORM
+from db.models.base import Base
+from db.session import engine
+from db.utils import populate_db
+from main import app
+
+
+class TestImportsEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = TestClient(app)
+
+        Base.metadata.create_all(engine)
+
+        # Fill DB with data
+        populate_db(engine)
+
+    def test_import_customers_csv(self):
+        url = "/v1/imports/customers"
+
+        content = (
+            "full_name,email,status\n"
+            "Imported One,imported.one@email.com,true\n"
+            "Invalid,not-an-email,true\n"
+            "Registered,ana@email.com,true\n"
+            ",missing.name@email.com,true\n"
+            "Imported Two,imported.two@email.com,false\n"
+            "Imported Again,imported.one@email.com,true\n"
+            '"Back\\slash\tTab",imported.three@email.com,true\n'
+        )
+
+        response = self.client.post(url, files={"file": ("customers.csv", content, "text/csv")})
+
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIsNone(response.json().get("errors"))
+        self.assertEqual(body.get("read"), 7)
+        self.assertEqual(body.get("imported"), 3)
+        self.assertEqual(body.get("rejected"), 4)
+        self.assertListEqual(
+            body.get("rejects"),
+            [
+                {"line": 3, "error": "Invalid email address"},
+                {"line": 4, "error": "Email already registered"},
+                {"line": 5, "error": "Missing parameter"},
+                {"line": 7, "error": "Email duplicated in file"},
+            ],
+        )
+
+        response = self.client.get("/v1/customers/list", params={"filter": "imported.three"})
+
+        self.assertEqual(response.json().get("body")[0].get("full_name"), "Back\\slash\tTab")
+
+    def test_import_loans_ndjson(self):
+        url = "/v1/imports/loans"
+
+        lines = [
+            {"customer_id": 4, "amount": "1200.50", "issued": "2023-01-15T10:00:00"},
+            {"customer_id": 999999, "amount": 100},
+            {"customer_id": 4, "amount": -5},
+            "not json",
+            {"customer_id": 5, "amount": 300, "status": False},
+        ]
+        content = "\n".join(line if isinstance(line, str) else json.dumps(line) for line in lines)
+
+        response = self.client.post(url, files={"file": ("loans.ndjson", content, "application/x-ndjson")})
+
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(body.get("imported"), 2)
+        self.assertListEqual(
+            body.get("rejects"),
+            [
+                {"line": 2, "error": "Customer not found"},
+                {"line": 3, "error": "Invalid amount '-5'"},
+                {"line": 4, "error": "Malformed record"},
+            ],
+        )
+
+        # The imported loans come with their schedules
+        with engine.connect() as conn:
+            unscheduled = conn.scalar(
+                select(func.count())
+                .select_from(LoanORM)
+                .where(~select(LoanScheduleORM.loan_id).where(LoanScheduleORM.loan_id == LoanORM.id).exists())
+            )
+
+        self.assertEqual(unscheduled, 0)
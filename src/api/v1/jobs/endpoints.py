@@ -0,0 +1,145 @@
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Query, UploadFile, status
+from fastapi.responses import FileResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from api.v1.jobs.handlers import store_upload
+from api.v1.jobs.schemas import JobSchema, JobSubmitSchema
+from core.jobs import runner
+from core.jobs.runner import SUCCEEDED
+from core.settings import settings
+from core.utils.responses import EnvelopeJSONResponse, EnvelopeResponse
+from db.imports import ImportEntity, ImportFormat, detect_format
+from db.models import JobORM
+from db.session import get_session
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def job_schema(job: JobORM) -> JobSchema:
+    result = JobSchema.model_validate(job)
+
+    if job.status == SUCCEEDED and job.result_path:
+        result.result_url = f"/{settings.API_V1}/jobs/{job.id}/result"
+
+    return result
+
+
+@router.post("", status_code=status.HTTP_202_ACCEPTED, response_model=EnvelopeResponse)
+async def submit_job(job: JobSubmitSchema, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Validate the type and the parameters, then queue the job
+        response.body = job_schema(await runner.submit(db, job.type, job.params))
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return response
+
+
+@router.post("/import/{entity}", status_code=status.HTTP_202_ACCEPTED, response_model=EnvelopeResponse)
+async def submit_import_job(
+    entity: ImportEntity,
+    file: UploadFile = File(...),
+    format: Optional[ImportFormat] = Query(None, description="File format, guessed from the file name when missing"),
+    db: AsyncSession = Depends(get_session),
+):
+    response = EnvelopeResponse()
+
+    try:
+        format = format or detect_format(file.filename)
+
+        # Keep the upload for the runner, the request ends before the import starts
+        upload = await run_in_threadpool(store_upload, file.file)
+
+        params = {"entity": entity, "format": format, "upload": upload}
+        response.body = job_schema(await runner.submit(db, "import", params))
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return response
+
+
+@router.get("/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def retrieve_job(id: int, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Always from the primary, the progress moves faster than the replicas
+        job = await db.scalar(select(JobORM).filter(JobORM.id == id))
+
+        if job is None:
+            raise Exception("Record not found")
+
+        response.body = job_schema(job)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/{id}/result", status_code=status.HTTP_200_OK)
+async def download_job_result(id: int, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        job = await db.scalar(select(JobORM).filter(JobORM.id == id))
+
+        if job is None:
+            raise Exception("Record not found")
+
+        if job.status != SUCCEEDED or not job.result_path:
+            raise Exception(f"No result to download, the job is {job.status}")
+
+        if not Path(job.result_path).exists():
+            raise Exception("Result no longer available")
+
+        return FileResponse(job.result_path, media_type=job.result_media_type, filename=job.result_filename)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.post("/{id}/cancel", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def cancel_job(id: int, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Validate record existence
+        job = await db.scalar(select(JobORM).filter(JobORM.id == id))
+
+        if job is None:
+            raise Exception("Record not found")
+
+        response.body = job_schema(await runner.cancel(db, job))
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return response
+
+
+@router.delete("/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def delete_job(id: int, db: AsyncSession = Depends(get_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Validate record existence
+        job = await db.scalar(select(JobORM).filter(JobORM.id == id))
+
+        if job is None:
+            raise Exception("Record not found")
+
+        # The row along with its result and upload files
+        await runner.delete(db, job)
+
+        response.body = job_schema(job)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return response
@@ -0,0 +1,125 @@
+import shutil
+import uuid
+
+from api.v1.customers.endpoints import filtered_customers
+from api.v1.customers.schemas import CustomerSchema
+from api.v1.jobs.schemas import (
+    AgingJobParams,
+    BalancesJobParams,
+    ExportJobParams,
+    ImportJobParams,
+    SchedulesJobParams,
+)
+from api.v1.loans.endpoints import filtered_loans
+from api.v1.loans.schemas import LoanSchema
+from api.v1.payments.endpoints import filtered_payments
+from api.v1.payments.schemas import PaymentsSchema
+from core.jobs import JobContext, JobResult, runner
+from db.aging import compute_aging
+from db.balances import reconcile_balances
+from db.exports import EXPORT_BATCH_SIZE, MEDIA_TYPES, render_csv, render_ndjson
+from db.imports import import_stream
+from db.schedules import recompute_schedules
+from db.session import DBSession
+
+EXPORTS = {
+    "customers": (filtered_customers, CustomerSchema),
+    "loans": (filtered_loans, LoanSchema),
+    "payments": (filtered_payments, PaymentsSchema),
+}
+
+
+@runner.register("export", ExportJobParams, limit=2)
+def export_job(context: JobContext, params: ExportJobParams) -> JobResult:
+    query, schema = EXPORTS[params.entity]
+    path = context.result_path(params.format)
+    exported = 0
+
+    try:
+        with DBSession() as db, path.open("w", encoding="utf-8", newline="") as file:
+            if params.format == "csv":
+                file.write(render_csv(schema, [], header=True))
+
+            # Server-side cursor, the file grows one batch at a time
+            result = db.scalars(
+                query(params.filter, status=params.status).execution_options(yield_per=EXPORT_BATCH_SIZE)
+            )
+
+            for partition in result.partitions():
+                records = [schema(**item.dict()) for item in partition]
+                file.write(render_csv(schema, records) if params.format == "csv" else render_ndjson(records))
+                exported += len(records)
+                context.progress(message=f"{exported} records exported")
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+
+    return JobResult(
+        data={"records": exported},
+        path=path,
+        media_type=MEDIA_TYPES[params.format],
+        filename=f"{params.entity}.{params.format}",
+    )
+
+
+def store_upload(stream) -> str:
+    """The function `store_upload` copies an uploaded file where the import
+    jobs find it.
+
+    Parameters
+    ----------
+    stream
+        The binary stream of the upload.
+
+    Returns
+    -------
+        the name of the stored file, the `upload` parameter of the job.
+    """
+
+    name = uuid.uuid4().hex
+    path = runner.upload_path(name)
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    with path.open("wb") as file:
+        shutil.copyfileobj(stream, file)
+
+    return name
+
+
+@runner.register("import", ImportJobParams, limit=1)
+def import_job(context: JobContext, params: ImportJobParams) -> JobResult:
+    upload = runner.upload_path(params.upload)
+    context.progress(message=f"Importing {params.entity}", force=True)
+
+    try:
+        size = upload.stat().st_size or 1
+
+        with upload.open(encoding="utf-8", newline="") as stream:
+
+            def progress(records: int) -> None:
+                # Between two chunks of the COPY, a cancellation rolls the whole import back
+                context.progress(min(stream.buffer.tell() / size, 1), f"{records} records read")
+
+            report = import_stream(params.entity, stream, params.format, progress)
+    finally:
+        upload.unlink(missing_ok=True)
+
+    return JobResult(data=report.model_dump(mode="json"))
+
+
+@runner.register("aging", AgingJobParams, limit=1)
+def aging_job(context: JobContext, params: AgingJobParams) -> JobResult:
+    snapshot = compute_aging(params.as_of, params.workers, progress=context.progress)
+    return JobResult(data={"as_of": snapshot.as_of.isoformat(), "loans": snapshot.loans, "elapsed": snapshot.elapsed})
+
+
+@runner.register("schedules", SchedulesJobParams, limit=1)
+def schedules_job(context: JobContext, params: SchedulesJobParams) -> JobResult:
+    report = recompute_schedules(rate=params.rate, missing=params.missing, progress=context.progress)
+    return JobResult(data=report.model_dump(mode="json"))
+
+
+@runner.register("balances", BalancesJobParams, limit=1)
+def balances_job(context: JobContext, params: BalancesJobParams) -> JobResult:
+    report = reconcile_balances(repair=params.repair, workers=params.workers, progress=context.progress)
+    return JobResult(data=report.model_dump(mode="json"))
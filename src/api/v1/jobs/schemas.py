@@ -0,0 +1,60 @@
+from datetime import date, datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+from db.exports import ExportFormat
+from db.imports import ImportEntity, ImportFormat
+
+
+class JobSubmitSchema(BaseModel):
+    type: str  # noqa: A003
+    params: dict = {}
+
+
+class JobSchema(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int  # noqa: A003
+    type: str  # noqa: A003
+    status: str
+    params: dict
+    progress: Optional[float] = None
+    message: Optional[str] = None
+    error: Optional[str] = None
+    cancel_requested: bool = False
+    result: Optional[dict] = None
+    result_url: Optional[str] = None
+    attempts: int = 0
+    created: datetime
+    started: Optional[datetime] = None
+    finished: Optional[datetime] = None
+
+
+class ExportJobParams(BaseModel):
+    entity: ImportEntity
+    filter: str = ""  # noqa: A003
+    status: bool = True
+    format: ExportFormat = "csv"  # noqa: A003
+
+
+class ImportJobParams(BaseModel):
+    entity: ImportEntity
+    format: ImportFormat  # noqa: A003
+    # Name given to the file by the upload endpoint, never a path
+    upload: str = Field(pattern=r"^[0-9a-f]{32}$")
+
+
+class AgingJobParams(BaseModel):
+    as_of: Optional[date] = None
+    workers: Optional[int] = Field(None, ge=1)
+
+
+class SchedulesJobParams(BaseModel):
+    rate: Optional[float] = Field(None, ge=0)
+    missing: bool = False
+
+
+class BalancesJobParams(BaseModel):
+    repair: bool = False
+    workers: Optional[int] = Field(None, ge=1)
@@ -0,0 +1,216 @@
+import asyncio
+import io
+import os
+import time
+import unittest
+import uuid
+from datetime import timedelta
+from pathlib import Path
+
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.jobs import JobCancelled, runner
+from db.imports import PROGRESS_RECORDS, import_stream
+from db.models import CustomerORM, JobORM
+from db.session import engine
+from main import app
+
+
+class TestJobsEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Entered so the lifespan creates the tables and starts the runner
+        cls.client = TestClient(app)
+        cls.client.__enter__()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.client.__exit__(None, None, None)
+
+    def wait_for(self, job_id: int, timeout: float = 10) -> dict:
+        deadline = time.monotonic() + timeout
+
+        while True:
+            job = self.client.get(f"/v1/jobs/{job_id}").json().get("body")
+
+            if job.get("status") not in ("queued", "running") or time.monotonic() > deadline:
+                return job
+
+            time.sleep(0.05)
+
+    def test_export_job(self):
+        response = self.client.post("/v1/jobs", json={"type": "export", "params": {"entity": "customers"}})
+
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(body.get("type"), "export")
+        self.assertDictEqual(body.get("params"), {"entity": "customers", "filter": "", "status": True, "format": "csv"})
+
+        job = self.wait_for(body.get("id"))
+
+        self.assertEqual(job.get("status"), "succeeded")
+        self.assertEqual(job.get("progress"), 1)
+        self.assertEqual(job.get("result_url"), f"/v1/jobs/{job.get('id')}/result")
+
+        result = self.client.get(job.get("result_url"))
+        lines = result.text.splitlines()
+
+        self.assertEqual(result.status_code, status.HTTP_200_OK)
+        self.assertEqual(lines[0], "id,full_name,email,status")
+        self.assertEqual(len(lines) - 1, job.get("result").get("records"))
+
+    def test_import_job(self):
+        content = "full_name,email,status\nJob Import,job.import@email.com,true\nInvalid,not-an-email,true\n"
+
+        response = self.client.post("/v1/jobs/import/customers", files={"file": ("customers.csv", content, "text/csv")})
+
+        job = self.wait_for(response.json().get("body").get("id"))
+
+        self.assertEqual(job.get("status"), "succeeded")
+        self.assertEqual(job.get("result").get("imported"), 1)
+        self.assertEqual(job.get("result").get("rejected"), 1)
+        self.assertIsNone(job.get("result_url"))
+
+    def test_import_cancelled(self):
+        lines = [f"Cancelled {index},cancelled.{index}@email.com,true" for index in range(PROGRESS_RECORDS + 1)]
+        stream = io.StringIO("\n".join(["full_name,email,status", *lines]))
+        reported = []
+
+        def progress(records: int) -> None:
+            reported.append(records)
+            raise JobCancelled("Job cancelled")
+
+        # Raised while the COPY pulls the records, nothing is written
+        with self.assertRaises(JobCancelled):
+            import_stream("customers", stream, "csv", progress)
+
+        with Session(engine) as session:
+            imported = session.query(CustomerORM).filter(CustomerORM.email.startswith("cancelled.")).count()
+
+        self.assertEqual((reported, imported), ([PROGRESS_RECORDS], 0))
+
+    def test_invalid_job(self):
+        response = self.client.post("/v1/jobs", json={"type": "unknown"})
+
+        self.assertTrue(response.json().get("errors").startswith("Unknown job type"))
+
+        response = self.client.post("/v1/jobs", json={"type": "export", "params": {"entity": "accounts"}})
+
+        self.assertTrue(response.json().get("errors").startswith("Invalid parameters"))
+
+        response = self.client.post(
+            "/v1/jobs",
+            json={"type": "import", "params": {"entity": "customers", "format": "csv", "upload": "../../etc/passwd"}},
+        )
+
+        self.assertTrue(response.json().get("errors").startswith("Invalid parameters"))
+
+    def test_cancel_job(self):
+        # A type without handler in this process stays queued
+        with Session(engine) as session:
+            job = JobORM(type="archive", status="queued", params={})
+            session.add(job)
+            session.commit()
+            job_id = job.id
+
+        response = self.client.post(f"/v1/jobs/{job_id}/cancel")
+
+        self.assertEqual(response.json().get("body").get("status"), "cancelled")
+
+        response = self.client.post(f"/v1/jobs/{job_id}/cancel")
+
+        self.assertEqual(response.json().get("errors"), "Job already cancelled")
+
+        response = self.client.get(f"/v1/jobs/{job_id}/result")
+
+        self.assertEqual(response.json().get("errors"), "No result to download, the job is cancelled")
+
+    def test_abandoned_job(self):
+        # Claimed by runners that died, their leases expired long ago
+        with Session(engine) as session:
+            expired = func.now() - timedelta(hours=1)
+            jobs = [
+                JobORM(type="export", status="running", params={"entity": "customers"}, attempts=1, heartbeat=expired),
+                JobORM(type="export", status="running", params={"entity": "customers"}, attempts=3, heartbeat=expired),
+            ]
+            session.add_all(jobs)
+            session.commit()
+            retried, exhausted = (job.id for job in jobs)
+
+        job = self.wait_for(retried)
+
+        self.assertEqual((job.get("status"), job.get("attempts")), ("succeeded", 2))
+
+        job = self.client.get(f"/v1/jobs/{exhausted}").json().get("body")
+
+        self.assertEqual(job.get("status"), "failed")
+        self.assertEqual(job.get("error"), "Abandoned by its runner 3 times")
+
+    def test_delete_job(self):
+        response = self.client.post("/v1/jobs", json={"type": "export", "params": {"entity": "loans"}})
+        job = self.wait_for(response.json().get("body").get("id"))
+
+        with Session(engine) as session:
+            path = Path(session.get(JobORM, job.get("id")).result_path)
+
+        self.assertTrue(path.exists())
+
+        response = self.client.delete(f"/v1/jobs/{job.get('id')}")
+
+        self.assertEqual(response.json().get("body").get("id"), job.get("id"))
+        self.assertFalse(path.exists())
+        self.assertEqual(self.client.get(f"/v1/jobs/{job.get('id')}").json().get("errors"), "Record not found")
+
+        # The queued and running jobs are cancelled first
+        with Session(engine) as session:
+            queued = JobORM(type="archive", status="queued", params={})
+            session.add(queued)
+            session.commit()
+            queued_id = queued.id
+
+        self.assertEqual(
+            self.client.delete(f"/v1/jobs/{queued_id}").json().get("errors"), "Job queued, cancel it first"
+        )
+
+    def test_sweep(self):
+        runner.results_dir.mkdir(parents=True, exist_ok=True)
+        expired, orphan, recent = (runner.results_dir / f"sweep-{uuid.uuid4().hex}" for _ in range(3))
+        upload = runner.upload_path(uuid.uuid4().hex)
+        upload.parent.mkdir(parents=True, exist_ok=True)
+
+        for path in (expired, orphan, recent, upload):
+            path.write_text("data")
+
+        # Written before the retention, only the recent file is left alone
+        before = time.time() - timedelta(hours=runner.retention_hours + 1).total_seconds()
+
+        for path in (orphan, upload):
+            os.utime(path, (before, before))
+
+        with Session(engine) as session:
+            finished = JobORM(
+                type="export",
+                status="succeeded",
+                params={},
+                result_path=str(expired),
+                finished=func.now() - timedelta(hours=runner.retention_hours + 1),
+            )
+            queued = JobORM(type="archive", status="queued", params={"upload": upload.name})
+            session.add_all([finished, queued])
+            session.commit()
+            finished_id = finished.id
+
+        self.assertGreaterEqual(asyncio.run(runner.sweep()), 1)
+
+        with Session(engine) as session:
+            self.assertIsNone(session.get(JobORM, finished_id))
+
+        # The upload still belongs to its queued job
+        self.assertEqual([path.exists() for path in (expired, orphan, recent, upload)], [False, False, True, True])
+
+        for path in (recent, upload):
+            path.unlink()
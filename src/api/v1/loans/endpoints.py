@@ -1,72 +1,261 @@
-from fastapi import APIRouter, status, Response, Depends, HTTPException
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session, Query
-
-from api.v1.loans.schemas import LoanSchema
-from core.utils.responses import PaginationParams, default_pagination_params, EnvelopeResponse
-from db.models import CustomerORM, LoanORM
-from db.session import get_session
+from typing import Literal
+
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from api.v1.loans.schemas import LoanScheduleSchema, LoanSchema, ScheduleRowSchema
+from core.cache import cache, cache_key
+from core.metrics.timing import serializing
+from core.settings import settings
+from core.utils.amortization import (
+    DEFAULT_METHOD,
+    DEFAULT_RATE,
+    DEFAULT_TAX_RATE,
+    DEFAULT_TERM,
+    add_months,
+    amortize,
+    from_cents,
+    to_cents,
+)
+from core.utils.bulk import chunked, row_error
+from core.utils.conditional import (
+    CachedRecord,
+    fetch_record_validators,
+    is_conditional,
+    is_not_modified,
+    not_modified_response,
+    page_validators,
+    record_validators,
+    validators_query,
+)
+from core.utils.pagination import count_records, paginate
+from core.utils.responses import (
+    CursorParams,
+    EnvelopeJSONResponse,
+    EnvelopeResponse,
+    PaginationParams,
+    default_cursor_params,
+    default_pagination_params,
+)
+from db.exports import MEDIA_TYPES, ExportFormat, stream_export
+from db.models import CustomerORM, LoanORM, LoanScheduleORM, PaymentsORM
+from db.schedules import schedule_values
+from db.search import apply_customer_search, order_by_relevance
+from db.session import bound_to_primary, get_read_session, get_session, reads_primary
 
 router = APIRouter(prefix="/loans", tags=["Loans"])
 
 
+def filtered_loans(filter: str, *, status: bool) -> Select:
+    loans = select(LoanORM).join(CustomerORM).order_by(LoanORM.id).filter(LoanORM.status == status)
+
+    if filter != "":
+        # Served by the trigram indexes of the customers table
+        loans = apply_customer_search(loans, filter)
+
+    return loans
+
+
+def loan_terms(loan: LoanSchema) -> dict:
+    """The function `loan_terms` completes the amortization terms of a new
+    loan with the defaults.
+
+    Parameters
+    ----------
+    loan : LoanSchema
+        The loan received.
+
+    Returns
+    -------
+        the `rate`, `term`, `method` and `tax_rate` values of the record.
+    """
+
+    terms = {
+        "rate": DEFAULT_RATE if loan.rate is None else loan.rate,
+        "term": DEFAULT_TERM if loan.term is None else loan.term,
+        "method": loan.method or DEFAULT_METHOD,
+        "tax_rate": DEFAULT_TAX_RATE if loan.tax_rate is None else loan.tax_rate,
+    }
+
+    if terms["term"] < 1 or terms["rate"] < 0 or terms["tax_rate"] < 0:
+        raise ValueError("Invalid amortization terms")
+
+    return terms
+
+
+def loan_schedule(loan: LoanORM) -> LoanScheduleSchema:
+    result = amortize(
+        [to_cents(loan.amount)], [float(loan.rate)], [loan.term], [loan.method == "german"], [float(loan.tax_rate)],
+        periods=True,
+    )
+
+    periods = [
+        ScheduleRowSchema(
+            period=period + 1,
+            due=add_months(loan.issued.date(), period + 1),
+            principal=from_cents(result.principal[0, period]),
+            interest=from_cents(result.interest[0, period]),
+            tax=from_cents(result.tax[0, period]),
+            payment=from_cents(result.principal[0, period] + result.interest[0, period] + result.tax[0, period]),
+            balance=from_cents(result.balance[0, period]),
+        )
+        for period in range(loan.term)
+    ]
+
+    return LoanScheduleSchema(
+        loan_id=loan.id, amount=loan.amount, rate=loan.rate, term=loan.term, method=loan.method,
+        tax_rate=loan.tax_rate, installment=from_cents(result.installment[0]),
+        total_interest=from_cents(result.total_interest[0]), total_tax=from_cents(result.total_tax[0]),
+        total_payment=from_cents(result.total_payment[0]), periods=periods,
+    )
+
+
 @router.get("/retrieve/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def retrieve_loan(id: int = 0, db: Session = Depends(get_session)):
+async def retrieve_loan(
+        request: Request, id: int = 0, db: AsyncSession = Depends(get_read_session)
+    ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        loan = db.query(LoanORM).filter(LoanORM.id == id).first()
+        # Serve the record from the cache when possible, read-your-writes requests go to the primary
+        cached = None if reads_primary(request) else await cache.get(cache_key("loans", id))
+
+        if cached is not None:
+            entry = CachedRecord.model_validate_json(cached)
+
+            if is_not_modified(request, entry.validators):
+                return not_modified_response(entry.validators)
+
+            # The cached body is already in its JSON form
+            response.body = entry.body
+            return EnvelopeJSONResponse(response, headers=entry.validators.headers())
+
+        # Answer conditional requests from the id/modified index before loading the record
+        if is_conditional(request):
+            validators = await fetch_record_validators(db, LoanORM, id)
+
+            if validators is not None and is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+        loan = await db.scalar(select(LoanORM).filter(LoanORM.id == id))
 
         if loan is None:
             raise Exception("Record not found")
 
         result = LoanSchema(
-            id=loan.id, customer_id=loan.customer_id, amount=loan.amount, status=loan.status
+            id=loan.id, customer_id=loan.customer_id, amount=loan.amount, status=loan.status, rate=loan.rate,
+            term=loan.term, method=loan.method, tax_rate=loan.tax_rate, paid_total=loan.paid_total,
+            outstanding=loan.outstanding
         )
 
+        validators = record_validators(loan)
+
+        # Keep the serialized record and its validators for the next lookups, replica rows may be stale
+        entry = CachedRecord(body=result.model_dump(mode="json"), validators=validators)
+        if bound_to_primary(db):
+            await cache.set(cache_key("loans", id), entry.model_dump_json())
+
+        headers = validators.headers()
         response.body = result
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
 
 
 # to check
 @router.get("/list", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def list_customers(
-        filter: str = '', status: bool = Query(True), db: Session = Depends(get_session),
-        params: PaginationParams = Depends(default_pagination_params)
+async def list_customers(  # noqa: PLR0913
+        request: Request,
+        filter: str = "", status: bool = Query(True), db: AsyncSession = Depends(get_read_session),
+        sort: Literal["id", "relevance"] = Query("id", description="Order of the filtered records"),
+        params: PaginationParams = Depends(default_pagination_params),
+        cursor: CursorParams = Depends(default_cursor_params)
     ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        loans = db.query(LoanORM).join(CustomerORM).order_by(LoanORM.id).filter(LoanORM.status == status)
+        loans = filtered_loans(filter, status=status)
 
-        if filter != '':
-            loans = loans.filter(
-                CustomerORM.full_name.ilike(f'%{filter}%') | CustomerORM.email.ilike(f'%{filter}%')
-            )
+        if filter != "" and sort == "relevance":
+            if cursor.enabled:
+                raise Exception("Relevance sorting is not available with cursor pagination")
+
+            loans = order_by_relevance(loans, filter, LoanORM.id)
+
+        # Counting is skipped unless the client asks for it, the probe and the page share the count
+        response.total = await count_records(db, loans, params.total)
+
+        # Answer conditional requests from the id/modified values of the page before loading the records
+        if is_conditional(request):
+            probe = validators_query(loans, LoanORM)
+            validators = page_validators(*await paginate(db, probe, LoanORM, params, cursor), response.total)
 
-        # Working but not receiving query params to alter amounts
-        records = paginate(loans, params=params)
+            if is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+            # Drop the partially loaded records
+            db.expunge_all()
+
+        items, response.next_cursor = await paginate(db, loans, LoanORM, params, cursor)
+        headers = page_validators(items, response.next_cursor, response.total).headers()
 
         # Convert models to schemas
-        result = [LoanSchema(**item.dict()) for item in records.items]
+        with serializing():
+            result = [LoanSchema(**item.dict()) for item in items]
 
         response.body = result
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
+
+
+@router.get("/{id}/schedule", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def retrieve_loan_schedule(id: int, db: AsyncSession = Depends(get_read_session)):
+    response = EnvelopeResponse()
+
+    try:
+        # Validate record existence
+        loan = await db.scalar(select(LoanORM).filter(LoanORM.id == id))
+
+        if loan is None:
+            raise Exception("Record not found")
+
+        # The periods are computed from the terms, only the totals are stored
+        with serializing():
+            response.body = loan_schedule(loan)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_loans(
+        request: Request, filter: str = "", status: bool = Query(True),
+        format: ExportFormat = Query("csv", description="File format, csv or ndjson")
+    ):
+    return StreamingResponse(
+        stream_export(
+            filtered_loans(filter, status=status), LoanSchema, format, primary=reads_primary(request)
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="loans.{format}"'},
+    )
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
-async def create_loan(loan: LoanSchema, db: Session = Depends(get_session)):
+async def create_loan(loan: LoanSchema, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate customer account existence
-        customer = db.query(CustomerORM).filter(CustomerORM.id == loan.customer_id).first()
+        customer = await db.scalar(select(CustomerORM).filter(CustomerORM.id == loan.customer_id))
 
         if customer is None:
             raise Exception("Customer not found")
@@ -76,18 +265,25 @@ async def create_loan(loan: LoanSchema, db: Session = Depends(get_session)):
             raise Exception("Missing parameter")
 
         # Generate customer record
-        new_loan = LoanORM(customer_id=loan.customer_id, amount=loan.amount)
+        new_loan = LoanORM(customer_id=loan.customer_id, amount=loan.amount, **loan_terms(loan))
 
-        # Insert new record
+        # Insert new record along with the totals of its schedule
         db.add(new_loan)
-        db.commit()
+        await db.flush()
+        await db.execute(insert(LoanScheduleORM).values(schedule_values([new_loan])))
+        await db.commit()
 
         # Recover new data
-        db.refresh(new_loan)
+        await db.refresh(new_loan)
+
+        # Drop any cached copy of the record
+        await cache.delete(cache_key("loans", new_loan.id))
 
         # Convert from model to schema
         new_loan = LoanSchema(
-            id=new_loan.id, customer_id=new_loan.customer_id, amount=new_loan.amount, status=new_loan.status
+            id=new_loan.id, customer_id=new_loan.customer_id, amount=new_loan.amount, status=new_loan.status,
+            rate=new_loan.rate, term=new_loan.term, method=new_loan.method, tax_rate=new_loan.tax_rate,
+            paid_total=new_loan.paid_total, outstanding=new_loan.outstanding
         )
 
         response.body = new_loan
@@ -97,26 +293,117 @@ async def create_loan(loan: LoanSchema, db: Session = Depends(get_session)):
     return response
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
+async def bulk_create_loans(  # noqa: C901
+        loans: list[LoanSchema], db: AsyncSession = Depends(get_session),
+        chunk_size: int = Query(settings.BULK_CHUNK_SIZE, ge=1, le=5000, description="Records per INSERT statement")
+    ):
+    response = EnvelopeResponse()
+
+    try:
+        errors = []
+
+        terms = {}
+
+        # Validate parameters' content
+        for index, loan in enumerate(loans):
+            if loan.customer_id is None or loan.amount is None:
+                errors.append(row_error(index, "Missing parameter"))
+                continue
+
+            try:
+                terms[index] = loan_terms(loan)
+            except ValueError as exc:
+                errors.append(row_error(index, str(exc)))
+
+        rejected = {error["index"] for error in errors}
+        customer_ids = {loan.customer_id for index, loan in enumerate(loans) if index not in rejected}
+        existing = set()
+
+        # Validate customer accounts existence with set based queries
+        for ids in chunked(customer_ids, chunk_size):
+            existing.update(await db.scalars(select(CustomerORM.id).filter(CustomerORM.id.in_(ids))))
+
+        valid = []
+
+        for index, loan in enumerate(loans):
+            if index in rejected:
+                continue
+
+            if loan.customer_id not in existing:
+                errors.append(row_error(index, "Customer not found"))
+                continue
+
+            valid.append((loan, terms[index]))
+
+        created = []
+
+        # Insert new records with multi-row statements
+        for chunk in chunked(valid, chunk_size):
+            statement = (
+                insert(LoanORM)
+                .values([{"customer_id": loan.customer_id, "amount": loan.amount, **values} for loan, values in chunk])
+                .returning(
+                    LoanORM.id, LoanORM.customer_id, LoanORM.amount, LoanORM.issued, LoanORM.status, LoanORM.rate,
+                    LoanORM.term, LoanORM.method, LoanORM.tax_rate
+                )
+            )
+            records = (await db.execute(statement)).all()
+
+            # Totals of the schedules of the chunk, computed at once
+            schedules = schedule_values(records)
+            await db.execute(insert(LoanScheduleORM).values(schedules))
+
+            # Nothing paid yet, the whole schedule is outstanding as its trigger sets it
+            for record, schedule in zip(records, schedules, strict=True):
+                created.append(
+                    LoanSchema(
+                        id=record.id, customer_id=record.customer_id, amount=record.amount, issued=record.issued,
+                        status=record.status, rate=record.rate, term=record.term, method=record.method,
+                        tax_rate=record.tax_rate, paid_total=0, outstanding=schedule["total_payment"]
+                    )
+                )
+
+        await db.commit()
+
+        response.body = created
+        response.errors = sorted(errors, key=lambda error: error["index"]) or None
+    except Exception as exc:
+        await db.rollback()
+        response.errors = str(exc)
+
+    return response
+
+
 @router.delete("/delete/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def delete_loan(id: int, db: Session = Depends(get_session)):
+async def delete_loan(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(LoanORM).where(LoanORM.id == id).first()
+        record = await db.scalar(select(LoanORM).where(LoanORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
 
+        # Payments removed by the cascade
+        payment_ids = await db.scalars(select(PaymentsORM.id).filter(PaymentsORM.loan_id == id))
+        cascaded = [cache_key("payments", payment_id) for payment_id in payment_ids]
+
         # Physical deletion
-        db.delete(record)
+        await db.delete(record)
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copies of the record and of the ones removed by the cascade
+        await cache.delete(cache_key("loans", record.id), *cascaded)
 
         # Convert from model to schema
         deleted_customer = LoanSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status, rate=record.rate,
+            term=record.term, method=record.method, tax_rate=record.tax_rate, paid_total=record.paid_total,
+            outstanding=record.outstanding
         )
 
         response.body = deleted_customer
@@ -127,12 +414,12 @@ async def delete_loan(id: int, db: Session = Depends(get_session)):
 
 
 @router.delete("/disable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def disable_loan(id: int, db: Session = Depends(get_session)):
+async def disable_loan(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(LoanORM).where(LoanORM.id == id).first()
+        record = await db.scalar(select(LoanORM).where(LoanORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -141,14 +428,19 @@ async def disable_loan(id: int, db: Session = Depends(get_session)):
         record.status = False
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copy of the record
+        await cache.delete(cache_key("loans", record.id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         disabled_customer = LoanSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status, rate=record.rate,
+            term=record.term, method=record.method, tax_rate=record.tax_rate, paid_total=record.paid_total,
+            outstanding=record.outstanding
         )
 
         response.body = disabled_customer
@@ -159,12 +451,12 @@ async def disable_loan(id: int, db: Session = Depends(get_session)):
 
 
 @router.patch("/enable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def enable_customer(id: int, db: Session = Depends(get_session)):
+async def enable_customer(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(LoanORM).where(LoanORM.id == id).first()
+        record = await db.scalar(select(LoanORM).where(LoanORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -173,14 +465,19 @@ async def enable_customer(id: int, db: Session = Depends(get_session)):
         record.status = True
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copy of the record
+        await cache.delete(cache_key("loans", record.id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         enabled_customer = LoanSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status, rate=record.rate,
+            term=record.term, method=record.method, tax_rate=record.tax_rate, paid_total=record.paid_total,
+            outstanding=record.outstanding
         )
 
         response.body = enabled_customer
@@ -1,10 +1,45 @@
-from pydantic import BaseModel
+from datetime import date, datetime
 from typing import Optional
 
+from pydantic import BaseModel
+
+from core.utils.amortization import AmortizationMethod
+
 
 class LoanSchema(BaseModel):
     id: Optional[int] = None
     customer_id: Optional[int] = None
     amount: Optional[float] = None
-    issued: Optional[int] = None
+    issued: Optional[datetime] = None
     status: Optional[bool] = True
+    rate: Optional[float] = None
+    term: Optional[int] = None
+    method: Optional[AmortizationMethod] = None
+    tax_rate: Optional[float] = None
+    # Running balance of the record, read only
+    paid_total: Optional[float] = None
+    outstanding: Optional[float] = None
+
+
+class ScheduleRowSchema(BaseModel):
+    period: int
+    due: date
+    principal: float
+    interest: float
+    tax: float
+    payment: float
+    balance: float
+
+
+class LoanScheduleSchema(BaseModel):
+    loan_id: int
+    amount: float
+    rate: float
+    term: int
+    method: AmortizationMethod
+    tax_rate: float
+    installment: float
+    total_interest: float
+    total_tax: float
+    total_payment: float
+    periods: list[ScheduleRowSchema] = []
@@ -3,14 +3,14 @@ import os
 
 from fastapi import status
 from fastapi.testclient import TestClient
-from sqlalchemy import Engine, create_engine
-from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy import update
 
-from core.settings import settings
-from main import app
-from db.utils import populate_db
+from db.balances import reconcile_balances
+from db.models import LoanORM
 from db.models.base import Base
 from db.session import engine
+from db.utils import populate_db
+from main import app
 
 
 class TestCustomersEndpoints(unittest.TestCase):
@@ -106,4 +106,104 @@ class TestCustomersEndpoints(unittest.TestCase):
         self.assertEqual(body.get("id"), 7)
         self.assertEqual(body.get("customer_id"), 3)
         self.assertEqual(body.get("amount"), 6752.0)
-        self.assertEqual(body.get("status"), True)
\ No newline at end of file
+        self.assertEqual(body.get("status"), True)
+
+    def test_loans_bulk_create(self):
+        url = "/v1/loans/bulk"
+
+        json_data = [
+            {"customer_id": 4, "amount": 1500},
+            {"customer_id": 999999, "amount": 1500},
+            {"customer_id": 4},
+            {"customer_id": 5, "amount": 2500},
+        ]
+
+        response = self.client.post(url, json=json_data)
+
+        body = response.json().get("body")
+        errors = response.json().get("errors")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertListEqual(
+            [(item.get("customer_id"), item.get("amount")) for item in body], [(4, 1500.0), (5, 2500.0)]
+        )
+        self.assertListEqual(
+            errors, [{"index": 1, "error": "Customer not found"}, {"index": 2, "error": "Missing parameter"}]
+        )
+
+    def test_loans_schedule(self):
+        json_data = {"customer_id": 3, "amount": 100000, "rate": 0.12, "term": 12, "tax_rate": 0.16}
+
+        loan = self.client.post("/v1/loans/create", json=json_data).json().get("body")
+
+        response = self.client.get(f"/v1/loans/{loan.get('id')}/schedule")
+
+        body = response.json().get("body")
+        periods = body.get("periods")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body.get("method"), "french")
+        self.assertEqual(len(periods), 12)
+        self.assertEqual(body.get("installment"), 9044.88)
+        self.assertEqual(body.get("total_interest"), 6618.53)
+        self.assertEqual(round(sum(period.get("principal") for period in periods), 2), 100000.0)
+        self.assertEqual(periods[-1].get("balance"), 0.0)
+        self.assertEqual(periods[0].get("interest"), 1000.0)
+        self.assertEqual(periods[0].get("tax"), 160.0)
+
+    def test_loans_balance(self):
+        json_data = {"customer_id": 3, "amount": 1000, "rate": 0.12, "term": 12, "tax_rate": 0.16}
+
+        loan = self.client.post("/v1/loans/create", json=json_data).json().get("body")
+        url = f"/v1/loans/retrieve/{loan.get('id')}"
+        total = self.client.get(f"/v1/loans/{loan.get('id')}/schedule").json().get("body").get("total_payment")
+
+        self.assertEqual((loan.get("paid_total"), loan.get("outstanding")), (0, total))
+        self.assertEqual(self.client.get(url).json().get("body").get("outstanding"), total)
+
+        # Every payment write moves the balance, the cached record is dropped along
+        payment = self.client.post("/v1/payments/create", json={"loan_id": loan.get("id"), "amount": 100})
+        paid = payment.json().get("body").get("amount")
+        payment_id = payment.json().get("body").get("id")
+
+        body = self.client.get(url).json().get("body")
+
+        self.assertEqual(body.get("paid_total"), paid)
+        self.assertEqual(body.get("outstanding"), round(total - paid, 2))
+
+        self.client.delete(f"/v1/payments/disable/{payment_id}")
+
+        self.assertEqual(self.client.get(url).json().get("body").get("outstanding"), total)
+
+        self.client.patch(f"/v1/payments/enable/{payment_id}")
+        self.client.post("/v1/payments/bulk", json=[{"loan_id": loan.get("id"), "amount": 100}])
+
+        self.assertEqual(self.client.get(url).json().get("body").get("paid_total"), paid * 2)
+
+        self.client.delete(f"/v1/payments/delete/{payment_id}")
+        body = self.client.get(url).json().get("body")
+
+        self.assertEqual((body.get("paid_total"), body.get("outstanding")), (paid, round(total - paid, 2)))
+
+    def test_loans_bulk_writes_cache(self):
+        json_data = {"customer_id": 3, "amount": 1000, "rate": 0.12, "term": 12, "tax_rate": 0.16}
+
+        loan_id = self.client.post("/v1/loans/create", json=json_data).json().get("body").get("id")
+        url = f"/v1/loans/retrieve/{loan_id}"
+        total = self.client.get(url).json().get("body").get("outstanding")
+
+        # The imported payments move the balance through the triggers, the cached record is dropped after the commit
+        content = f"loan_id,amount,issued,status\n{loan_id},100,2024-01-01,true\n"
+        self.client.post("/v1/imports/payments", files={"file": ("payments.csv", content, "text/csv")})
+
+        self.assertEqual(self.client.get(url).json().get("body").get("outstanding"), round(total - 100, 2))
+
+        # Written behind the back of the triggers, the cached record is served until a repair
+        with engine.begin() as conn:
+            conn.execute(update(LoanORM).where(LoanORM.id == loan_id).values(paid_total=LoanORM.paid_total + 5))
+
+        self.assertEqual(self.client.get(url).json().get("body").get("paid_total"), 100)
+
+        reconcile_balances(repair=True, workers=1)
+
+        self.assertEqual(self.client.get(url).json().get("body").get("paid_total"), 100)
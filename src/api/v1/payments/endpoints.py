@@ -1,98 +1,209 @@
-from fastapi import APIRouter, status, Response, Depends, HTTPException
-from fastapi_pagination.ext.sqlalchemy import paginate
-from sqlalchemy.orm import Session, Query
+from typing import Literal
 
+from fastapi import APIRouter, Depends, Query, Request, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from api.v1.payments.schemas import PaymentsSchema
-from core.utils.responses import PaginationParams, default_pagination_params, EnvelopeResponse
-from db.models import CustomerORM, PaymentsORM, LoanORM
-from db.session import get_session
-
-from src.core.utils.datetime import LocalTime
+from core.cache import cache, cache_key
+from core.metrics.timing import serializing
+from core.settings import settings
+from core.utils.amortization import charge_interest
+from core.utils.bulk import chunked, row_error
+from core.utils.conditional import (
+    CachedRecord,
+    fetch_record_validators,
+    is_conditional,
+    is_not_modified,
+    not_modified_response,
+    page_validators,
+    record_validators,
+    validators_query,
+)
+from core.utils.datetime import LocalTime
+from core.utils.pagination import count_records, paginate
+from core.utils.responses import (
+    CursorParams,
+    EnvelopeJSONResponse,
+    EnvelopeResponse,
+    PaginationParams,
+    default_cursor_params,
+    default_pagination_params,
+)
+from db.exports import MEDIA_TYPES, ExportFormat, stream_export
+from db.models import CustomerORM, LoanORM, PaymentsORM
+from db.search import apply_customer_search, order_by_relevance
+from db.session import bound_to_primary, get_read_session, get_session, reads_primary
 
 router = APIRouter(prefix="/payments", tags=["Payments"])
 
 
+def filtered_payments(filter: str, *, status: bool) -> Select:
+    payments = (
+        select(PaymentsORM)
+        .join(LoanORM)
+        .join(CustomerORM)
+        .order_by(PaymentsORM.id)
+        .filter(PaymentsORM.status == status)
+    )
+
+    if filter != "":
+        # Served by the trigram indexes of the customers table
+        payments = apply_customer_search(payments, filter)
+
+    return payments
+
+
 @router.get("/retrieve/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def retrieve_payment(id: int = 0, db: Session = Depends(get_session)):
+async def retrieve_payment(
+        request: Request, id: int = 0, db: AsyncSession = Depends(get_read_session)
+    ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        payment = db.query(PaymentsORM).filter(PaymentsORM.id == id).first()
+        # Serve the record from the cache when possible, read-your-writes requests go to the primary
+        cached = None if reads_primary(request) else await cache.get(cache_key("payments", id))
+
+        if cached is not None:
+            entry = CachedRecord.model_validate_json(cached)
+
+            if is_not_modified(request, entry.validators):
+                return not_modified_response(entry.validators)
+
+            # The cached body is already in its JSON form
+            response.body = entry.body
+            return EnvelopeJSONResponse(response, headers=entry.validators.headers())
+
+        # Answer conditional requests from the id/modified index before loading the record
+        if is_conditional(request):
+            validators = await fetch_record_validators(db, PaymentsORM, id)
+
+            if validators is not None and is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+        payment = await db.scalar(select(PaymentsORM).filter(PaymentsORM.id == id))
 
         if payment is None:
             raise Exception("Record not found")
 
         result = PaymentsSchema(
-            id=payment.id, customer_id=payment.customer_id, amount=payment.amount, status=payment.status
+            id=payment.id, loan_id=payment.loan_id, amount=payment.amount, status=payment.status
         )
 
+        validators = record_validators(payment)
+
+        # Keep the serialized record and its validators for the next lookups, replica rows may be stale
+        entry = CachedRecord(body=result.model_dump(mode="json"), validators=validators)
+        if bound_to_primary(db):
+            await cache.set(cache_key("payments", id), entry.model_dump_json())
+
+        headers = validators.headers()
         response.body = result
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
 
 
 
 @router.get("/list", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def list_payments(
-        filter: str = '', status: bool = Query(True), db: Session = Depends(get_session),
-        params: PaginationParams = Depends(default_pagination_params)
+async def list_payments(  # noqa: PLR0913
+        request: Request,
+        filter: str = "", status: bool = Query(True), db: AsyncSession = Depends(get_read_session),
+        sort: Literal["id", "relevance"] = Query("id", description="Order of the filtered records"),
+        params: PaginationParams = Depends(default_pagination_params),
+        cursor: CursorParams = Depends(default_cursor_params)
     ):
     response = EnvelopeResponse()
+    headers = {}
 
     try:
-        payments = db.query(PaymentsORM).join(CustomerORM).order_by(PaymentsORM.id).filter(PaymentsORM.status == status)
+        payments = filtered_payments(filter, status=status)
 
-        if filter != '':
-            payments = payments.filter(
-                CustomerORM.full_name.ilike(f'%{filter}%') | CustomerORM.email.ilike(f'%{filter}%')
-            )
+        if filter != "" and sort == "relevance":
+            if cursor.enabled:
+                raise Exception("Relevance sorting is not available with cursor pagination")
+
+            payments = order_by_relevance(payments, filter, PaymentsORM.id)
+
+        # Counting is skipped unless the client asks for it, the probe and the page share the count
+        response.total = await count_records(db, payments, params.total)
 
-        # Working but not receiving query params to alter amounts
-        records = paginate(payments, params=params)
+        # Answer conditional requests from the id/modified values of the page before loading the records
+        if is_conditional(request):
+            probe = validators_query(payments, PaymentsORM)
+            validators = page_validators(*await paginate(db, probe, PaymentsORM, params, cursor), response.total)
+
+            if is_not_modified(request, validators):
+                return not_modified_response(validators)
+
+            # Drop the partially loaded records
+            db.expunge_all()
+
+        items, response.next_cursor = await paginate(db, payments, PaymentsORM, params, cursor)
+        headers = page_validators(items, response.next_cursor, response.total).headers()
 
         # Convert models to schemas
-        result = [PaymentsSchema(**item.dict()) for item in records.items]
+        with serializing():
+            result = [PaymentsSchema(**item.dict()) for item in items]
 
         response.body = result
     except Exception as exc:
         response.errors = str(exc)
 
-    return response
+    return EnvelopeJSONResponse(response, headers=headers)
+
+
+@router.get("/export", status_code=status.HTTP_200_OK)
+async def export_payments(
+        request: Request, filter: str = "", status: bool = Query(True),
+        format: ExportFormat = Query("csv", description="File format, csv or ndjson")
+    ):
+    return StreamingResponse(
+        stream_export(
+            filtered_payments(filter, status=status), PaymentsSchema, format, primary=reads_primary(request)
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="payments.{format}"'},
+    )
 
 
 @router.post("/create", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
-async def create_payment(payment: PaymentsSchema, db: Session = Depends(get_session)):
+async def create_payment(payment: PaymentsSchema, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
-        # Validate customer account existence
-        loan = db.query(CustomerORM).filter(LoanORM.id == payment.loan_id).first()
+        # Validate loan existence
+        loan = await db.scalar(select(LoanORM).filter(LoanORM.id == payment.loan_id))
 
         if loan is None:
-            raise Exception("Customer not found")
+            raise Exception("Loan not found")
 
         # Validate parameters' content
-        if payment.customer_id is None or payment.amount is None:
+        if payment.loan_id is None or payment.amount is None:
             raise Exception("Missing parameter")
 
-        amount = payment.amount + ((payment.amount*.15) * 1.16)
+        # Interest and its tax charged with the terms of the loan
+        amount = charge_interest(payment.amount, loan.rate, loan.tax_rate)
 
         # Generate customer record
         new_payment = PaymentsORM(loan_id=payment.loan_id, amount=amount, issued=LocalTime.now())
 
         # Insert new record
         db.add(new_payment)
-        db.commit()
+        await db.commit()
 
         # Recover new data
-        db.refresh(new_payment)
+        await db.refresh(new_payment)
+
+        # Drop any cached copy of the record and of its loan, whose balance moved
+        await cache.delete(cache_key("payments", new_payment.id), cache_key("loans", new_payment.loan_id))
 
         # Convert from model to schema
         new_payment = PaymentsSchema(
-            id=new_payment.id, customer_id=new_payment.customer_id, amount=new_payment.amount, status=new_payment.status
+            id=new_payment.id, loan_id=new_payment.loan_id, amount=new_payment.amount, status=new_payment.status
         )
 
         response.body = new_payment
@@ -102,26 +213,109 @@ async def create_payment(payment: PaymentsSchema, db: Session = Depends(get_sess
     return response
 
 
+@router.post("/bulk", status_code=status.HTTP_201_CREATED, response_model=EnvelopeResponse)
+async def bulk_create_payments(
+        payments: list[PaymentsSchema], db: AsyncSession = Depends(get_session),
+        chunk_size: int = Query(settings.BULK_CHUNK_SIZE, ge=1, le=5000, description="Records per INSERT statement")
+    ):
+    response = EnvelopeResponse()
+
+    try:
+        errors = []
+
+        # Validate parameters' content
+        for index, payment in enumerate(payments):
+            if payment.loan_id is None or payment.amount is None:
+                errors.append(row_error(index, "Missing parameter"))
+
+        rejected = {error["index"] for error in errors}
+        loan_ids = {payment.loan_id for index, payment in enumerate(payments) if index not in rejected}
+        existing = {}
+
+        # Validate loans existence and read their terms with set based queries
+        for ids in chunked(loan_ids, chunk_size):
+            terms = await db.execute(select(LoanORM.id, LoanORM.rate, LoanORM.tax_rate).filter(LoanORM.id.in_(ids)))
+            existing.update((record.id, record) for record in terms)
+
+        valid = []
+
+        for index, payment in enumerate(payments):
+            if index in rejected:
+                continue
+
+            if payment.loan_id not in existing:
+                errors.append(row_error(index, "Loan not found"))
+                continue
+
+            valid.append(payment)
+
+        created = []
+        issued = LocalTime.now()
+
+        # Insert new records with multi-row statements
+        for chunk in chunked(valid, chunk_size):
+            statement = (
+                insert(PaymentsORM)
+                .values([
+                    {
+                        "loan_id": payment.loan_id,
+                        "amount": charge_interest(
+                            payment.amount, existing[payment.loan_id].rate, existing[payment.loan_id].tax_rate
+                        ),
+                        "issued": issued,
+                    }
+                    for payment in chunk
+                ])
+                .returning(
+                    PaymentsORM.id, PaymentsORM.loan_id, PaymentsORM.amount, PaymentsORM.issued, PaymentsORM.status
+                )
+            )
+
+            created.extend(
+                PaymentsSchema(
+                    id=record.id, loan_id=record.loan_id, amount=record.amount, issued=record.issued,
+                    status=record.status
+                )
+                for record in await db.execute(statement)
+            )
+
+        await db.commit()
+
+        # Drop the cached copies of the loans whose balance moved
+        await cache.delete(*(cache_key("loans", loan_id) for loan_id in {payment.loan_id for payment in created}))
+
+        response.body = created
+        response.errors = sorted(errors, key=lambda error: error["index"]) or None
+    except Exception as exc:
+        await db.rollback()
+        response.errors = str(exc)
+
+    return response
+
+
 @router.delete("/delete/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def delete_payment(id: int, db: Session = Depends(get_session)):
+async def delete_payment(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(PaymentsORM).where(PaymentsORM.id == id).first()
+        record = await db.scalar(select(PaymentsORM).where(PaymentsORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
 
         # Physical deletion
-        db.delete(record)
+        await db.delete(record)
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copies of the record and of its loan, whose balance moved
+        await cache.delete(cache_key("payments", record.id), cache_key("loans", record.loan_id))
 
         # Convert from model to schema
         deleted_customer = PaymentsSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, loan_id=record.loan_id, amount=record.amount, status=record.status
         )
 
         response.body = deleted_customer
@@ -132,12 +326,12 @@ async def delete_payment(id: int, db: Session = Depends(get_session)):
 
 
 @router.delete("/disable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def disable_payment(id: int, db: Session = Depends(get_session)):
+async def disable_payment(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(PaymentsORM).where(PaymentsORM.id == id).first()
+        record = await db.scalar(select(PaymentsORM).where(PaymentsORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -146,14 +340,17 @@ async def disable_payment(id: int, db: Session = Depends(get_session)):
         record.status = False
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copies of the record and of its loan, whose balance moved
+        await cache.delete(cache_key("payments", record.id), cache_key("loans", record.loan_id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         disabled_customer = PaymentsSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, loan_id=record.loan_id, amount=record.amount, status=record.status
         )
 
         response.body = disabled_customer
@@ -164,12 +361,12 @@ async def disable_payment(id: int, db: Session = Depends(get_session)):
 
 
 @router.patch("/enable/{id}", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
-async def enable_customer(id: int, db: Session = Depends(get_session)):
+async def enable_customer(id: int, db: AsyncSession = Depends(get_session)):
     response = EnvelopeResponse()
 
     try:
         # Validate record existence
-        record = db.query(PaymentsORM).where(PaymentsORM.id == id).first()
+        record = await db.scalar(select(PaymentsORM).where(PaymentsORM.id == id))
 
         if record is None:
             raise Exception("Record not found")
@@ -178,14 +375,17 @@ async def enable_customer(id: int, db: Session = Depends(get_session)):
         record.status = True
 
         # Update record on DB
-        db.commit()
+        await db.commit()
+
+        # Drop the cached copies of the record and of its loan, whose balance moved
+        await cache.delete(cache_key("payments", record.id), cache_key("loans", record.loan_id))
 
         # Recover new data
-        db.refresh(record)
+        await db.refresh(record)
 
         # Convert from model to schema
         enabled_customer = PaymentsSchema(
-            id=record.id, customer_id=record.customer_id, amount=record.amount, status=record.status
+            id=record.id, loan_id=record.loan_id, amount=record.amount, status=record.status
         )
 
         response.body = enabled_customer
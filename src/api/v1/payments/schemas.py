@@ -1,10 +1,12 @@
-from pydantic import BaseModel
+from datetime import datetime
 from typing import Optional
 
+from pydantic import BaseModel
+
 
 class PaymentsSchema(BaseModel):
     id: Optional[int] = None
     loan_id: Optional[int] = None
     amount: Optional[float] = None
-    issued: Optional[int] = None
+    issued: Optional[datetime] = None
     status: Optional[bool] = True
@@ -0,0 +1,73 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from api.v1.reports.schemas import AgingBucketSchema, AgingReportSchema
+from core.utils.responses import EnvelopeJSONResponse, EnvelopeResponse
+from db.models import AgingSnapshotORM
+from db.session import get_read_session
+
+router = APIRouter(prefix="/reports", tags=["Reports"])
+
+
+def ratio(part: int, total: int) -> float:
+    return round(part / total, 6) if total else 0.0
+
+
+def aging_report(snapshot: AgingSnapshotORM) -> AgingReportSchema:
+    # The snapshots keep cents, the API answers in currency units like the other amounts
+    return AgingReportSchema(
+        as_of=snapshot.as_of,
+        computed=snapshot.computed,
+        loans=snapshot.loans,
+        outstanding=snapshot.outstanding / 100,
+        past_due=snapshot.past_due / 100,
+        delinquent_loans=snapshot.delinquent_loans,
+        delinquency_rate=ratio(snapshot.delinquent_outstanding, snapshot.outstanding),
+        delinquent_loans_rate=ratio(snapshot.delinquent_loans, snapshot.loans),
+        buckets=[
+            AgingBucketSchema(
+                bucket=bucket.bucket,
+                loans=bucket.loans,
+                outstanding=bucket.outstanding / 100,
+                past_due=bucket.past_due / 100,
+                share=ratio(bucket.outstanding, snapshot.outstanding),
+            )
+            for bucket in snapshot.buckets
+        ],
+    )
+
+
+@router.get("/aging", status_code=status.HTTP_200_OK, response_model=EnvelopeResponse)
+async def retrieve_aging(
+    as_of: Optional[date] = Query(None, description="Day of the report, the latest snapshot by default"),
+    db: AsyncSession = Depends(get_read_session),
+):
+    response = EnvelopeResponse()
+
+    try:
+        # Latest snapshot computed up to the day requested
+        query = (
+            select(AgingSnapshotORM)
+            .options(selectinload(AgingSnapshotORM.buckets))
+            .order_by(AgingSnapshotORM.as_of.desc())
+            .limit(1)
+        )
+
+        if as_of is not None:
+            query = query.filter(AgingSnapshotORM.as_of <= as_of)
+
+        snapshot = await db.scalar(query)
+
+        if snapshot is None:
+            raise Exception("No aging snapshot available")
+
+        response.body = aging_report(snapshot)
+    except Exception as exc:
+        response.errors = str(exc)
+
+    return EnvelopeJSONResponse(response)
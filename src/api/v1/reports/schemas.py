@@ -0,0 +1,23 @@
+from datetime import date, datetime
+
+from pydantic import BaseModel
+
+
+class AgingBucketSchema(BaseModel):
+    bucket: str
+    loans: int
+    outstanding: float
+    past_due: float
+    share: float
+
+
+class AgingReportSchema(BaseModel):
+    as_of: date
+    computed: datetime
+    loans: int
+    outstanding: float
+    past_due: float
+    delinquent_loans: int
+    delinquency_rate: float
+    delinquent_loans_rate: float
+    buckets: list[AgingBucketSchema] = []
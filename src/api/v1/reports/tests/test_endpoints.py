@@ -0,0 +1,69 @@
+import unittest
+from datetime import date, timedelta
+
+import numpy as np
+from fastapi import status
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+
+from core.utils.datetime import LocalTime
+from db.aging import BUCKETS, EPOCH, POSITIONS_DTYPE, age_loans, compute_aging
+from db.models import LoanORM
+from db.models.base import Base
+from db.session import engine
+from db.utils import populate_db
+from main import app
+
+
+class TestReportsEndpoints(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.client = TestClient(app)
+
+        Base.metadata.create_all(engine)
+
+        # Fill DB with data
+        populate_db(engine)
+
+    def test_age_loans(self):
+        # 1200.00 without interest in 12 installments of 100.00, due the last day of every month
+        issued = (date(2024, 1, 31) - EPOCH).days
+        positions = np.array([(1, 120000, 0.0, 12, False, 0.0, issued, 15000)], dtype=POSITIONS_DTYPE)
+
+        bucket, outstanding, past_due = age_loans(positions, date(2024, 5, 15))
+
+        # Three installments due, one and a half paid, the one of March 31st is 45 days late
+        self.assertEqual(BUCKETS[bucket[0]], "31-60")
+        self.assertEqual(outstanding[0], 105000)
+        self.assertEqual(past_due[0], 15000)
+
+        bucket, _, past_due = age_loans(positions, date(2024, 2, 28))
+
+        self.assertEqual(BUCKETS[bucket[0]], "current")
+        self.assertEqual(past_due[0], 0)
+
+    def test_aging_report(self):
+        as_of = LocalTime.today() + timedelta(days=100)
+
+        compute_aging(as_of, workers=1)
+
+        with engine.connect() as conn:
+            active_loans = conn.scalar(select(func.count()).select_from(LoanORM).filter(LoanORM.status))
+
+        response = self.client.get("/v1/reports/aging", params={"as_of": as_of.isoformat()})
+
+        body = response.json().get("body")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(body.get("as_of"), as_of.isoformat())
+        self.assertEqual(body.get("loans"), active_loans)
+        self.assertListEqual([bucket.get("bucket") for bucket in body.get("buckets")], list(BUCKETS))
+        self.assertEqual(sum(bucket.get("loans") for bucket in body.get("buckets")), active_loans)
+        self.assertGreater(body.get("delinquency_rate"), 0)
+
+    def test_aging_report_missing(self):
+        response = self.client.get("/v1/reports/aging", params={"as_of": "1990-01-01"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.json().get("body"))
+        self.assertEqual(response.json().get("errors"), "No aging snapshot available")
@@ -0,0 +1,12 @@
+"""Load benchmark of the API: seeds the database with configurable volumes,
+drives every endpoint with concurrent HTTP requests and compares throughput
+and latency percentiles per route against a stored baseline.
+
+Usage (from `src/`, against the database configured in POSTGRESQL_URL)::
+
+    python -m benchmarks.load seed --customers 1000000 --loans 5000000 --payments 20000000
+    python -m benchmarks.load run --output results.json --baseline baseline.json
+
+The run drives `main.app` in process unless `--base-url` points to a
+server, e.g. `uvicorn main:app --workers 4`.
+"""
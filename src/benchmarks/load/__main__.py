@@ -0,0 +1,84 @@
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from loguru import logger
+
+from benchmarks.load import __doc__ as usage
+from benchmarks.load.baseline import compare, load_report, save_report
+from benchmarks.load.runner import run, uncovered_routes
+from benchmarks.load.scenarios import SCENARIOS, cleanup, load_state
+from benchmarks.load.seed import seed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=usage, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    seed_parser = commands.add_parser("seed", help="Replace the records of the database with generated ones")
+    seed_parser.add_argument("--customers", type=int, default=100_000)
+    seed_parser.add_argument("--loans", type=int, default=500_000)
+    seed_parser.add_argument("--payments", type=int, default=2_000_000)
+
+    run_parser = commands.add_parser("run", help="Drive every route and compare with the baseline")
+    run_parser.add_argument("--requests", type=int, default=200, help="Measured requests per route")
+    run_parser.add_argument("--concurrency", type=int, default=10, help="Requests in flight")
+    run_parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per route")
+    run_parser.add_argument("--rounds", type=int, default=3, help="Measurements per route, the median is kept")
+    run_parser.add_argument("--seed", type=int, default=42, help="Seed of the random ids")
+    run_parser.add_argument("--base-url", help="Address of a running server, the app runs in process otherwise")
+    run_parser.add_argument("--route", action="append", help="Only drive the routes containing this text")
+    run_parser.add_argument("--output", type=Path, help="File receiving the report of the run")
+    run_parser.add_argument("--baseline", type=Path, help="Report to compare with, written when it doesn't exist")
+    run_parser.add_argument("--threshold", type=float, default=0.25, help="Accepted relative change")
+    run_parser.add_argument("--min-delta", type=float, default=2, help="Ignored latency growth in milliseconds")
+
+    args = parser.parse_args()
+
+    if args.command == "seed":
+        seed(args.customers, args.loans, args.payments)
+        return
+
+    # Built on import, the seeding doesn't need it
+    from main import app
+
+    for route in uncovered_routes(app, SCENARIOS):
+        logger.warning(f"No scenario drives {route}")
+
+    scenarios = [
+        scenario for scenario in SCENARIOS if not args.route or any(text in scenario.name for text in args.route)
+    ]
+    state = load_state(args.seed)
+
+    try:
+        report = asyncio.run(
+            run(app, scenarios, state, args.requests, args.concurrency, args.warmup, args.rounds, args.base_url)
+        )
+    finally:
+        cleanup(state)
+
+    if args.output:
+        save_report(report, args.output)
+
+    if args.baseline is None:
+        return
+
+    if not args.baseline.exists():
+        save_report(report, args.baseline)
+        logger.info(f"Baseline written to {args.baseline}")
+        return
+
+    regressions = compare(report, load_report(args.baseline), args.threshold, args.min_delta)
+
+    for regression in regressions:
+        logger.error(f"Regression: {regression}")
+
+    if regressions:
+        sys.exit(1)
+
+    logger.success("No regression against the baseline")
+
+
+if __name__ == "__main__":
+    main()
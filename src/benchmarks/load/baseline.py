@@ -0,0 +1,85 @@
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+from loguru import logger
+
+LATENCY_METRICS = ("p50", "p95", "p99")
+
+
+@dataclass
+class Regression:
+    route: str
+    metric: str
+    baseline: float
+    current: float
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else 0
+
+    def __str__(self) -> str:
+        return f"{self.route} {self.metric}: {self.baseline} -> {self.current} ({self.change:+.0%})"
+
+
+def save_report(report: dict, path: Path) -> None:
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def load_report(path: Path) -> dict:
+    return json.loads(path.read_text())
+
+
+def compare(current: dict, baseline: dict, threshold: float, min_delta: float) -> list[Regression]:
+    """The function `compare` finds the routes whose latency percentiles grew,
+    or whose throughput fell, beyond the threshold.
+
+    Parameters
+    ----------
+    current : dict
+        The report of the run.
+    baseline : dict
+        The stored report to compare against.
+    threshold : float
+        The accepted relative change, `0.2` tolerates 20%.
+    min_delta : float
+        The latency growth in milliseconds ignored whatever its relative
+    change, the fastest routes are dominated by noise.
+
+    Returns
+    -------
+        the regressions, empty when the run is as fast as the baseline.
+    """
+
+    if current.get("volumes") != baseline.get("volumes"):
+        logger.warning(f"Data volumes differ from the baseline: {current.get('volumes')} vs {baseline.get('volumes')}")
+
+    missing = [route for route in baseline["routes"] if route not in current["routes"]]
+
+    if missing:
+        logger.warning(f"{len(missing)} routes of the baseline weren't driven: {', '.join(missing)}")
+
+    regressions = []
+
+    for route, before in baseline["routes"].items():
+        after = current["routes"].get(route)
+
+        # Routes without measured requests have nothing to compare with
+        if after is None or not before["requests"]:
+            continue
+
+        regressions.extend(
+            Regression(route, metric, before[metric], after[metric])
+            for metric in LATENCY_METRICS
+            if after[metric] > before[metric] * (1 + threshold) and after[metric] - before[metric] > min_delta
+        )
+
+        slower = after["mean"] - before["mean"] > min_delta
+
+        if slower and after["throughput"] < before["throughput"] * (1 - threshold):
+            regressions.append(Regression(route, "throughput", before["throughput"], after["throughput"]))
+
+        if after["errors"] > before["errors"]:
+            regressions.append(Regression(route, "errors", before["errors"], after["errors"]))
+
+    return regressions
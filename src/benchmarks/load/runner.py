@@ -0,0 +1,207 @@
+import asyncio
+import math
+import statistics
+import time
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI
+from fastapi.routing import APIRoute
+from loguru import logger
+
+from benchmarks.load.scenarios import LoadState, Scenario
+
+
+def percentile(values: list[float], rank: float) -> float:
+    # Nearest-rank percentile of sorted values
+    if not values:
+        return 0
+
+    return values[max(math.ceil(rank / 100 * len(values)) - 1, 0)]
+
+
+@dataclass
+class RouteResult:
+    requests: int = 0
+    errors: int = 0
+    skipped: int = 0
+    elapsed: float = 0
+    latencies: list[float] = field(default_factory=list)
+
+    def summary(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "throughput": round(self.requests / self.elapsed, 1) if self.elapsed else 0,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0,
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+        }
+
+
+async def drive(
+    client: httpx.AsyncClient, scenario: Scenario, state: LoadState, total: int, concurrency: int
+) -> RouteResult:
+    """The function `drive` sends `total` requests to the route of a scenario
+    from `concurrency` concurrent clients.
+
+    Parameters
+    ----------
+    client : httpx.AsyncClient
+        The client bound to the server, or to the app in process.
+    scenario : Scenario
+        The route to drive.
+    state : LoadState
+        The ids available to the requests.
+    total : int
+        The amount of requests.
+    concurrency : int
+        The amount of requests in flight.
+
+    Returns
+    -------
+        the latencies of the requests, the failed ones are counted as errors.
+    """
+
+    result = RouteResult()
+    jobs = iter(range(total))
+
+    async def worker() -> None:
+        for _ in jobs:
+            arguments = scenario.build(state)
+
+            if arguments is None:
+                result.skipped += 1
+                continue
+
+            started = time.perf_counter()
+
+            try:
+                response = await client.request(scenario.method, **arguments)
+            except httpx.HTTPError as exc:
+                result.errors += 1
+                logger.debug(f"{scenario.name}: {exc}")
+                continue
+
+            result.latencies.append(time.perf_counter() - started)
+            result.requests += 1
+
+            if response.is_error:
+                result.errors += 1
+                logger.debug(f"{scenario.name}: HTTP {response.status_code}")
+                continue
+
+            data = response.json() if response.headers.get("content-type") == "application/json" else {}
+
+            # The endpoints report their failures in the envelope with a 2xx status
+            if isinstance(data, dict) and data.get("errors"):
+                result.errors += 1
+                logger.debug(f"{scenario.name}: {data['errors']}")
+            elif scenario.record is not None:
+                scenario.record(state, data)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    result.elapsed = time.perf_counter() - started
+
+    return result
+
+
+def combine(rounds: list[dict]) -> dict:
+    # Median of every metric over the rounds, a single noisy round can't move the result
+    combined = {metric: round(statistics.median(result[metric] for result in rounds), 3) for metric in rounds[0]}
+
+    for metric in ("requests", "errors", "skipped"):
+        combined[metric] = sum(result[metric] for result in rounds)
+
+    return combined
+
+
+def uncovered_routes(app: FastAPI, scenarios: list[Scenario]) -> list[str]:
+    # Routes of the app without a scenario, a new endpoint must be added to SCENARIOS
+    covered = {scenario.name for scenario in scenarios}
+    routes = [
+        f"{method} {route.path}"
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema
+        for method in sorted(route.methods)
+    ]
+
+    return [route for route in routes if route not in covered]
+
+
+async def run(  # noqa: PLR0913
+    app: FastAPI,
+    scenarios: list[Scenario],
+    state: LoadState,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+    rounds: int = 1,
+    base_url: Optional[str] = None,
+) -> dict:
+    """The function `run` drives the scenarios one after the other, so the
+    latencies of a route aren't mixed with the load of the others.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application driven in process when there's no `base_url`.
+    scenarios : list[Scenario]
+        The routes to drive, in order.
+    state : LoadState
+        The ids available to the requests, shared by the scenarios.
+    requests : int
+        The amount of measured requests per route.
+    concurrency : int
+        The amount of requests in flight.
+    warmup : int
+        The amount of unmeasured requests sent to every route first.
+    rounds : int
+        The amount of times every route is measured, the median of the
+    rounds is reported.
+    base_url : str, optional
+        The address of a running server, the app is driven in process when
+    it's missing.
+
+    Returns
+    -------
+        the report of the run, with the throughput and the latency
+    percentiles of every route in milliseconds.
+    """
+
+    transport = httpx.ASGITransport(app=app) if base_url is None else None
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    routes = {}
+
+    async with httpx.AsyncClient(
+        base_url=base_url or "http://testserver", transport=transport, limits=limits, timeout=120
+    ) as client:
+        for scenario in scenarios:
+            if warmup:
+                await drive(client, scenario, state, warmup, min(concurrency, warmup))
+
+            results = [(await drive(client, scenario, state, requests, concurrency)).summary() for _ in range(rounds)]
+            routes[scenario.name] = summary = combine(results)
+
+            logger.info(
+                f"{scenario.name:<45} {summary['throughput']:>9.1f} req/s "
+                f"p50 {summary['p50']:>8.2f}ms p95 {summary['p95']:>8.2f}ms p99 {summary['p99']:>8.2f}ms "
+                f"errors {summary['errors']}"
+            )
+
+    return {
+        "created": datetime.now(UTC).isoformat(timespec="seconds"),
+        "target": base_url or "in-process",
+        "requests": requests,
+        "concurrency": concurrency,
+        "rounds": rounds,
+        "volumes": state.volumes,
+        "routes": routes,
+    }
@@ -0,0 +1,243 @@
+import json
+import random
+import uuid
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Optional
+
+from sqlalchemy import delete, func, select, text
+
+from core.settings import settings
+from db.models import CustomerORM, LoanORM, PaymentsORM
+from db.names import FIRST_NAMES, LAST_NAMES
+from db.session import engine
+
+V1 = f"/{settings.API_V1}"
+
+ENTITIES = {"customers": CustomerORM, "loans": LoanORM, "payments": PaymentsORM}
+
+# Substrings of the seeded names and emails, from a handful of matches to thousands
+SEARCH_TERMS = ["maria", "fernandez", "juan.perez1", "lopez77", "@loadtest.com"]
+
+# Share of the listings filtered by one of the terms
+FILTERED_SHARE = 0.5
+
+
+@dataclass
+class LoadState:
+    """Ids of the seeded records and of the records created by the run. The
+    writes only modify, delete or add children to the records created by the
+    run, the seeded ones are only read."""
+
+    volumes: dict[str, int]
+    random: random.Random
+    run: str = field(default_factory=lambda: uuid.uuid4().hex[:8])
+    sequence: int = 0
+    created: dict[str, list[dict]] = field(default_factory=lambda: {entity: [] for entity in ENTITIES})
+
+    def pick(self, entity: str) -> int:
+        return self.random.randint(1, max(self.volumes[entity], 1))
+
+    def sample(self, entity: str, size: int) -> list[int]:
+        return [self.pick(entity) for _ in range(size)]
+
+    def email(self) -> str:
+        self.sequence += 1
+        return f"load-{self.run}-{self.sequence}@loadtest.com"
+
+    def name(self) -> str:
+        return f"{self.random.choice(FIRST_NAMES.split())} {self.random.choice(LAST_NAMES.split())}"
+
+    def created_record(self, entity: str) -> Optional[dict]:
+        records = self.created[entity]
+        return self.random.choice(records) if records else None
+
+    def parent(self, entity: str) -> int:
+        record = self.created_record(entity)
+        return record["id"] if record else self.pick(entity)
+
+    def take_created(self, entity: str) -> Optional[dict]:
+        records = self.created[entity]
+        return records.pop() if records else None
+
+
+def load_state(seed: int) -> LoadState:
+    with engine.connect() as conn:
+        volumes = {entity: conn.scalar(select(func.max(model.id))) or 0 for entity, model in ENTITIES.items()}
+
+    return LoadState(volumes=volumes, random=random.Random(seed))
+
+
+def cleanup(state: LoadState) -> None:
+    # Drop every record created by the run, children first, so the next run finds the same data set
+    with engine.begin() as conn:
+        for entity, model in reversed(ENTITIES.items()):
+            conn.execute(delete(model).where(model.id > state.volumes[entity]))
+
+    # The dead rows of the run would slow down the scans of the next one
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text("VACUUM ANALYZE customers, loans, payments, customer_summary, loan_schedules"))
+
+
+@dataclass
+class Scenario:
+    """One route of the API. `build` returns the arguments of the request, or
+    `None` when there's nothing to send, and `record` keeps what the response
+    created for the following scenarios."""
+
+    method: str
+    route: str
+    build: Callable[[LoadState], Optional[dict]]
+    record: Optional[Callable[[LoadState, dict], None]] = None
+
+    @property
+    def name(self) -> str:
+        return f"{self.method} {self.route}"
+
+
+def remember(entity: str) -> Callable[[LoadState, dict], None]:
+    def record(state: LoadState, data: dict) -> None:
+        if isinstance(data.get("body"), dict) and data["body"].get("id") is not None:
+            state.created[entity].append(data["body"])
+
+    return record
+
+
+def by_id(
+    entity: str, action: str, *, created: bool = False, take: bool = False
+) -> Callable[[LoadState], Optional[dict]]:
+    def build(state: LoadState) -> Optional[dict]:
+        if not created:
+            return {"url": f"{V1}/{entity}/{action}/{state.pick(entity)}"}
+
+        record = state.take_created(entity) if take else state.created_record(entity)
+        return {"url": f"{V1}/{entity}/{action}/{record['id']}"} if record else None
+
+    return build
+
+
+def listing(entity: str) -> Callable[[LoadState], dict]:
+    def build(state: LoadState) -> dict:
+        params = {"page": state.random.randint(1, 20), "page_size": 30}
+
+        if state.random.random() < FILTERED_SHARE:
+            params["filter"] = state.random.choice(SEARCH_TERMS)
+
+        return {"url": f"{V1}/{entity}/list", "params": params}
+
+    return build
+
+
+def export(entity: str) -> Callable[[LoadState], dict]:
+    # Narrow filters, a full export of the seeded volumes would take minutes
+    def build(state: LoadState) -> dict:
+        params = {"filter": f"{state.pick('customers')}@loadtest.com", "format": state.random.choice(["csv", "ndjson"])}
+        return {"url": f"{V1}/{entity}/export", "params": params}
+
+    return build
+
+
+def create_customer(state: LoadState) -> dict:
+    return {"url": f"{V1}/customers/create", "json": {"full_name": state.name(), "email": state.email()}}
+
+
+def bulk_customers(state: LoadState) -> dict:
+    return {
+        "url": f"{V1}/customers/bulk",
+        "json": [{"full_name": state.name(), "email": state.email()} for _ in range(20)],
+    }
+
+
+def update_customer(state: LoadState) -> Optional[dict]:
+    record = state.created_record("customers")
+
+    if record is None:
+        return None
+
+    return {"url": f"{V1}/customers/update", "json": {**record, "full_name": state.name()}}
+
+
+def new_loan(state: LoadState) -> dict:
+    return {"customer_id": state.parent("customers"), "amount": state.random.randint(500, 10000)}
+
+
+def new_payment(state: LoadState) -> dict:
+    return {"loan_id": state.parent("loans"), "amount": state.random.randint(50, 500)}
+
+
+def create_loan(state: LoadState) -> dict:
+    return {"url": f"{V1}/loans/create", "json": new_loan(state)}
+
+
+def bulk_loans(state: LoadState) -> dict:
+    return {"url": f"{V1}/loans/bulk", "json": [new_loan(state) for _ in range(20)]}
+
+
+def create_payment(state: LoadState) -> dict:
+    return {"url": f"{V1}/payments/create", "json": new_payment(state)}
+
+
+def bulk_payments(state: LoadState) -> dict:
+    return {"url": f"{V1}/payments/bulk", "json": [new_payment(state) for _ in range(20)]}
+
+
+def import_payments(state: LoadState) -> dict:
+    lines = [json.dumps(new_payment(state)) for _ in range(20)]
+    content = ("\n".join(lines) + "\n").encode()
+    return {"url": f"{V1}/imports/payments", "files": {"file": ("payments.ndjson", content, "application/x-ndjson")}}
+
+
+# In order: the reads, then the writes that create records, then the ones that modify and delete them
+SCENARIOS = [
+    Scenario("GET", "/health-check", lambda _state: {"url": "/health-check"}),
+    Scenario("GET", "/monitoring/cache", lambda _state: {"url": "/monitoring/cache"}),
+    Scenario("GET", "/monitoring/pool", lambda _state: {"url": "/monitoring/pool"}),
+    Scenario("GET", "/monitoring/replicas", lambda _state: {"url": "/monitoring/replicas"}),
+    Scenario("GET", "/monitoring/metrics", lambda _state: {"url": "/monitoring/metrics"}),
+    Scenario("GET", f"{V1}/customers/retrieve/{{id}}", by_id("customers", "retrieve")),
+    Scenario("GET", f"{V1}/customers/list", listing("customers")),
+    Scenario(
+        "GET",
+        f"{V1}/customers/summary",
+        lambda state: {"url": f"{V1}/customers/summary", "params": {"ids": state.sample("customers", 50)}},
+    ),
+    Scenario(
+        "GET",
+        f"{V1}/customers/{{id}}/summary",
+        lambda state: {"url": f"{V1}/customers/{state.pick('customers')}/summary"},
+    ),
+    Scenario(
+        "GET",
+        f"{V1}/customers/full",
+        lambda state: {"url": f"{V1}/customers/full", "params": {"ids": state.sample("customers", 10)}},
+    ),
+    Scenario(
+        "GET", f"{V1}/customers/{{id}}/full", lambda state: {"url": f"{V1}/customers/{state.pick('customers')}/full"}
+    ),
+    Scenario("GET", f"{V1}/customers/export", export("customers")),
+    Scenario("GET", f"{V1}/loans/retrieve/{{id}}", by_id("loans", "retrieve")),
+    Scenario("GET", f"{V1}/loans/list", listing("loans")),
+    Scenario("GET", f"{V1}/loans/{{id}}/schedule", lambda state: {"url": f"{V1}/loans/{state.pick('loans')}/schedule"}),
+    Scenario("GET", f"{V1}/loans/export", export("loans")),
+    Scenario("GET", f"{V1}/payments/retrieve/{{id}}", by_id("payments", "retrieve")),
+    Scenario("GET", f"{V1}/payments/list", listing("payments")),
+    Scenario("GET", f"{V1}/payments/export", export("payments")),
+    Scenario("GET", f"{V1}/reports/aging", lambda _state: {"url": f"{V1}/reports/aging"}),
+    Scenario("POST", f"{V1}/customers/create", create_customer, remember("customers")),
+    Scenario("POST", f"{V1}/customers/bulk", bulk_customers),
+    Scenario("PUT", f"{V1}/customers/update", update_customer),
+    Scenario("POST", f"{V1}/loans/create", create_loan, remember("loans")),
+    Scenario("POST", f"{V1}/loans/bulk", bulk_loans),
+    Scenario("POST", f"{V1}/payments/create", create_payment, remember("payments")),
+    Scenario("POST", f"{V1}/payments/bulk", bulk_payments),
+    Scenario("POST", f"{V1}/imports/{{entity}}", import_payments),
+    Scenario("DELETE", f"{V1}/customers/disable/{{id}}", by_id("customers", "disable", created=True)),
+    Scenario("PATCH", f"{V1}/customers/enable/{{id}}", by_id("customers", "enable", created=True)),
+    Scenario("DELETE", f"{V1}/loans/disable/{{id}}", by_id("loans", "disable", created=True)),
+    Scenario("PATCH", f"{V1}/loans/enable/{{id}}", by_id("loans", "enable", created=True)),
+    Scenario("DELETE", f"{V1}/payments/disable/{{id}}", by_id("payments", "disable", created=True)),
+    Scenario("PATCH", f"{V1}/payments/enable/{{id}}", by_id("payments", "enable", created=True)),
+    Scenario("DELETE", f"{V1}/payments/delete/{{id}}", by_id("payments", "delete", created=True, take=True)),
+    Scenario("DELETE", f"{V1}/loans/delete/{{id}}", by_id("loans", "delete", created=True, take=True)),
+    Scenario("DELETE", f"{V1}/customers/delete/{{id}}", by_id("customers", "delete", created=True, take=True)),
+]
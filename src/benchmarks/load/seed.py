@@ -0,0 +1,112 @@
+import time
+
+from loguru import logger
+from sqlalchemy import text
+
+from db.models import (
+    CustomerORM,
+    CustomerSummaryORM,
+    LoanORM,
+    LoanScheduleORM,
+    PaymentsORM,
+)
+from db.models.base import Base
+from db.names import FIRST_NAMES, LAST_NAMES
+from db.schedules import recompute_schedules
+from db.session import engine
+
+SEEDED_MODELS = (CustomerORM, LoanORM, PaymentsORM, CustomerSummaryORM, LoanScheduleORM)
+
+# Rows generated per statement, keeps the transition tables of the summary triggers small
+SEED_BATCH = 500_000
+
+SEED_CUSTOMERS = text(
+    """
+    INSERT INTO customers (full_name, email, status, created, modified)
+    SELECT
+        first_name || ' ' || last_name,
+        lower(first_name || '.' || last_name || i) || '@loadtest.com',
+        i % 10 <> 0,
+        now(),
+        now()
+    FROM (
+        SELECT
+            i,
+            (string_to_array(:first_names, ' '))[1 + i % :first_count] AS first_name,
+            (string_to_array(:last_names, ' '))[1 + (i * 7) % :last_count] AS last_name
+        FROM generate_series(:start, :stop) AS i
+    ) AS generated
+    """
+)
+
+# The parents are spread with a multiplicative hash, so the children of a row aren't contiguous
+SEED_LOANS = text(
+    """
+    INSERT INTO loans (customer_id, amount, issued, status, created, modified)
+    SELECT 1 + (i::bigint * 7919) % :parents, 500 + (i * 37) % 9500, now(), i % 8 <> 0, now(), now()
+    FROM generate_series(:start, :stop) AS i
+    """
+)
+
+SEED_PAYMENTS = text(
+    """
+    INSERT INTO payments (loan_id, amount, issued, status, created, modified)
+    SELECT 1 + (i::bigint * 7919) % :parents, 50 + (i * 13) % 450, now(), i % 20 <> 0, now(), now()
+    FROM generate_series(:start, :stop) AS i
+    """
+)
+
+
+def insert_batches(table: str, statement, total: int, **params) -> None:
+    started = time.perf_counter()
+
+    for start in range(1, total + 1, SEED_BATCH):
+        stop = min(start + SEED_BATCH - 1, total)
+
+        with engine.begin() as conn:
+            conn.execute(statement, {"start": start, "stop": stop, **params})
+
+        logger.info(f"{table}: {stop}/{total} rows")
+
+    logger.info(f"{table}: seeded in {time.perf_counter() - started:.1f}s")
+
+
+def seed(customers: int, loans: int, payments: int) -> None:
+    """The function `seed` replaces the records of the database with generated
+    ones, so every run measures the same data set.
+
+    Parameters
+    ----------
+    customers : int
+        The amount of customers, 10% of them disabled.
+    loans : int
+        The amount of loans, spread over the customers.
+    payments : int
+        The amount of payments, spread over the loans.
+    """
+
+    Base.metadata.create_all(engine)
+
+    tables = ", ".join(model.__tablename__ for model in SEEDED_MODELS)
+
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+
+    insert_batches(
+        "customers",
+        SEED_CUSTOMERS,
+        customers,
+        first_names=FIRST_NAMES,
+        first_count=len(FIRST_NAMES.split()),
+        last_names=LAST_NAMES,
+        last_count=len(LAST_NAMES.split()),
+    )
+    insert_batches("loans", SEED_LOANS, loans, parents=customers)
+    insert_batches("payments", SEED_PAYMENTS, payments, parents=loans)
+
+    report = recompute_schedules()
+    logger.info(f"loan_schedules: seeded in {report.elapsed}s")
+
+    # Fresh statistics and visibility maps, the plans must match the ones of a settled database
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        conn.execute(text(f"VACUUM ANALYZE {tables}"))
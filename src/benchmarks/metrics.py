@@ -0,0 +1,58 @@
+"""Metrics overhead benchmark: the cost of the request metrics per request.
+
+Reuses the ASGI driver of the middleware benchmark, and times the scrape of
+the registry once it holds the series of every route.
+
+Usage (from `src/`)::
+
+    python -m benchmarks.metrics --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi.middleware import Middleware
+from loguru import logger
+
+from benchmarks.middlewares import create_app, measure
+from core.metrics import registry
+from core.middlewares.metrics import MetricsMiddleware
+
+STACKS = {
+    "none": [],
+    "metrics": [Middleware(MetricsMiddleware)],
+}
+
+
+def measure_render(total: int) -> float:
+    started = time.perf_counter()
+
+    for _ in range(total):
+        registry.render()
+
+    return (time.perf_counter() - started) / total * 1_000_000
+
+
+async def run(total: int) -> dict:
+    return {name: await measure(create_app(middleware), total) for name, middleware in STACKS.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests sent through every stack")
+    parser.add_argument("--scrapes", type=int, default=1_000, help="Renders of the registry")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests))
+    baseline = results["none"]
+
+    logger.info(f"{'stack':<10} {'us/request':>11} {'overhead us':>12}")
+    for name, elapsed in results.items():
+        logger.info(f"{name:<10} {elapsed:>11.1f} {elapsed - baseline:>12.1f}")
+
+    logger.info(f"scrape     {measure_render(args.scrapes):>11.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Middleware overhead benchmark: BaseHTTPMiddleware vs pure ASGI middlewares.
+
+Every request goes straight through the ASGI interface, without a server or
+a network, so the timings only contain the middleware stack and a trivial
+endpoint.
+
+Usage (from `src/`)::
+
+    python -m benchmarks.middlewares --requests 20000
+"""
+
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, Request
+from fastapi.middleware import Middleware
+from fastapi.responses import RedirectResponse
+from loguru import logger
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from core.middlewares.catcher import CatcherExceptionMiddleware
+from core.middlewares.trailing_slash import TrailingSlashMiddleware
+
+
+class LegacyCatcherMiddleware(BaseHTTPMiddleware):
+    # The error handling is irrelevant here, only the wrapping of call_next costs
+    async def dispatch(self, request: Request, call_next):
+        return await call_next(request)
+
+
+class LegacyTrailingSlashMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next):
+        if request.url.path.endswith("/"):
+            return RedirectResponse(url=request.url.path[:-1], status_code=308)
+
+        return await call_next(request)
+
+
+STACKS = {
+    "none": [],
+    "base_http": [Middleware(LegacyCatcherMiddleware), Middleware(LegacyTrailingSlashMiddleware)],
+    "asgi": [Middleware(CatcherExceptionMiddleware), Middleware(TrailingSlashMiddleware)],
+}
+
+
+def create_app(middleware: list[Middleware]) -> FastAPI:
+    app = FastAPI(middleware=middleware, redirect_slashes=False)
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+async def request(app: FastAPI, path: str) -> int:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("testserver", 80),
+        "client": ("testclient", 50000),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+    }
+    messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+    status = 0
+
+    async def receive():
+        return next(messages, {"type": "http.disconnect"})
+
+    async def send(message):
+        nonlocal status
+
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+async def measure(app: FastAPI, total: int) -> float:
+    # Warm up the router and the middleware stack, built on the first request
+    for _ in range(100):
+        await request(app, "/ping")
+
+    started = time.perf_counter()
+
+    for _ in range(total):
+        await request(app, "/ping")
+
+    return (time.perf_counter() - started) / total * 1_000_000
+
+
+async def run(total: int) -> dict:
+    return {name: await measure(create_app(middleware), total) for name, middleware in STACKS.items()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20_000, help="Requests sent through every stack")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.requests))
+    baseline = results["none"]
+
+    logger.info(f"{'stack':<10} {'us/request':>11} {'overhead us':>12}")
+    for name, elapsed in results.items():
+        logger.info(f"{name:<10} {elapsed:>11.1f} {elapsed - baseline:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""Customer search benchmark: ILIKE over a sequential scan vs pg_trgm GIN indexes.
+
+Usage (from `src/`, against the database configured in POSTGRESQL_URL)::
+
+    python -m benchmarks.search --customers 1000000
+"""
+
+import argparse
+import statistics
+import time
+
+from loguru import logger
+from sqlalchemy import (
+    Boolean,
+    Column,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    select,
+    text,
+)
+
+from db.names import FIRST_NAMES, LAST_NAMES
+from db.search import search_clause, search_rank
+from db.session import engine
+
+metadata = MetaData()
+
+customers = Table(
+    "benchmark_customers",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("full_name", String(length=200), nullable=False),
+    Column("email", String(length=100), nullable=False),
+    Column("status", Boolean, nullable=False),
+)
+
+SEED_QUERY = text(
+    """
+    INSERT INTO benchmark_customers (id, full_name, email, status)
+    SELECT
+        i,
+        first_name || ' ' || last_name,
+        lower(first_name || '.' || last_name || i) || '@email.com',
+        i % 10 <> 0
+    FROM (
+        SELECT
+            i,
+            (string_to_array(:first_names, ' '))[1 + i % :first_count] AS first_name,
+            (string_to_array(:last_names, ' '))[1 + (i * 7) % :last_count] AS last_name
+        FROM generate_series(1, :total) AS i
+    ) AS generated
+    """
+)
+
+TERMS = ["maria.lopez4242", "fernandez", "elena", "@email.com", "no-such-customer"]
+
+
+def seed(total: int) -> None:
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        conn.execute(
+            SEED_QUERY,
+            {
+                "first_names": FIRST_NAMES,
+                "first_count": len(FIRST_NAMES.split()),
+                "last_names": LAST_NAMES,
+                "last_count": len(LAST_NAMES.split()),
+                "total": total,
+            },
+        )
+        conn.execute(text("ANALYZE benchmark_customers"))
+
+
+def create_trigram_indexes() -> float:
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        for column in ("full_name", "email"):
+            conn.execute(
+                text(
+                    f"CREATE INDEX ix_benchmark_customers_{column}_trgm "
+                    f"ON benchmark_customers USING gin ({column} gin_trgm_ops)"
+                )
+            )
+        conn.execute(text("ANALYZE benchmark_customers"))
+
+    return time.perf_counter() - started
+
+
+def measure(query, repeat: int) -> float:
+    timings = []
+
+    with engine.connect() as conn:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(query).all()
+            timings.append(time.perf_counter() - started)
+
+    return statistics.median(timings) * 1000
+
+
+def run(repeat: int, page_size: int) -> dict:
+    columns = (customers.c.full_name, customers.c.email)
+    results = {}
+
+    for term in TERMS:
+        filtered = select(customers.c.id).where(customers.c.status, search_clause(term, *columns))
+        results[term] = {
+            "page": measure(filtered.order_by(customers.c.id).limit(page_size), repeat),
+            "count": measure(select(func.count()).select_from(filtered.subquery()), repeat),
+            "ranked": measure(
+                filtered.order_by(search_rank(term, *columns).desc(), customers.c.id).limit(page_size), repeat
+            ),
+        }
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--customers", type=int, default=1_000_000, help="Amount of customers to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="Executions per query, the median is reported")
+    parser.add_argument("--page-size", type=int, default=30, help="LIMIT of the page queries")
+    parser.add_argument("--keep", action="store_true", help="Keep the benchmark table after the run")
+    args = parser.parse_args()
+
+    logger.info(f"Seeding {args.customers} customers")
+    seed(args.customers)
+
+    ilike = run(args.repeat, args.page_size)
+    build_time = create_trigram_indexes()
+    logger.info(f"Trigram indexes built in {build_time:.1f}s")
+    trigram = run(args.repeat, args.page_size)
+
+    logger.info(f"{'term':<20} {'query':<8} {'ILIKE ms':>10} {'trigram ms':>11} {'speedup':>8}")
+    for term in TERMS:
+        for query in ("page", "count", "ranked"):
+            before, after = ilike[term][query], trigram[term][query]
+            logger.info(f"{term:<20} {query:<8} {before:>10.2f} {after:>11.2f} {before / after:>7.1f}x")
+
+    if not args.keep:
+        metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Cold start benchmark of a worker: import and creation of the application,
+its lifespan startup, and the first request of the OpenAPI document.
+
+Every sample runs in a fresh interpreter, as a new worker would, so nothing
+is shared through the module cache. The settings come from the environment,
+compare the startup modes by running it with different ones, e.g.
+`DB_CREATE_SCHEMA=false DB_SEED=false`.
+
+Usage (from `src/`)::
+
+    python -m benchmarks.startup --samples 10
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from loguru import logger
+
+PHASES = ("import", "lifespan", "openapi")
+
+
+def sample() -> dict[str, float]:
+    started = time.perf_counter()
+    from main import app
+
+    timings = {"import": time.perf_counter() - started}
+
+    async def boot() -> None:
+        started = time.perf_counter()
+
+        async with app.router.lifespan_context(app):
+            timings["lifespan"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            app.openapi()
+            timings["openapi"] = time.perf_counter() - started
+
+    asyncio.run(boot())
+    return {phase: round(seconds * 1000, 1) for phase, seconds in timings.items()}
+
+
+def run(samples: int) -> dict[str, list[float]]:
+    results = {phase: [] for phase in (*PHASES, "total")}
+    # The job runner would only add the start of its dispatcher task
+    environment = {**os.environ, "JOBS_ENABLED": "false"}
+
+    for _ in range(samples):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--sample"],  # noqa: S603
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings = json.loads(output.stdout.strip().splitlines()[-1])
+
+        for phase in PHASES:
+            results[phase].append(timings[phase])
+
+        results["total"].append(round(sum(timings.values()), 1))
+
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=10, help="Fresh interpreters started")
+    parser.add_argument("--sample", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.sample:
+        # Only the timings on stdout, the last line is read by the parent
+        logger.remove()
+        logger.add(sys.stdout, format="{message}")
+        logger.info(json.dumps(sample()))
+        return
+
+    for phase, values in run(args.samples).items():
+        logger.info(f"{phase:<10} median {statistics.median(values):8.1f} ms  max {max(values):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Build the OpenAPI document of the service, served as is by the workers
+started with `OPENAPI_FILE` pointing to it.
+
+Usage (from `src/`)::
+
+    python -m commands.build_openapi --output openapi.json
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+from fastapi import FastAPI
+from loguru import logger
+
+from core.settings import settings
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default=settings.OPENAPI_FILE or "openapi.json", help="Path of the document")
+    args = parser.parse_args()
+
+    from main import app
+
+    # Built from the routes, never from a previous document
+    document = FastAPI.openapi(app)
+    Path(args.output).write_text(json.dumps(document, separators=(",", ":")))
+
+    logger.info(f"OpenAPI document with {len(document['paths'])} paths written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
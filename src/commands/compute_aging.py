@@ -0,0 +1,33 @@
+"""Age the active loans and store the snapshot served by /v1/reports/aging.
+
+Meant to run once a day, from cron or the scheduler of the platform.
+
+Usage (from `src/`)::
+
+    python -m commands.compute_aging
+    python -m commands.compute_aging --as-of 2024-06-30 --workers 4
+"""
+
+import argparse
+from datetime import date
+
+from loguru import logger
+
+from db.aging import BUCKETS, compute_aging
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--as-of", type=date.fromisoformat, help="Day of the aging, today by default")
+    parser.add_argument("--workers", type=int, help="Processes aging the customers, one per CPU by default")
+    parser.add_argument("--customers-per-task", type=int, default=5_000, help="Customers aged by every task")
+    args = parser.parse_args()
+
+    snapshot = compute_aging(args.as_of, args.workers, args.customers_per_task)
+
+    for bucket, record in zip(BUCKETS, snapshot.buckets, strict=True):
+        logger.info(f"{bucket}: {record.loans} loans, {record.outstanding / 100:.2f} outstanding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""Load a CSV or NDJSON file into customers, loans or payments with COPY.
+
+Usage (from `src/`)::
+
+    python -m commands.import_data loans ./loans.csv
+    python -m commands.import_data payments ./payments.ndjson --format ndjson
+"""
+
+import argparse
+from pathlib import Path
+from typing import get_args
+
+from loguru import logger
+
+from db.imports import ImportEntity, ImportFormat, detect_format, import_stream
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("entity", choices=get_args(ImportEntity), help="Table to load")
+    parser.add_argument("path", help="Path of the file to import")
+    parser.add_argument("--format", choices=get_args(ImportFormat), help="File format, guessed from the extension")
+    args = parser.parse_args()
+
+    with Path(args.path).open(encoding="utf-8", newline="") as stream:
+        report = import_stream(args.entity, stream, args.format or detect_format(args.path))
+
+    for reject in report.rejects:
+        logger.warning(f"Line {reject.line}: {reject.error}")
+
+    logger.info(
+        f"{report.entity}: {report.read} read, {report.imported} imported, {report.rejected} rejected "
+        f"in {report.elapsed}s ({report.rows_per_second} rows/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""Apply the pending migrations of the schema, run once per deploy before the
+workers start.
+
+Usage (from `src/`)::
+
+    python -m commands.migrate
+    python -m commands.migrate --list
+    python -m commands.migrate --target 1
+"""
+
+import argparse
+
+from loguru import logger
+
+from db.migrations import migrate, status
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--list", action="store_true", help="Show the migrations and when they were applied")
+    parser.add_argument("--target", type=int, help="Last version to apply, every pending one by default")
+    args = parser.parse_args()
+
+    if args.list:
+        for migration in status():
+            logger.info(f"{migration.label:<40} {migration.applied or 'pending'}")
+        return
+
+    applied = migrate(args.target)
+    logger.info(f"{len(applied)} migrations applied" if applied else "The schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""Recompute the amortization schedule totals of every loan.
+
+Usage (from `src/`)::
+
+    python -m commands.recompute_schedules
+    python -m commands.recompute_schedules --rate 0.18
+    python -m commands.recompute_schedules --missing
+"""
+
+import argparse
+
+from loguru import logger
+
+from db.schedules import recompute_schedules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=100_000, help="Loans computed at once")
+    parser.add_argument("--rate", type=float, help="New annual rate of the active loans, 0.18 is 18%%")
+    parser.add_argument("--missing", action="store_true", help="Only compute the loans without a schedule")
+    args = parser.parse_args()
+
+    report = recompute_schedules(chunk_size=args.chunk_size, rate=args.rate, missing=args.missing)
+
+    logger.info(
+        f"{report.loans} schedules recomputed in {report.chunks} chunks "
+        f"in {report.elapsed}s ({report.loans_per_second} loans/sec)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+"""Verify the running balances of the loans against their payments and
+schedules, and repair the ones that drifted with `--repair`. Exits with 1
+when drifting balances or loans without a schedule are left, to alert from
+cron. The schedules are computed by `python -m commands.recompute_schedules
+--missing`.
+
+Usage (from `src/`)::
+
+    python -m commands.reconcile_balances
+    python -m commands.reconcile_balances --repair --workers 4
+"""
+
+import argparse
+
+from loguru import logger
+
+from db.balances import reconcile_balances
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repair", action="store_true", help="Write the expected balances of the drifting loans")
+    parser.add_argument("--workers", type=int, help="Processes checking the loans, one per CPU by default")
+    parser.add_argument("--loans-per-task", type=int, default=50_000, help="Loans checked by every task")
+    args = parser.parse_args()
+
+    report = reconcile_balances(repair=args.repair, workers=args.workers, loans_per_task=args.loans_per_task)
+
+    logger.info(
+        f"{report.loans} balances checked in {report.ranges} ranges in {report.elapsed}s "
+        f"({report.loans_per_second} loans/sec), {report.drifted} drifted, {report.repaired} repaired, "
+        f"{report.unscheduled} without a schedule"
+    )
+
+    if report.drifted > report.repaired or report.unscheduled:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+import pytest
+
+from db.factory import generate
+from db.models.base import Base
+from db.session import engine
+
+
+@pytest.fixture(scope="class")
+def factory_data(request):
+    """Customers, loans and payments generated for the tests of a class, in a
+    transaction rolled back after them. The options of `db.factory.generate`
+    come from the `factory` marker of the class, the connection and the report
+    are set on the class as `conn` and `report`."""
+
+    marker = request.node.get_closest_marker("factory")
+    options = {"customers": 1_000, **(marker.kwargs if marker else {})}
+
+    Base.metadata.create_all(engine)
+
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        report = generate(conn=conn, **options)
+
+        if request.cls is not None:
+            request.cls.conn, request.cls.report = conn, report
+
+        yield conn, report
+
+        transaction.rollback()
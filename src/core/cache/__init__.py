@@ -0,0 +1,26 @@
+from core.cache.base import CacheBackend, CacheStats, NullCache, cache_key
+from core.cache.memory import MemoryCache
+from core.cache.redis import RedisCache
+from core.settings import settings
+
+
+def create_cache() -> CacheBackend:
+    if settings.CACHE_BACKEND == "redis":
+        if not settings.CACHE_URL:
+            raise RuntimeError("CACHE_URL is required by the redis cache backend")
+
+        return RedisCache(ttl=settings.CACHE_TTL, url=settings.CACHE_URL)
+
+    if settings.CACHE_BACKEND == "memory":
+        if settings.WEB_CONCURRENCY > 1:
+            # The other workers would keep serving the records changed by this one
+            raise RuntimeError("The memory cache backend serves a single worker, use redis with WEB_CONCURRENCY > 1")
+
+        return MemoryCache(ttl=settings.CACHE_TTL, max_entries=settings.CACHE_MAX_ENTRIES)
+
+    return NullCache(ttl=settings.CACHE_TTL)
+
+
+cache: CacheBackend = create_cache()
+
+__all__ = ["CacheBackend", "CacheStats", "MemoryCache", "NullCache", "RedisCache", "cache", "cache_key"]
@@ -0,0 +1,101 @@
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from pydantic import BaseModel, computed_field
+
+
+class CacheStats(BaseModel):
+    backend: str
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    invalidations: int = 0
+    evictions: int = 0
+    entries: Optional[int] = None
+
+    @computed_field
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return round(self.hits / lookups, 4) if lookups else 0.0
+
+
+def cache_key(entity: str, record_id: int) -> str:
+    return f"{entity}:{record_id}"
+
+
+class CacheBackend(ABC):
+    """Stores serialized schemas by key, every backend shares the counters of
+    the lookups and writes made by this process."""
+
+    name = "base"
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self.counters = CacheStats(backend=self.name)
+
+    @abstractmethod
+    async def load(self, key: str) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def store(self, key: str, value: str) -> None:
+        ...
+
+    @abstractmethod
+    async def remove(self, *keys: str) -> None:
+        ...
+
+    @abstractmethod
+    def discard(self, *prefixes: str) -> int:
+        ...
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def get(self, key: str) -> Optional[str]:
+        value = await self.load(key)
+
+        if value is None:
+            self.counters.misses += 1
+        else:
+            self.counters.hits += 1
+
+        return value
+
+    async def set(self, key: str, value: str) -> None:  # noqa: A003
+        self.counters.writes += 1
+        await self.store(key, value)
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+
+        self.counters.invalidations += len(keys)
+        await self.remove(*keys)
+
+    def clear(self, *entities: str) -> None:
+        """Drops every cached record of the entities. Synchronous, so the
+        bulk writes of the jobs threads and of the commands invalidate what
+        they changed without an event loop."""
+
+        self.counters.invalidations += self.discard(*[f"{entity}:" for entity in entities])
+
+    def stats(self) -> CacheStats:
+        return self.counters.model_copy(update={"entries": self.size()})
+
+
+class NullCache(CacheBackend):
+    name = "none"
+
+    async def load(self, key: str) -> Optional[str]:  # noqa: ARG002
+        return None
+
+    async def store(self, key: str, value: str) -> None:  # noqa: ARG002
+        return None
+
+    async def remove(self, *keys: str) -> None:  # noqa: ARG002
+        return None
+
+    def discard(self, *prefixes: str) -> int:  # noqa: ARG002
+        return 0
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from core.cache.base import CacheBackend
+
+
+class MemoryCache(CacheBackend):
+    """In-process LRU cache, entries expire `ttl` seconds after being written.
+    Only the writes of this process invalidate it, so it serves a single
+    worker, the records changed by the commands stay stale up to `ttl`."""
+
+    name = "memory"
+
+    def __init__(self, ttl: int, max_entries: int) -> None:
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+
+    async def load(self, key: str) -> Optional[str]:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            return None
+
+        expires, value = entry
+
+        if expires <= time.monotonic():
+            del self.entries[key]
+            self.counters.evictions += 1
+            return None
+
+        # Most recently used entries live at the end
+        self.entries.move_to_end(key)
+        return value
+
+    async def store(self, key: str, value: str) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters.evictions += 1
+
+    async def remove(self, *keys: str) -> None:
+        for key in keys:
+            self.entries.pop(key, None)
+
+    def discard(self, *prefixes: str) -> int:
+        # Iterate over a copy, the jobs threads clear while the event loop reads
+        keys = [key for key in list(self.entries) if key.startswith(prefixes)]
+
+        for key in keys:
+            self.entries.pop(key, None)
+
+        return len(keys)
+
+    def size(self) -> Optional[int]:
+        return len(self.entries)
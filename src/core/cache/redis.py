@@ -0,0 +1,77 @@
+from typing import Optional
+
+from loguru import logger
+
+from core.cache.base import CacheBackend
+
+try:
+    import redis
+    from redis import asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover
+    redis = aioredis = None
+    RedisError = Exception
+
+# Keys unlinked by every round trip of a clear
+DISCARD_BATCH = 1_000
+
+
+class RedisCache(CacheBackend):
+    """Cache shared by every worker, backed by Redis. A failing server degrades
+    to misses so the database keeps serving the requests."""
+
+    name = "redis"
+
+    def __init__(self, ttl: int, url: str) -> None:
+        if aioredis is None:
+            raise RuntimeError("The redis cache backend requires the `redis` package")
+
+        super().__init__(ttl)
+        self.url = url
+        self.client = aioredis.from_url(url, decode_responses=True)
+        # Blocking client of the clears, opened on the first one
+        self.sync_client = None
+
+    async def load(self, key: str) -> Optional[str]:
+        try:
+            return await self.client.get(key)
+        except RedisError as exc:
+            logger.warning(f"Cache lookup failed: {exc}")
+            return None
+
+    async def store(self, key: str, value: str) -> None:
+        try:
+            await self.client.set(key, value, ex=self.ttl)
+        except RedisError as exc:
+            logger.warning(f"Cache write failed: {exc}")
+
+    async def remove(self, *keys: str) -> None:
+        try:
+            await self.client.delete(*keys)
+        except RedisError as exc:
+            logger.warning(f"Cache invalidation failed: {exc}")
+
+    def discard(self, *prefixes: str) -> int:
+        if self.sync_client is None:
+            self.sync_client = redis.Redis.from_url(self.url, decode_responses=True)
+
+        removed = 0
+
+        try:
+            for prefix in prefixes:
+                # SCAN rather than KEYS, the server keeps answering the workers meanwhile
+                batch = []
+
+                for key in self.sync_client.scan_iter(match=f"{prefix}*", count=DISCARD_BATCH):
+                    batch.append(key)
+
+                    if len(batch) == DISCARD_BATCH:
+                        removed += self.sync_client.unlink(*batch)
+                        batch = []
+
+                if batch:
+                    removed += self.sync_client.unlink(*batch)
+        except RedisError as exc:
+            logger.warning(f"Cache invalidation failed: {exc}")
+
+        return removed
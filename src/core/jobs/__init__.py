@@ -0,0 +1,15 @@
+from core.jobs.runner import JobCancelled, JobContext, JobResult, JobRunner
+from core.settings import settings
+
+runner = JobRunner(
+    workers=settings.JOBS_WORKERS,
+    limits=settings.JOBS_LIMITS,
+    poll_seconds=settings.JOBS_POLL_SECONDS,
+    results_dir=settings.JOBS_RESULTS_DIR,
+    lease_seconds=settings.JOBS_LEASE_SECONDS,
+    max_attempts=settings.JOBS_MAX_ATTEMPTS,
+    retention_hours=settings.JOBS_RETENTION_HOURS,
+    sweep_seconds=settings.JOBS_SWEEP_SECONDS,
+)
+
+__all__ = ["JobCancelled", "JobContext", "JobResult", "JobRunner", "runner"]
@@ -0,0 +1,541 @@
+import asyncio
+import contextlib
+import threading
+import time
+from collections import Counter
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+from loguru import logger
+from pydantic import BaseModel, ValidationError
+from sqlalchemy import case, delete, func, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import JobORM
+from db.session import AsyncDBSession, engine
+
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = "queued", "running", "succeeded", "failed", "cancelled"
+
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+# Seconds between two progress writes of a job
+PROGRESS_INTERVAL = 0.5
+
+# Directory of the uploaded files waiting for their jobs, within the results directory
+UPLOADS_DIR = "uploads"
+
+
+class JobCancelled(Exception):  # noqa: N818
+    pass
+
+
+@dataclass
+class JobResult:
+    """What a handler hands back: a small JSON document, a file, or both."""
+
+    data: Optional[dict] = None
+    path: Optional[Path] = None
+    media_type: Optional[str] = None
+    filename: Optional[str] = None
+
+
+class JobContext:
+    """Handle given to a running handler. `progress` records how far the job
+    went and raises `JobCancelled` once a cancellation was requested, from
+    this process or any other one, or once the claim of the runner expired
+    and the job was given to another one."""
+
+    def __init__(self, job_id: int, attempt: int, results_dir: Path) -> None:
+        self.job_id = job_id
+        self.attempt = attempt
+        self.results_dir = results_dir
+        self.cancelled = threading.Event()
+        self.reported = 0.0
+
+    def result_path(self, extension: str) -> Path:
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+        return self.results_dir / f"job-{self.job_id}.{extension}"
+
+    def check(self) -> None:
+        if self.cancelled.is_set():
+            raise JobCancelled("Job cancelled")
+
+    def progress(self, fraction: Optional[float] = None, message: Optional[str] = None, *, force: bool = False) -> None:
+        """The function `progress` records the progress of the job, at most
+        every `PROGRESS_INTERVAL` seconds, and picks up the cancellations
+        requested by other processes.
+
+        Parameters
+        ----------
+        fraction : float, optional
+            The share of the work done, from 0 to 1.
+        message : str, optional
+            A description of the progress, such as the amount of records done.
+        force : bool
+            Whether to write even when the last write is recent.
+        """
+
+        self.check()
+        now = time.monotonic()
+
+        if not force and now - self.reported < PROGRESS_INTERVAL:
+            return
+
+        self.reported = now
+
+        # Runs on a worker thread, the sync engine doesn't block the event loop
+        with engine.begin() as conn:
+            requested = conn.scalar(
+                update(JobORM)
+                .where(JobORM.id == self.job_id, JobORM.status == RUNNING, JobORM.attempts == self.attempt)
+                .values(progress=fraction, message=message)
+                .returning(JobORM.cancel_requested)
+            )
+
+        # The claim expired, the job was requeued or given up while this runner was stuck
+        if requested is None:
+            self.cancelled.set()
+            raise JobCancelled("Job lease lost")
+
+        if requested:
+            self.cancelled.set()
+            self.check()
+
+
+@dataclass
+class JobType:
+    handler: Callable[[JobContext, Any], JobResult]
+    params: type[BaseModel]
+    limit: int
+
+
+class JobRunner:
+    """Runs the jobs of the `jobs` table in a bounded pool of threads.
+
+    A dispatcher task claims the queued jobs with `FOR UPDATE SKIP LOCKED`,
+    so several processes share the queue without running a job twice. Every
+    process runs at most `workers` jobs at once, and at most the limit of its
+    type for every type. The handlers are plain functions, the blocking work
+    stays off the event loop.
+
+    A claim is a lease renewed by the dispatcher on every poll. The jobs whose
+    runner died without releasing them, such as after a crash or a kill, are
+    queued again once their lease expires, and failed after `max_attempts`
+    claims. Every claim numbers an attempt, the writes of an older attempt
+    are ignored.
+
+    Every `sweep_seconds` the dispatcher deletes the jobs finished more than
+    `retention_hours` ago along with their files, and the files of the
+    results directory that no job refers to anymore."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        workers: int,
+        limits: str,
+        poll_seconds: float,
+        results_dir: str,
+        lease_seconds: float = 60,
+        max_attempts: int = 3,
+        retention_hours: float = 168,
+        sweep_seconds: float = 3600,
+    ) -> None:
+        self.workers = workers
+        self.limits = parse_limits(limits)
+        self.poll_seconds = poll_seconds
+        self.results_dir = Path(results_dir)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+        self.sweep_seconds = sweep_seconds
+        self.swept: Optional[float] = None
+        self.types: dict[str, JobType] = {}
+        self.running: Counter[str] = Counter()
+        self.contexts: dict[int, JobContext] = {}
+        self.tasks: set[asyncio.Task] = set()
+        self.executor: Optional[ThreadPoolExecutor] = None
+        self.dispatcher: Optional[asyncio.Task] = None
+        self.wakeup: Optional[asyncio.Event] = None
+        self.stopping = False
+
+    def register(self, name: str, params: type[BaseModel], limit: int = 1) -> Callable:
+        def decorator(handler: Callable[[JobContext, Any], JobResult]) -> Callable:
+            self.types[name] = JobType(handler=handler, params=params, limit=self.limits.get(name, limit))
+            return handler
+
+        return decorator
+
+    @property
+    def started(self) -> bool:
+        return self.dispatcher is not None
+
+    def upload_path(self, name: str) -> Path:
+        return self.results_dir / UPLOADS_DIR / name
+
+    def job_files(self, result_path: Optional[str], params: Optional[dict]) -> list[Path]:
+        """The function `job_files` lists the files of a job: its result and
+        the upload it imports."""
+
+        files = [Path(result_path)] if result_path else []
+
+        if params and params.get("upload"):
+            files.append(self.upload_path(params["upload"]))
+
+        return files
+
+    async def start(self) -> None:
+        self.stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="job")
+        self.wakeup = asyncio.Event()
+        self.dispatcher = asyncio.create_task(self.dispatch())
+        logger.info(f"Job runner started with {self.workers} workers")
+
+    async def stop(self) -> None:
+        """The function `stop` stops claiming jobs and interrupts the running
+        ones, which go back to the queue for the next start of a runner."""
+
+        if self.dispatcher is None:
+            return
+
+        self.stopping = True
+        self.dispatcher.cancel()
+
+        for context in self.contexts.values():
+            context.cancelled.set()
+
+        await asyncio.gather(self.dispatcher, *self.tasks, return_exceptions=True)
+        await asyncio.to_thread(self.executor.shutdown, wait=True)
+
+        self.dispatcher = None
+        logger.info("Job runner stopped")
+
+    async def submit(self, db: AsyncSession, name: str, params: dict) -> JobORM:
+        """The function `submit` validates and queues a job.
+
+        Parameters
+        ----------
+        db : AsyncSession
+            The session of the request, committed by the function.
+        name : str
+            The type of the job.
+        params : dict
+            The parameters of the job, validated with the model of its type.
+
+        Returns
+        -------
+            the queued job.
+        """
+
+        if name not in self.types:
+            raise ValueError(f"Unknown job type, expected one of: {', '.join(sorted(self.types))}")
+
+        try:
+            values = self.types[name].params.model_validate(params).model_dump(mode="json")
+        except ValidationError as exc:
+            raise ValueError(f"Invalid parameters: {exc.errors(include_url=False)}") from exc
+
+        job = JobORM(type=name, status=QUEUED, params=values)
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+
+        self.notify()
+        return job
+
+    async def cancel(self, db: AsyncSession, job: JobORM) -> JobORM:
+        """The function `cancel` cancels a queued job right away, or asks a
+        running one to stop at its next progress report.
+
+        Parameters
+        ----------
+        db : AsyncSession
+            The session of the request, committed by the function.
+        job : JobORM
+            The job, loaded by the request.
+
+        Returns
+        -------
+            the job with its new state.
+        """
+
+        if job.status in FINISHED:
+            raise ValueError(f"Job already {job.status}")
+
+        # Both updates are guarded by the status, the job may have moved on since it was read
+        cancelled = await db.scalar(
+            update(JobORM)
+            .where(JobORM.id == job.id, JobORM.status == QUEUED)
+            .values(status=CANCELLED, finished=func.now())
+            .returning(JobORM.id)
+        )
+
+        if cancelled is None:
+            await db.execute(
+                update(JobORM).where(JobORM.id == job.id, JobORM.status == RUNNING).values(cancel_requested=True)
+            )
+
+        await db.commit()
+
+        if job.id in self.contexts:
+            self.contexts[job.id].cancelled.set()
+
+        await db.refresh(job)
+        return job
+
+    async def delete(self, db: AsyncSession, job: JobORM) -> None:
+        """The function `delete` deletes a finished job along with its files.
+
+        Parameters
+        ----------
+        db : AsyncSession
+            The session of the request, committed by the function.
+        job : JobORM
+            The job, loaded by the request.
+        """
+
+        # Guarded by the status, the job may have been claimed since it was read
+        deleted = await db.scalar(
+            delete(JobORM).where(JobORM.id == job.id, JobORM.status.in_(FINISHED)).returning(JobORM.id)
+        )
+
+        if deleted is None:
+            raise ValueError(f"Job {job.status}, cancel it first")
+
+        await db.commit()
+        await asyncio.to_thread(remove_files, self.job_files(job.result_path, job.params))
+
+    async def sweep(self) -> int:
+        """The function `sweep` deletes the jobs finished before the retention
+        along with their files, then the files older than the retention no
+        job refers to, such as the ones of the jobs deleted by hand.
+
+        Returns
+        -------
+            the amount of jobs deleted.
+        """
+
+        retention = timedelta(hours=self.retention_hours)
+
+        async with AsyncDBSession() as db:
+            deleted = (
+                await db.execute(
+                    delete(JobORM)
+                    .where(JobORM.status.in_(FINISHED), JobORM.finished < func.now() - retention)
+                    .returning(JobORM.result_path, JobORM.params)
+                )
+            ).all()
+            await db.commit()
+
+            kept = (
+                await db.execute(
+                    select(JobORM.result_path, JobORM.params).where(
+                        or_(JobORM.result_path.is_not(None), JobORM.params.has_key("upload"))
+                    )
+                )
+            ).all()
+
+        files = [path for job in deleted for path in self.job_files(job.result_path, job.params)]
+        referenced = {path.resolve() for job in kept for path in self.job_files(job.result_path, job.params)}
+
+        await asyncio.to_thread(remove_files, files)
+        await asyncio.to_thread(self.remove_orphans, referenced, time.time() - retention.total_seconds())
+
+        if deleted:
+            logger.info(f"{len(deleted)} jobs finished before {retention} ago deleted")
+
+        return len(deleted)
+
+    def remove_orphans(self, referenced: set[Path], before: float) -> None:
+        if not self.results_dir.exists():
+            return
+
+        for path in self.results_dir.rglob("*"):
+            if path.is_file() and path.stat().st_mtime < before and path.resolve() not in referenced:
+                path.unlink(missing_ok=True)
+
+    def notify(self) -> None:
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+    async def dispatch(self) -> None:
+        while True:
+            self.wakeup.clear()
+
+            try:
+                await self.renew()
+                await self.recover()
+                await self.claim()
+            except Exception as exc:
+                logger.error(f"Failed to claim jobs: {exc}")
+
+            if self.swept is None or time.monotonic() - self.swept >= self.sweep_seconds:
+                self.swept = time.monotonic()
+
+                try:
+                    await self.sweep()
+                except Exception as exc:
+                    logger.error(f"Failed to sweep jobs: {exc}")
+
+            with contextlib.suppress(TimeoutError):
+                await asyncio.wait_for(self.wakeup.wait(), timeout=self.poll_seconds)
+
+    async def renew(self) -> None:
+        """The function `renew` extends the leases of the jobs running in this
+        process."""
+
+        if not self.contexts:
+            return
+
+        claims = [(context.job_id, context.attempt) for context in self.contexts.values()]
+
+        async with AsyncDBSession() as db:
+            await db.execute(
+                update(JobORM)
+                .where(tuple_(JobORM.id, JobORM.attempts).in_(claims), JobORM.status == RUNNING)
+                .values(heartbeat=func.now())
+            )
+            await db.commit()
+
+    async def recover(self) -> None:
+        """The function `recover` releases the running jobs whose lease
+        expired: the cancelled ones are finished, the ones claimed
+        `max_attempts` times are failed and the others are queued again."""
+
+        cancelled = JobORM.cancel_requested
+        exhausted = JobORM.attempts >= self.max_attempts
+        queued = ~cancelled & ~exhausted
+
+        async with AsyncDBSession() as db:
+            jobs = (
+                await db.execute(
+                    update(JobORM)
+                    .where(
+                        JobORM.status == RUNNING,
+                        JobORM.heartbeat < func.now() - timedelta(seconds=self.lease_seconds),
+                    )
+                    .values(
+                        status=case((cancelled, CANCELLED), (exhausted, FAILED), else_=QUEUED),
+                        error=case(
+                            (queued | cancelled, None), else_=f"Abandoned by its runner {self.max_attempts} times"
+                        ),
+                        started=case((queued, None), else_=JobORM.started),
+                        finished=case((queued, None), else_=func.now()),
+                        progress=case((queued, None), else_=JobORM.progress),
+                        message=case((queued, None), else_=JobORM.message),
+                    )
+                    .returning(JobORM.id, JobORM.type, JobORM.status)
+                )
+            ).all()
+            await db.commit()
+
+        for job in jobs:
+            logger.warning(f"Job {job.id} ({job.type}) lost its runner, {job.status}")
+
+    async def claim(self) -> None:
+        for name, job_type in self.types.items():
+            free = min(job_type.limit - self.running[name], self.workers - sum(self.running.values()))
+
+            if free <= 0:
+                continue
+
+            claimable = (
+                select(JobORM.id)
+                .where(JobORM.status == QUEUED, JobORM.type == name)
+                .order_by(JobORM.id)
+                .limit(free)
+                .with_for_update(skip_locked=True)
+            )
+
+            async with AsyncDBSession() as db:
+                jobs = (
+                    await db.scalars(
+                        update(JobORM)
+                        .where(JobORM.id.in_(claimable.scalar_subquery()))
+                        .values(
+                            status=RUNNING,
+                            started=func.now(),
+                            heartbeat=func.now(),
+                            attempts=JobORM.attempts + 1,
+                            progress=0,
+                        )
+                        .returning(JobORM),
+                        execution_options={"synchronize_session": False},
+                    )
+                ).all()
+                await db.commit()
+
+            for job in jobs:
+                self.running[name] += 1
+                task = asyncio.create_task(self.run(job))
+                self.tasks.add(task)
+                task.add_done_callback(self.tasks.discard)
+
+    async def run(self, job: JobORM) -> None:
+        job_type = self.types[job.type]
+        context = JobContext(job.id, job.attempts, self.results_dir)
+        self.contexts[job.id] = context
+        values = {"finished": func.now()}
+
+        logger.info(f"Job {job.id} ({job.type}) started")
+
+        try:
+            params = job_type.params.model_validate(job.params)
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self.executor, job_type.handler, context, params)
+
+            values.update(
+                status=SUCCEEDED,
+                progress=1,
+                result=result.data,
+                result_path=str(result.path) if result.path else None,
+                result_media_type=result.media_type,
+                result_filename=result.filename,
+            )
+        except JobCancelled:
+            if self.stopping and not await self.cancel_requested(job.id):
+                # Interrupted by a shutdown, another start picks it up again
+                values = {"status": QUEUED, "started": None, "progress": None, "message": None}
+            else:
+                values.update(status=CANCELLED)
+        except Exception as exc:
+            logger.exception(f"Job {job.id} ({job.type}) failed")
+            values.update(status=FAILED, error=str(exc))
+        finally:
+            self.running[job.type] -= 1
+
+            # A newer attempt of the job may run in this process already
+            if self.contexts.get(job.id) is context:
+                del self.contexts[job.id]
+
+        # Guarded by the attempt, a job whose lease expired belongs to another runner by now
+        async with AsyncDBSession() as db:
+            finished = await db.scalar(
+                update(JobORM)
+                .where(JobORM.id == job.id, JobORM.status == RUNNING, JobORM.attempts == job.attempts)
+                .values(**values)
+                .returning(JobORM.id)
+            )
+            await db.commit()
+
+        if finished is None:
+            logger.warning(f"Job {job.id} ({job.type}) lost its lease, its outcome is discarded")
+        else:
+            logger.info(f"Job {job.id} ({job.type}) {values['status']}")
+        self.notify()
+
+    async def cancel_requested(self, job_id: int) -> bool:
+        async with AsyncDBSession() as db:
+            return bool(await db.scalar(select(JobORM.cancel_requested).where(JobORM.id == job_id)))
+
+
+def remove_files(paths: list[Path]) -> None:
+    for path in paths:
+        path.unlink(missing_ok=True)
+
+
+def parse_limits(limits: str) -> dict[str, int]:
+    pairs = (pair.split("=", 1) for pair in limits.split(",") if pair.strip())
+    return {name.strip(): int(limit) for name, limit in pairs}
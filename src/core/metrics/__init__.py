@@ -0,0 +1,7 @@
+from core.metrics.registry import Counter, Gauge, Histogram, Registry
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = Registry()
+
+__all__ = ["CONTENT_TYPE", "Counter", "Gauge", "Histogram", "Registry", "registry"]
@@ -0,0 +1,169 @@
+from bisect import bisect_left
+from collections.abc import Callable, Iterator, Sequence
+
+# Latency buckets in seconds, from a cached retrieve to a large export
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+
+    return (
+        "{" + ",".join(f'{name}="{escape_label(str(value))}"' for name, value in zip(names, values, strict=True)) + "}"
+    )
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+
+    return repr(float(value))
+
+
+class Metric:
+    """Base of the metric families, every combination of label values has its
+    own child, created on first use and kept for the life of the process."""
+
+    type = "untyped"  # noqa: A003
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.children: dict[tuple, object] = {}
+
+    def new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        child = self.children.get(values)
+
+        if child is None:
+            child = self.children[values] = self.new_child()
+
+        return child
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.type}\n"
+        return header + "".join(f"{sample}\n" for sample in self.samples())
+
+
+class Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:  # noqa: A003
+        self.value = value
+
+
+class Counter(Metric):
+    type = "counter"  # noqa: A003
+
+    def new_child(self) -> Value:
+        return Value()
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self.children.items():
+            yield f"{self.name}{format_labels(self.labelnames, values)} {format_value(child.value)}"
+
+
+class Gauge(Counter):
+    type = "gauge"  # noqa: A003
+
+
+class HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds: tuple[float, ...]) -> None:
+        self.bounds = bounds
+        # One slot per bucket plus +Inf, made cumulative when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(Metric):
+    type = "histogram"  # noqa: A003
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.bounds = tuple(sorted(buckets))
+
+    def new_child(self) -> HistogramValue:
+        return HistogramValue(self.bounds)
+
+    def samples(self) -> Iterator[str]:
+        names = (*self.labelnames, "le")
+
+        for values, child in self.children.items():
+            cumulative = 0
+
+            for bound, count in zip((*self.bounds, float("inf")), child.counts, strict=True):
+                cumulative += count
+                yield f"{self.name}_bucket{format_labels(names, (*values, format_value(bound)))} {cumulative}"
+
+            labels = format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {format_value(child.sum)}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """Keeps the metric families of the process and renders them with the
+    Prometheus text exposition format.
+
+    Every worker process has its own registry, Prometheus scrapes and sums
+    them as separate targets."""
+
+    def __init__(self) -> None:
+        self.metrics: dict[str, Metric] = {}
+        self.collectors: list[Callable[[], None]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, function: Callable[[], None]) -> Callable[[], None]:
+        # Refreshes gauges whose values are read on scrape, such as the pool occupation
+        self.collectors.append(function)
+        return function
+
+    def render(self) -> str:
+        for collect in self.collectors:
+            collect()
+
+        return "".join(metric.render() for metric in self.metrics.values())
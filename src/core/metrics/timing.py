@@ -0,0 +1,56 @@
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class RequestTiming:
+    """Time spent by the current request in every phase, in seconds. The
+    database phase is filled by the cursor events of the engines."""
+
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db: float = 0
+    serialize: float = 0
+
+    def server_timing(self) -> str:
+        total = time.perf_counter() - self.started
+        app = max(total - self.db - self.serialize, 0)
+
+        return ", ".join(
+            [
+                f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+                f"serialize;dur={self.serialize * 1000:.1f}",
+                f"app;dur={app * 1000:.1f}",
+                f"total;dur={total * 1000:.1f}",
+            ]
+        )
+
+
+# Set by the ServerTimingMiddleware, `None` outside of a request
+request_timing: ContextVar[Optional[RequestTiming]] = ContextVar("request_timing", default=None)
+
+
+def record_query(elapsed: float) -> None:
+    timing = request_timing.get()
+
+    if timing is not None:
+        timing.queries += 1
+        timing.db += elapsed
+
+
+@contextmanager
+def serializing() -> Iterator[None]:
+    # Times the conversion of the records into schemas
+    started = time.perf_counter()
+
+    try:
+        yield
+    finally:
+        timing = request_timing.get()
+
+        if timing is not None:
+            timing.serialize += time.perf_counter() - started
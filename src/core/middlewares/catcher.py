@@ -1,42 +1,68 @@
-from fastapi import HTTPException, Request, status
+from fastapi import HTTPException, status
 from fastapi.responses import JSONResponse
 from loguru import logger
 from pydantic import ValidationError
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from core.utils.exceptions import ObjectNotFound
 from core.utils.responses import EnvelopeResponse
 
 
-class CatcherExceptionMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app):
-        super().__init__(app)
+class CatcherExceptionMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal response_started
+
+            if message["type"] == "http.response.start":
+                response_started = True
+
+            await send(message)
 
-    async def dispatch(self, request: Request, call_next):
         try:
-            return await call_next(request)
-        except HTTPException as http_exception:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # Headers already sent, the error envelope can't replace the response
+            if response_started:
+                raise
+
+            response = self.handle_exception(exc)
+            await response(scope, receive, send)
+
+    @staticmethod
+    def handle_exception(exc: Exception) -> JSONResponse:
+        if isinstance(exc, HTTPException):
             return JSONResponse(
-                status_code=http_exception.status_code,
+                status_code=exc.status_code,
                 content={
                     "error": "Client Error",
-                    "message": str(http_exception.detail),
+                    "message": str(exc.detail),
                 },
             )
-        except ObjectNotFound as object_no_found:
-            response = EnvelopeResponse(errors=object_no_found.args, body=None)
+
+        if isinstance(exc, ObjectNotFound):
+            response = EnvelopeResponse(errors=exc.args, body=None)
             logger.exception(response)
             return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content=dict(response))
-        except ValidationError as errors:
-            response = EnvelopeResponse(errors=[error.get("msg") for error in errors.errors()])
+
+        if isinstance(exc, ValidationError):
+            response = EnvelopeResponse(errors=[error.get("msg") for error in exc.errors()])
             return JSONResponse(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 content=dict(response),
             )
-        except Exception as error:
-            logger.error("-" * 80)
-            logger.info(error)
-            logger.error("-" * 80)
-            response = EnvelopeResponse(errors=error.args, body=None)
-            logger.exception(response)
-            return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=dict(response))
+
+        logger.error("-" * 80)
+        logger.info(exc)
+        logger.error("-" * 80)
+        response = EnvelopeResponse(errors=exc.args, body=None)
+        logger.exception(response)
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=dict(response))
@@ -0,0 +1,59 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.metrics import registry
+
+# Response sizes in bytes, from an empty 304 to a large page
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Requests that didn't match any route share a label, raw paths would explode the cardinality
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUESTS = registry.counter("http_requests_total", "Requests served", ("method", "route", "status"))
+IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests being served", ("method",))
+LATENCY = registry.histogram("http_request_duration_seconds", "Request latency in seconds", ("method", "route"))
+RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "Response body size in bytes", ("method", "route"), buckets=SIZE_BUCKETS
+)
+
+
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, size
+
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels(method)
+        in_flight.inc()
+        started = time.perf_counter()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+
+            # The router stores the matched route in the scope, its path is the template
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+
+            REQUESTS.labels(method, route, str(status_code)).inc()
+            LATENCY.labels(method, route).observe(elapsed)
+            RESPONSE_SIZE.labels(method, route).observe(size)
@@ -0,0 +1,32 @@
+from starlette import status
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.settings import settings
+from db.replicas import READ_PRIMARY_COOKIE
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+class ReadYourWritesMiddleware:
+    """Pins the reads of a client to the primary for a few seconds after a
+    successful write, so they don't hit a replica that's still behind."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.cookie = (
+            f"{READ_PRIMARY_COOKIE}=1; Max-Age={settings.READ_YOUR_WRITES_SECONDS}; Path=/; HttpOnly; SameSite=Lax"
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] in SAFE_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start" and message["status"] < status.HTTP_400_BAD_REQUEST:
+                MutableHeaders(scope=message).append("set-cookie", self.cookie)
+
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
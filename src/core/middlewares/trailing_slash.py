@@ -1,12 +1,22 @@
 from urllib.parse import urlencode, urlunparse
 
+from fastapi import Request
 from fastapi.responses import RedirectResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 
-class TrailingSlashMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        if request.url.path.endswith("/") and request.query_params:
+class TrailingSlashMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].endswith("/"):
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
+        if request.query_params:
             new_path = request.url.path[:-1]
             new_url = urlunparse(
                 (
@@ -18,10 +28,10 @@ class TrailingSlashMiddleware(BaseHTTPMiddleware):
                     "",
                 )
             )
-            return RedirectResponse(url=new_url, status_code=308)
+            response = RedirectResponse(url=new_url, status_code=308)
 
-        elif request.url.path.endswith("/"):  # noqa: RET505
+        else:
             new_path = request.url.path[:-1]
-            return RedirectResponse(url=new_path, status_code=308)
+            response = RedirectResponse(url=new_path, status_code=308)
 
-        return await call_next(request)
+        await response(scope, receive, send)
@@ -1,5 +1,5 @@
 import os
-from typing import ClassVar
+from typing import ClassVar, Literal, Optional
 
 from dotenv import load_dotenv
 from pydantic import PostgresDsn
@@ -20,13 +20,60 @@ class Settings(BaseSettings):
     VERSION: str = "1.0.0"
     API_V1: str = "v1"
     DEFAULT_PAGE_SIZE: int = 30
+    BULK_CHUNK_SIZE: int = 1000
 
     # Database Settings
     # ----------------------------------------------------------------------------------
     POSTGRESQL_URL: PostgresDsn
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+
+    # Statements slower than this are logged with their fingerprint
+    SLOW_QUERY_SECONDS: float = 0.5
+
+    # Comma separated URLs of the read replicas, reads use the primary when empty
+    POSTGRESQL_REPLICA_URLS: str = ""
+    REPLICA_EJECTION_SECONDS: float = 30
+    READ_YOUR_WRITES_SECONDS: int = 5
+
+    # Schema and demo records created by every worker on startup. Production applies the migrations with
+    # `python -m commands.migrate` before starting the workers instead
+    DB_CREATE_SCHEMA: bool = ENVIRONMENT != "production"
+    DB_SEED: bool = False
+
+    # Cache Settings
+    # ----------------------------------------------------------------------------------
+    # The memory backend is only invalidated by the writes of its own process, several workers require redis
+    CACHE_BACKEND: Literal["memory", "redis", "none"] = "memory"
+    CACHE_URL: Optional[str] = None
+    CACHE_TTL: int = 60
+    CACHE_MAX_ENTRIES: int = 10_000
+
+    # Jobs Settings
+    # ----------------------------------------------------------------------------------
+    JOBS_ENABLED: bool = True
+    JOBS_WORKERS: int = 4
+    # Comma separated type=limit pairs, the types not listed use their default limit
+    JOBS_LIMITS: str = ""
+    JOBS_POLL_SECONDS: float = 2
+    JOBS_RESULTS_DIR: str = "job-results"
+    # Seconds a running job stays claimed without news of its runner, then it's queued again
+    JOBS_LEASE_SECONDS: float = 60
+    # Claims of a job whose runners died before it's failed
+    JOBS_MAX_ATTEMPTS: int = 3
+    # Hours the finished jobs and their files are kept, and seconds between two deletions of the older ones
+    JOBS_RETENTION_HOURS: float = 168
+    JOBS_SWEEP_SECONDS: float = 3600
 
     # API Settings
     # ----------------------------------------------------------------------------------
+    # OpenAPI document built by `python -m commands.build_openapi`, built on the first request of the docs when empty
+    OPENAPI_FILE: str = ""
+    # Worker processes serving the API, read by uvicorn and gunicorn as well
+    WEB_CONCURRENCY: int = 1
     CORS_ALLOWED_ORIGINS: ClassVar[list[str]] = ["*"]
 
     model_config = SettingsConfigDict(extra="ignore", case_sensitive=True)
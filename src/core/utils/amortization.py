@@ -0,0 +1,179 @@
+import calendar
+from dataclasses import dataclass
+from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Literal, Optional
+
+import numpy as np
+
+AmortizationMethod = Literal["french", "german"]
+
+# Terms of the loans created without them, the same 15% interest and 16% tax charged on the payments
+DEFAULT_RATE = Decimal("0.15")
+DEFAULT_TERM = 12
+DEFAULT_METHOD: AmortizationMethod = "french"
+DEFAULT_TAX_RATE = Decimal("0.16")
+
+PERIODS_PER_YEAR = 12
+
+CENT = Decimal("0.01")
+
+
+def to_cents(amount) -> int:
+    return int((Decimal(str(amount)) * 100).to_integral_value(ROUND_HALF_UP))
+
+
+def from_cents(cents) -> Decimal:
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def charge_interest(amount, rate, tax_rate) -> Decimal:
+    """The function `charge_interest` adds the interest and the tax on the
+    interest to the amount of a payment.
+
+    Parameters
+    ----------
+    amount
+        The amount paid.
+    rate
+        The interest rate charged on the payment.
+    tax_rate
+        The tax rate charged on the interest.
+
+    Returns
+    -------
+        the charged amount, rounded half up to cents.
+    """
+
+    amount, rate, tax_rate = Decimal(str(amount)), Decimal(str(rate)), Decimal(str(tax_rate))
+    return (amount + amount * rate * (1 + tax_rate)).quantize(CENT, ROUND_HALF_UP)
+
+
+def add_months(day: date, months: int) -> date:
+    # Clamped to the end of shorter months, the 31st of January is due the 28th or 29th of February
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    return date(year, month, min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def round_cents(values: np.ndarray) -> np.ndarray:
+    # Half up on the non-negative amounts in cents, np.rint would round half to even
+    return np.floor(values + 0.5)
+
+
+@dataclass
+class Amortization:
+    """Schedules of a batch of loans, every amount in cents. The totals have
+    one value per loan, the periods one row per loan and one column per
+    period, zero after the term of the loan."""
+
+    installment: np.ndarray
+    total_interest: np.ndarray
+    total_tax: np.ndarray
+    total_payment: np.ndarray
+    principal: Optional[np.ndarray] = None
+    interest: Optional[np.ndarray] = None
+    tax: Optional[np.ndarray] = None
+    balance: Optional[np.ndarray] = None
+
+
+def amortize(principal, annual_rate, term, german, tax_rate, *, periods: bool = False) -> Amortization:  # noqa: PLR0913
+    """The function `amortize` computes the schedules of many loans at once.
+    Every period is computed for all the loans still running with array
+    operations, so the cost grows with the sum of the terms.
+
+    The interest of every period is rounded to cents on the outstanding
+    balance, the French installment and the German amortization are rounded
+    once, and the last period absorbs the rounding residual so the principal
+    is repaid exactly.
+
+    Parameters
+    ----------
+    principal
+        The amounts lent, in cents.
+    annual_rate
+        The nominal annual interest rates, `0.15` is 15%.
+    term
+        The amount of monthly periods, at least one.
+    german
+        `True` for constant amortization (German), `False` for a constant
+    installment (French).
+    tax_rate
+        The tax rates charged on the interest.
+    periods : bool
+        Whether to keep the amounts of every period, only the totals are
+    computed otherwise.
+
+    Returns
+    -------
+        the installments and totals of the loans, in the order received.
+    """
+
+    principal = np.asarray(principal, dtype=np.float64)
+    rate = np.asarray(annual_rate, dtype=np.float64) / PERIODS_PER_YEAR
+    term = np.asarray(term, dtype=np.int64)
+    german = np.asarray(german, dtype=bool)
+    tax_rate = np.asarray(tax_rate, dtype=np.float64)
+
+    if np.any(term < 1):
+        raise ValueError("The term must be at least one period")
+
+    # Longest terms first, the loans still running at any period are a prefix
+    order = np.argsort(-term, kind="stable")
+    principal, rate, term, german, tax_rate = (values[order] for values in (principal, rate, term, german, tax_rate))
+    running = np.searchsorted(-term, -np.arange(int(term.max(initial=0))), side="left")
+
+    growth = (1 + rate) ** term
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        level = np.where(rate > 0, principal * rate * growth / (growth - 1), principal / term)
+
+    level = round_cents(level)
+    straight = round_cents(principal / term)
+
+    balance = principal.copy()
+    installment = np.zeros_like(principal)
+    total_interest = np.zeros_like(principal)
+    total_tax = np.zeros_like(principal)
+
+    shape = (len(principal), len(running))
+    rows = {name: np.zeros(shape) for name in ("principal", "interest", "tax", "balance")} if periods else None
+
+    for period, count in enumerate(running):
+        current = balance[:count]
+
+        interest = round_cents(current * rate[:count])
+        amortization = np.where(german[:count], straight[:count], level[:count] - interest)
+        # The last period repays whatever the rounding left
+        amortization = np.where(term[:count] == period + 1, current, np.minimum(amortization, current))
+        tax = round_cents(interest * tax_rate[:count])
+
+        balance[:count] -= amortization
+        total_interest[:count] += interest
+        total_tax[:count] += tax
+
+        if period == 0:
+            installment[:] = amortization + interest + tax
+
+        if rows is not None:
+            rows["principal"][:count, period] = amortization
+            rows["interest"][:count, period] = interest
+            rows["tax"][:count, period] = tax
+            rows["balance"][:count, period] = balance[:count]
+
+    # Back to the order of the loans received
+    restore = np.empty_like(order)
+    restore[order] = np.arange(len(order))
+
+    result = Amortization(
+        installment=installment[restore],
+        total_interest=total_interest[restore],
+        total_tax=total_tax[restore],
+        total_payment=(principal + total_interest + total_tax)[restore],
+    )
+
+    if rows is not None:
+        for name, values in rows.items():
+            setattr(result, name, values[restore])
+
+    return result
@@ -0,0 +1,27 @@
+from itertools import islice
+
+
+def chunked(items, size: int):
+    """The function `chunked` splits an iterable in lists of at most `size`
+    elements, keeping their order.
+
+    Parameters
+    ----------
+    items
+        The iterable to split.
+    size : int
+        The maximum amount of elements of every chunk.
+
+    Returns
+    -------
+        a generator of lists.
+    """
+
+    iterator = iter(items)
+
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def row_error(index: int, message: str) -> dict:
+    return {"index": index, "error": message}
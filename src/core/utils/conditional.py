@@ -0,0 +1,149 @@
+import hashlib
+from datetime import datetime
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response, status
+from pydantic import BaseModel
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
+
+
+class Validators(BaseModel):
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    def headers(self) -> dict[str, str]:
+        headers = {"ETag": self.etag}
+
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified, usegmt=True)
+
+        return headers
+
+
+class CachedRecord(BaseModel):
+    body: dict
+    validators: Validators
+
+
+def record_etag(record_id: int, modified: Optional[datetime]) -> str:
+    version = int(modified.timestamp() * 1_000_000) if modified else 0
+    return f'W/"{record_id}-{version}"'
+
+
+def record_validators(record) -> Validators:
+    return Validators(etag=record_etag(record.id, record.modified), last_modified=record.modified)
+
+
+def page_validators(items, next_cursor: Optional[str] = None, total: Optional[int] = None) -> Validators:
+    """The function `page_validators` computes the validators of a list page
+    from the `id` and `modified` values of its records.
+
+    Parameters
+    ----------
+    items
+        The records of the page, only `id` and `modified` are read.
+    next_cursor : Optional[str]
+        The cursor of the next page, part of the response body.
+    total : Optional[int]
+        The amount of matching records, part of the response body.
+
+    Returns
+    -------
+        the validators of the page, `last_modified` is the most recent
+    `modified` value of its records.
+    """
+
+    digest = hashlib.blake2b(digest_size=16)
+    last_modified = None
+
+    for item in items:
+        digest.update(f"{item.id}:{item.modified.isoformat() if item.modified else ''};".encode())
+
+        if item.modified is not None and (last_modified is None or item.modified > last_modified):
+            last_modified = item.modified
+
+    digest.update(f"{next_cursor}:{total}".encode())
+    return Validators(etag=f'W/"{digest.hexdigest()}"', last_modified=last_modified)
+
+
+async def fetch_record_validators(db: AsyncSession, model, record_id: int) -> Optional[Validators]:
+    """The function `fetch_record_validators` reads the validators of a record
+    with an index-only scan over its `id`/`modified` covering index.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the query.
+    model
+        The ORM class of the record.
+    record_id : int
+        The primary key of the record.
+
+    Returns
+    -------
+        the validators of the record, `None` when it doesn't exist.
+    """
+
+    record = (await db.execute(select(model.id, model.modified).filter(model.id == record_id))).first()
+    return record_validators(record) if record is not None else None
+
+
+def validators_query(query: Select, model) -> Select:
+    # Only the columns read by the validators and the cursors are loaded
+    return query.options(load_only(model.id, model.modified, model.created))
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def is_not_modified(request: Request, validators: Validators) -> bool:
+    """The function `is_not_modified` evaluates the conditional headers of a
+    GET request against the current validators of the resource.
+
+    `If-None-Match` takes precedence over `If-Modified-Since`, the weak
+    comparison is used for the entity tags.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    validators : Validators
+        The validators of the current representation.
+
+    Returns
+    -------
+        `True` when the client's copy is still valid.
+    """
+
+    if_none_match = request.headers.get("if-none-match")
+
+    if if_none_match is not None:
+        if if_none_match.strip() == "*":
+            return True
+
+        current = validators.etag.removeprefix("W/")
+        return any(tag.strip().removeprefix("W/") == current for tag in if_none_match.split(","))
+
+    if_modified_since = request.headers.get("if-modified-since")
+
+    if if_modified_since is None or validators.last_modified is None:
+        return False
+
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+
+    if since.tzinfo is None:
+        return False
+
+    # HTTP dates have a resolution of one second
+    return validators.last_modified.replace(microsecond=0) <= since
+
+
+def not_modified_response(validators: Validators) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=validators.headers())
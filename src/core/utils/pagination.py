@@ -0,0 +1,242 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from sqlalchemy import Select, func, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from core.utils.responses import CursorParams, PaginationParams
+
+CURSOR_KEYS = {
+    "id": ("id",),
+    "created": ("created", "id"),
+}
+
+
+class Explain(Executable, ClauseElement):
+    """The class `Explain` wraps a select statement in `EXPLAIN (FORMAT JSON)`,
+    keeping its bound parameters.
+    """
+
+    inherit_cache = False
+
+    def __init__(self, statement: Select) -> None:
+        self.statement = statement
+
+
+@compiles(Explain, "postgresql")
+def compile_explain(element: Explain, compiler, **kw) -> str:
+    return f"EXPLAIN (FORMAT JSON) {compiler.process(element.statement, **kw)}"
+
+
+def encode_cursor(key: str, record) -> str:
+    """The function `encode_cursor` builds the opaque cursor that points right
+    after the given record.
+
+    Parameters
+    ----------
+    key : str
+        The keyset used to order the page, either `id` or `created`.
+    record
+        The last ORM record of the current page.
+
+    Returns
+    -------
+        an url-safe base64 string with the keyset values of the record.
+    """
+
+    values = []
+
+    for column in CURSOR_KEYS[key]:
+        value = getattr(record, column)
+        values.append(value.isoformat() if isinstance(value, datetime) else value)
+
+    payload = json.dumps({"k": key, "v": values}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, list]:
+    """The function `decode_cursor` recovers the keyset and its values from an
+    opaque cursor generated by `encode_cursor`.
+
+    Parameters
+    ----------
+    cursor : str
+        The `next_cursor` value returned by a previous page.
+
+    Returns
+    -------
+        a tuple with the keyset name and the values of the last seen record.
+    """
+
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        key, values = payload["k"], payload["v"]
+
+        if key not in CURSOR_KEYS or len(values) != len(CURSOR_KEYS[key]):
+            raise ValueError  # noqa: TRY301
+
+        if key == "created":
+            values[0] = datetime.fromisoformat(values[0])
+
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        raise ValueError("Invalid cursor") from None
+
+    return key, values
+
+
+async def keyset_paginate(db: AsyncSession, query: Select, model, params: CursorParams, size: int):
+    """The function `keyset_paginate` fetches a page seeking from the cursor
+    instead of skipping rows with OFFSET, so every page costs the same.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the query.
+    query : Select
+        The filtered select statement of the `model` records.
+    model
+        The ORM class whose keyset columns order the page.
+    params : CursorParams
+        The cursor parameters received by the endpoint.
+    size : int
+        The amount of records of the page.
+
+    Returns
+    -------
+        a tuple with the records of the page and the cursor of the next page,
+    which is `None` when there are no more records.
+    """
+
+    key = params.key
+
+    if params.cursor:
+        key, values = decode_cursor(params.cursor)
+
+    columns = [getattr(model, column) for column in CURSOR_KEYS[key]]
+    query = query.order_by(None).order_by(*columns)
+
+    if params.cursor:
+        query = query.where(tuple_(*columns) > tuple_(*values))
+
+    # Fetch one extra record to know if there is a next page
+    items = (await db.scalars(query.limit(size + 1))).all()
+    next_cursor = None
+
+    if len(items) > size:
+        items = items[:size]
+        next_cursor = encode_cursor(key, items[-1])
+
+    return items, next_cursor
+
+
+async def offset_paginate(db: AsyncSession, query: Select, params: PaginationParams):
+    """The function `offset_paginate` fetches a page with LIMIT/OFFSET without
+    running the COUNT query that `fastapi_pagination.paginate` always issues.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the query.
+    query : Select
+        The filtered and ordered select statement.
+    params : PaginationParams
+        The page number and size received by the endpoint.
+
+    Returns
+    -------
+        the records of the page.
+    """
+
+    raw_params = params.to_raw_params()
+    return (await db.scalars(query.limit(raw_params.limit).offset(raw_params.offset))).all()
+
+
+async def count_records(db: AsyncSession, query: Select, mode: str) -> int | None:
+    """The function `count_records` counts the records matched by a query the
+    way the client asked for.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the query.
+    query : Select
+        The filtered select statement, without pagination.
+    mode : str
+        `none` skips the count, `estimate` reads the planner statistics and
+    `exact` runs a `SELECT count(*)`.
+
+    Returns
+    -------
+        the amount of records, or `None` when the count was skipped.
+    """
+
+    query = query.order_by(None)
+
+    if mode == "exact":
+        return await db.scalar(select(func.count()).select_from(query.subquery()))
+
+    if mode == "estimate":
+        return await estimate_count(db, query)
+
+    return None
+
+
+async def estimate_count(db: AsyncSession, query: Select) -> int:
+    """The function `estimate_count` returns the planner's row estimate for a
+    query, which costs the same whatever the size of the table.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the query.
+    query : Select
+        The filtered select statement, without pagination.
+
+    Returns
+    -------
+        the estimated amount of records.
+    """
+
+    # The planner scales the table's reltuples by the selectivity of the filters
+    plan = (await db.execute(Explain(query))).scalar()
+
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def paginate(db: AsyncSession, query: Select, model, params: PaginationParams, cursor: CursorParams):
+    """The function `paginate` fetches a page with the pagination mode chosen
+    by the client, the matching records are counted by `count_records`.
+
+    Parameters
+    ----------
+    db : AsyncSession
+        The session used to run the queries.
+    query : Select
+        The filtered and ordered select statement of the `model` records.
+    model
+        The ORM class whose keyset columns order the cursor pages.
+    params : PaginationParams
+        The page parameters received by the endpoint.
+    cursor : CursorParams
+        The cursor parameters received by the endpoint.
+
+    Returns
+    -------
+        a tuple with the records of the page and the cursor of the next page.
+    """
+
+    if cursor.enabled:
+        # Seek from the last seen record instead of skipping rows
+        items, next_cursor = await keyset_paginate(db, query, model, cursor, params.size)
+    else:
+        items, next_cursor = await offset_paginate(db, query, params), None
+
+    return items, next_cursor
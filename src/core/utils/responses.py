@@ -1,23 +1,66 @@
-from typing import Any
+from typing import Any, Literal, Optional
 
 from fastapi import Query
+from fastapi.responses import JSONResponse
 from fastapi_pagination import Params
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 
+from core.metrics.timing import serializing
 from core.settings import settings
 
 
 class PaginationParams(Params):
     size: int = Query(None, ge=1, le=500, description="Page size")
+    total: Literal["none", "estimate", "exact"] = "none"
+
+
+class CursorParams(BaseModel):
+    mode: Literal["offset", "cursor"] = "offset"
+    cursor: Optional[str] = None
+    key: Literal["id", "created"] = "id"
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode == "cursor" or self.cursor is not None
 
 
 class EnvelopeResponse(BaseModel):
     errors: Any = None
     body: Any = None
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+
+
+envelope_adapter = TypeAdapter(EnvelopeResponse)
+
+
+class EnvelopeJSONResponse(JSONResponse):
+    """Renders an `EnvelopeResponse` straight to bytes with the pydantic-core
+    serializer, the schemas of the body included.
+
+    Returning it skips the validation against `response_model` and the
+    `jsonable_encoder` pass FastAPI runs on a returned envelope, the routes
+    keep `response_model=EnvelopeResponse` for the OpenAPI schema."""
+
+    def render(self, content: Any) -> bytes:
+        if not isinstance(content, EnvelopeResponse):
+            return super().render(content)
+
+        with serializing():
+            return envelope_adapter.dump_json(content)
 
 
 def default_pagination_params(
     page: int = Query(1, ge=1, alias="page", description="Page number"),
     size: int = Query(settings.DEFAULT_PAGE_SIZE, ge=1, le=500, alias="page_size", description="Page size"),
+    total: Literal["none", "estimate", "exact"] = Query("none", description="How to count the matching records"),
 ) -> PaginationParams:
-    return PaginationParams(page=page, size=size)
+    return PaginationParams(page=page, size=size, total=total)
+
+
+def default_cursor_params(
+    mode: Literal["offset", "cursor"] = Query("offset", alias="pagination", description="Pagination mode"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+    key: Literal["id", "created"] = Query("id", alias="cursor_key", description="Columns ordering the cursor pages"),
+) -> CursorParams:
+    return CursorParams(mode=mode, cursor=cursor, key=key)
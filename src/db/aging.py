@@ -0,0 +1,268 @@
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import BigInteger, Date, Select, delete, func, literal, select
+from sqlalchemy.orm import Session
+
+from core.settings import settings
+from core.utils.amortization import amortize
+from core.utils.datetime import LocalTime
+from db.copy import copy_query
+from db.models import (
+    AgingBucketORM,
+    AgingSnapshotORM,
+    CustomerORM,
+    LoanORM,
+    PaymentsORM,
+)
+from db.schedules import LOAN_TERMS, TERMS_DTYPE
+from db.session import engine
+
+BUCKETS = ("current", "1-30", "31-60", "61-90", "90+")
+
+# Upper bounds of the days past due of every bucket but the last one
+BUCKET_LIMITS = np.array([0, 30, 60, 90])
+
+EPOCH = date(1970, 1, 1)
+
+POSITIONS_DTYPE = [*TERMS_DTYPE, ("issued", np.int64), ("paid", np.int64)]
+
+
+class AgingTotals(BaseModel):
+    """Sums of a range of customers, one value per bucket."""
+
+    loans: list[int] = [0] * len(BUCKETS)
+    outstanding: list[int] = [0] * len(BUCKETS)
+    past_due: list[int] = [0] * len(BUCKETS)
+
+    def add(self, other: "AgingTotals") -> None:
+        for name in ("loans", "outstanding", "past_due"):
+            setattr(
+                self,
+                name,
+                [mine + theirs for mine, theirs in zip(getattr(self, name), getattr(other, name), strict=True)],
+            )
+
+
+def positions_query(start: int, stop: int) -> Select:
+    """The function `positions_query` selects the terms, the issue day and the
+    amount paid of the active loans of a range of customers.
+
+    Parameters
+    ----------
+    start : int
+        The first customer id of the range.
+    stop : int
+        The customer id following the range.
+
+    Returns
+    -------
+        the select statement, with the days since the epoch and the cents.
+    """
+
+    # Summed per loan through the loan_id index, grouping the payments of the range would scan the whole table
+    paid = (
+        select(func.coalesce(func.sum(PaymentsORM.amount), 0))
+        .where(PaymentsORM.loan_id == LoanORM.id, PaymentsORM.status)
+        .scalar_subquery()
+    )
+
+    issued = func.timezone(settings.DEFAULT_TIMEZONE, LoanORM.issued).cast(Date) - literal(EPOCH, Date)
+
+    return LOAN_TERMS.add_columns(issued.label("issued"), (paid * 100).cast(BigInteger).label("paid")).where(
+        LoanORM.customer_id >= start, LoanORM.customer_id < stop, LoanORM.status
+    )
+
+
+def due_dates(issued: np.ndarray, periods: int) -> np.ndarray:
+    # Issue day plus every amount of months, clamped to the end of the shorter months
+    months = issued.astype("datetime64[M]")[:, None] + np.arange(1, periods + 1)
+    first = months.astype("datetime64[D]")
+    length = (months + 1).astype("datetime64[D]") - first
+    day = (issued - issued.astype("datetime64[M]").astype("datetime64[D]"))[:, None]
+    return first + np.minimum(day, length - 1)
+
+
+def age_loans(positions: np.ndarray, as_of: date) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """The function `age_loans` ages a batch of loans against their schedules.
+
+    The installments due up to `as_of` are compared with the amount paid, the
+    oldest installment not covered by the payments sets the days past due.
+
+    Parameters
+    ----------
+    positions : np.ndarray
+        The terms, issue days and amounts paid of the loans, as
+    `POSITIONS_DTYPE`.
+    as_of : date
+        The day of the aging.
+
+    Returns
+    -------
+        the bucket of every loan, its outstanding and its past due amounts in
+    cents.
+    """
+
+    result = amortize(
+        positions["cents"],
+        positions["rate"],
+        positions["term"],
+        positions["german"],
+        positions["tax_rate"],
+        periods=True,
+    )
+
+    scheduled = np.cumsum(result.principal + result.interest + result.tax, axis=1)
+    due = due_dates(positions["issued"].astype("datetime64[D]"), scheduled.shape[1])
+    paid = positions["paid"]
+    today = np.datetime64(as_of, "D")
+
+    # Installments due so far, and installments fully covered by the payments
+    elapsed = np.count_nonzero(due <= today, axis=1)
+    covered = np.count_nonzero(scheduled <= paid[:, None], axis=1)
+
+    expected = np.where(elapsed > 0, scheduled[np.arange(len(paid)), np.maximum(elapsed - 1, 0)], 0)
+    past_due = np.maximum(expected - paid, 0)
+
+    oldest = due[np.arange(len(paid)), np.minimum(covered, scheduled.shape[1] - 1)]
+    days = np.where(covered < elapsed, (today - oldest).astype(np.int64), 0)
+
+    bucket = np.searchsorted(BUCKET_LIMITS, days, side="left")
+    outstanding = np.maximum(result.total_payment - paid, 0)
+
+    return bucket, outstanding, past_due
+
+
+def aging_totals(as_of: date, start: int, stop: int) -> AgingTotals:
+    """The function `aging_totals` ages the loans of a range of customers, the
+    unit of work of the pool.
+
+    Parameters
+    ----------
+    as_of : date
+        The day of the aging.
+    start : int
+        The first customer id of the range.
+    stop : int
+        The customer id following the range.
+
+    Returns
+    -------
+        the sums of every bucket.
+    """
+
+    with engine.connect() as conn:
+        rows = copy_query(conn, positions_query(start, stop))
+
+    if not rows.getvalue():
+        return AgingTotals()
+
+    positions = np.loadtxt(rows, dtype=POSITIONS_DTYPE, delimiter="\t", ndmin=1)
+    bucket, outstanding, past_due = age_loans(positions, as_of)
+
+    return AgingTotals(
+        loans=np.bincount(bucket, minlength=len(BUCKETS)).tolist(),
+        outstanding=np.bincount(bucket, weights=outstanding, minlength=len(BUCKETS)).astype(np.int64).tolist(),
+        past_due=np.bincount(bucket, weights=past_due, minlength=len(BUCKETS)).astype(np.int64).tolist(),
+    )
+
+
+def compute_aging(
+    as_of: Optional[date] = None,
+    workers: Optional[int] = None,
+    customers_per_task: int = 5_000,
+    progress: Optional[Callable[[float], None]] = None,
+) -> AgingSnapshotORM:
+    """The function `compute_aging` ages the whole portfolio and stores the
+    snapshot of the day. The customers are split in ranges of ids, aged in
+    parallel by a pool of processes.
+
+    Parameters
+    ----------
+    as_of : date, optional
+        The day of the aging, today by default.
+    workers : int, optional
+        The amount of processes, one per CPU by default. With one worker the
+    ranges are aged in the current process.
+    customers_per_task : int
+        The width of the ranges of customer ids.
+    progress : Callable, optional
+        Called with the share of the ranges done after every range, an
+    exception it raises aborts the job before anything is stored.
+
+    Returns
+    -------
+        the stored snapshot.
+    """
+
+    as_of = as_of or LocalTime.today()
+    workers = workers or os.cpu_count() or 1
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        first, last = conn.execute(select(func.min(CustomerORM.id), func.max(CustomerORM.id))).one()
+
+    ranges = [(start, start + customers_per_task) for start in range(first or 0, (last or -1) + 1, customers_per_task)]
+    totals = AgingTotals()
+
+    if workers == 1:
+        for done, (start, stop) in enumerate(ranges, start=1):
+            totals.add(aging_totals(as_of, start, stop))
+
+            if progress is not None:
+                progress(done / len(ranges))
+    else:
+        # Spawned rather than forked, the parent may be a server with threads and open connections
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            try:
+                results = pool.map(aging_totals, *zip(*[(as_of, start, stop) for start, stop in ranges], strict=True))
+
+                for done, result in enumerate(results, start=1):
+                    totals.add(result)
+
+                    if progress is not None:
+                        progress(done / len(ranges))
+            except BaseException:
+                # Drop the ranges not started yet instead of waiting for them
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    snapshot = AgingSnapshotORM(
+        as_of=as_of,
+        elapsed=round(time.perf_counter() - started, 3),
+        loans=sum(totals.loans),
+        outstanding=sum(totals.outstanding),
+        past_due=sum(totals.past_due),
+        delinquent_loans=sum(totals.loans[1:]),
+        delinquent_outstanding=sum(totals.outstanding[1:]),
+        buckets=[
+            AgingBucketORM(
+                position=position,
+                bucket=bucket,
+                loans=totals.loans[position],
+                outstanding=totals.outstanding[position],
+                past_due=totals.past_due[position],
+            )
+            for position, bucket in enumerate(BUCKETS)
+        ],
+    )
+
+    # A new run of the day replaces the previous snapshot
+    with Session(engine, expire_on_commit=False) as session:
+        session.execute(delete(AgingSnapshotORM).where(AgingSnapshotORM.as_of == as_of))
+        session.add(snapshot)
+        session.commit()
+
+    logger.info(f"Aging as of {as_of}: {snapshot.loans} loans in {len(ranges)} ranges in {snapshot.elapsed}s")
+
+    return snapshot
@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import func, select, text
+
+from core.cache import cache
+from db.models import LoanORM
+from db.session import engine
+
+# Balances of the loans as their payments and schedules add up. The payments are summed per loan through the loan_id
+# index, grouping the payments of a range would scan the whole table. The outstanding of a loan without a schedule
+# can't be known, it's left as it is and the loan reported
+BALANCES = """
+SELECT l.id, l.paid_total, l.outstanding, coalesce(p.paid, 0) AS expected_paid,
+    coalesce(s.total_payment - coalesce(p.paid, 0), l.outstanding) AS expected_outstanding
+FROM loans l
+LEFT JOIN loan_schedules s ON s.loan_id = l.id
+LEFT JOIN LATERAL (SELECT sum(r.amount) AS paid FROM payments r WHERE r.loan_id = l.id AND r.status) AS p ON true
+WHERE {loans}
+"""
+
+DRIFTED = "(b.paid_total, b.outstanding) IS DISTINCT FROM (b.expected_paid, b.expected_outstanding)"
+
+UNSCHEDULED_LOANS = """
+SELECT l.id FROM loans l
+WHERE {loans} AND NOT EXISTS (SELECT 1 FROM loan_schedules s WHERE s.loan_id = l.id)
+ORDER BY l.id
+"""
+
+DRIFTED_LOANS = f"SELECT b.id FROM ({BALANCES}) AS b WHERE {DRIFTED} ORDER BY b.id"  # noqa: S608
+
+# Row locks first, the payments committed while they were waited for are summed by the repair, the ones written after
+# wait for the repair and apply their change on top of it
+LOCK_LOANS = "SELECT id FROM loans WHERE id = ANY(:ids) ORDER BY id FOR UPDATE"
+
+REPAIR_LOANS = f"""
+UPDATE loans l
+SET paid_total = b.expected_paid, outstanding = b.expected_outstanding, modified = now()
+FROM ({BALANCES}) AS b
+WHERE l.id = b.id AND {DRIFTED}
+RETURNING l.id
+"""
+
+
+class BalanceTotals(BaseModel):
+    """Loans checked in a range of ids, the ones drifting, the ones repaired
+    and the ones without a schedule."""
+
+    loans: int = 0
+    drifted: list[int] = []
+    repaired: int = 0
+    unscheduled: list[int] = []
+
+
+class ReconcileReport(BaseModel):
+    loans: int = 0
+    drifted: int = 0
+    repaired: int = 0
+    unscheduled: int = 0
+    ranges: int = 0
+    elapsed: float = 0
+    loans_per_second: float = 0
+
+
+def reconcile_range(start: int, stop: int, repair: bool) -> BalanceTotals:  # noqa: FBT001
+    """The function `reconcile_range` compares the balances of a range of loans
+    with their payments and schedules, the unit of work of the pool.
+
+    Parameters
+    ----------
+    start : int
+        The first loan id of the range.
+    stop : int
+        The loan id following the range.
+    repair : bool
+        Whether to write the expected balances of the drifting loans.
+
+    Returns
+    -------
+        the totals of the range.
+    """
+
+    loans = "l.id >= :start AND l.id < :stop"
+    totals = BalanceTotals()
+
+    with engine.connect() as conn:
+        totals.loans = conn.scalar(select(func.count()).where(LoanORM.id >= start, LoanORM.id < stop))
+        totals.drifted = conn.scalars(text(DRIFTED_LOANS.format(loans=loans)), {"start": start, "stop": stop}).all()
+        totals.unscheduled = conn.scalars(
+            text(UNSCHEDULED_LOANS.format(loans=loans)), {"start": start, "stop": stop}
+        ).all()
+
+    if repair and totals.drifted:
+        # Only the drifting loans are locked, the checked ones are read without blocking the payments
+        with engine.begin() as conn:
+            conn.execute(text(LOCK_LOANS), {"ids": totals.drifted})
+            repaired = conn.execute(text(REPAIR_LOANS.format(loans="l.id = ANY(:ids)")), {"ids": totals.drifted})
+            totals.repaired = len(repaired.all())
+
+    return totals
+
+
+def reconcile_balances(
+    *,
+    repair: bool = False,
+    workers: Optional[int] = None,
+    loans_per_task: int = 50_000,
+    progress: Optional[Callable[[float], None]] = None,
+) -> ReconcileReport:
+    """The function `reconcile_balances` verifies the running balances of every
+    loan against its payments and its schedule, and optionally repairs the
+    ones that drifted, such as after a load with the triggers disabled. The
+    loans without a schedule are reported, only their paid total is checked.
+    The loans are split in ranges of ids, checked in parallel by a pool of
+    processes.
+
+    Parameters
+    ----------
+    repair : bool
+        Whether to write the expected balances of the drifting loans, every
+    range is repaired in its own transaction.
+    workers : int, optional
+        The amount of processes, one per CPU by default. With one worker the
+    ranges are checked in the current process.
+    loans_per_task : int
+        The width of the ranges of loan ids.
+    progress : Callable, optional
+        Called with the share of the ranges done after every range, an
+    exception it raises stops the reconciliation, the ranges repaired stay
+    committed.
+
+    Returns
+    -------
+        the report of the reconciliation.
+    """
+
+    workers = workers or os.cpu_count() or 1
+    report = ReconcileReport()
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        first, last = conn.execute(select(func.min(LoanORM.id), func.max(LoanORM.id))).one()
+
+    ranges = [(start, start + loans_per_task) for start in range(first or 0, (last or -1) + 1, loans_per_task)]
+    report.ranges = len(ranges)
+
+    def collect(done: int, totals: BalanceTotals) -> None:
+        report.loans += totals.loans
+        report.drifted += len(totals.drifted)
+        report.repaired += totals.repaired
+        report.unscheduled += len(totals.unscheduled)
+
+        if totals.drifted:
+            logger.warning(f"{len(totals.drifted)} balances drifted, loans {totals.drifted[:10]}")
+
+        if totals.unscheduled:
+            logger.warning(f"{len(totals.unscheduled)} loans without a schedule, loans {totals.unscheduled[:10]}")
+
+        if progress is not None:
+            progress(done / len(ranges))
+
+    if workers == 1:
+        for done, (start, stop) in enumerate(ranges, start=1):
+            collect(done, reconcile_range(start, stop, repair))
+    else:
+        # Spawned rather than forked, the parent may be a server with threads and open connections
+        context = multiprocessing.get_context("spawn")
+
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            try:
+                results = pool.map(
+                    reconcile_range, *zip(*[(start, stop, repair) for start, stop in ranges], strict=True)
+                )
+
+                for done, totals in enumerate(results, start=1):
+                    collect(done, totals)
+            except BaseException:
+                # Drop the ranges not started yet instead of waiting for them
+                pool.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    if report.repaired:
+        # The repairs ran in the pool, the cache of this process is cleared once they're all committed
+        cache.clear("loans")
+
+    report.elapsed = round(time.perf_counter() - started, 3)
+    report.loans_per_second = round(report.loans / report.elapsed, 1) if report.elapsed else 0
+
+    return report
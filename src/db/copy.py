@@ -0,0 +1,288 @@
+import io
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import Connection, Select
+
+COPY_BUFFER_SIZE = 64 * 1024
+
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+# Types whose text can't contain COPY control characters
+PLAIN_FORMATTERS = {
+    bool: lambda value: "t" if value else "f",
+    int: str,
+    float: repr,
+    Decimal: str,
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+}
+
+
+def format_copy_value(value) -> str:
+    """The function `format_copy_value` renders a python value with the text
+    format expected by `COPY ... FROM STDIN`.
+
+    Parameters
+    ----------
+    value
+        The value of a column.
+
+    Returns
+    -------
+        the escaped text of the value, `\\N` for `None`.
+    """
+
+    if value is None:
+        return "\\N"
+
+    formatter = PLAIN_FORMATTERS.get(type(value))
+
+    if formatter is not None:
+        return formatter(value)
+
+    return str(value).translate(COPY_ESCAPES)
+
+
+class RowStream(io.TextIOBase):
+    """File-like object that renders rows on demand, so COPY pulls them from
+    an iterator without holding the whole data set in memory. An exception
+    raised by the iterator is kept in `error`."""
+
+    def __init__(self, rows: Iterable[Sequence]) -> None:
+        super().__init__()
+        self.rows = iter(rows)
+        self.pending = ""
+        self.error: Optional[BaseException] = None
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: int = -1) -> str:
+        chunks = [self.pending]
+        length = len(self.pending)
+
+        try:
+            for row in self.rows:
+                line = "\t".join(map(format_copy_value, row)) + "\n"
+                chunks.append(line)
+                length += len(line)
+
+                if 0 <= size <= length:
+                    break
+        except BaseException as exc:
+            self.error = exc
+            raise
+
+        data = "".join(chunks)
+
+        if size < 0:
+            self.pending = ""
+            return data
+
+        self.pending = data[size:]
+        return data[:size]
+
+
+def copy_rows(conn: Connection, table: str, columns: Sequence[str], rows: Iterable[Sequence]) -> int:
+    """The function `copy_rows` streams rows into a table with
+    `COPY ... FROM STDIN` on the psycopg2 connection behind `conn`.
+
+    Parameters
+    ----------
+    conn : Connection
+        A connection of the sync engine, the caller owns the transaction.
+    table : str
+        The name of the target table.
+    columns : Sequence[str]
+        The columns filled by every row, in order.
+    rows : Iterable[Sequence]
+        The values of every row, consumed lazily.
+
+    Returns
+    -------
+        the amount of copied rows, an exception raised by `rows` aborts the
+    COPY and is raised again.
+    """
+
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    stream = RowStream(rows)
+
+    with conn.connection.cursor() as cursor:
+        try:
+            cursor.copy_expert(statement, stream, size=COPY_BUFFER_SIZE)
+        except Exception:
+            # The driver turns the errors of the rows into a cancelled COPY
+            if stream.error is not None:
+                raise stream.error from None
+
+            raise
+
+        return cursor.rowcount
+
+
+def copy_query(conn: Connection, query: Select) -> io.StringIO:
+    """The function `copy_query` reads the result of a query with
+    `COPY (...) TO STDOUT`, much cheaper than fetching rows for large results.
+
+    Parameters
+    ----------
+    conn : Connection
+        A connection of the sync engine.
+    query : Select
+        The query, its parameters are rendered inline.
+
+    Returns
+    -------
+        the rows in the COPY text format, rewound.
+    """
+
+    compiled = query.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    buffer = io.StringIO()
+
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY ({compiled}) TO STDOUT", buffer, size=COPY_BUFFER_SIZE)
+
+    buffer.seek(0)
+    return buffer
+
+
+# Binary COPY of fixed size fields, the rows are records of a structured array
+COPY_SIGNATURE = b"PGCOPY\n\xff\r\n\x00" + bytes(8)
+COPY_TRAILER = b"\xff\xff"
+
+# Unix time of the epoch of the timestamps, 2000-01-01
+POSTGRES_EPOCH = 946_684_800
+
+NUMERIC_BASE = 10_000
+
+
+@dataclass
+class BinaryColumn:
+    """Values of a column in the binary format of its type, one per row."""
+
+    values: np.ndarray
+
+    @property
+    def dtype(self) -> np.dtype:
+        return self.values.dtype
+
+
+def binary_integer(values, size: int = 4) -> BinaryColumn:
+    return BinaryColumn(np.asarray(values).astype(f">i{size}"))
+
+
+def binary_boolean(values) -> BinaryColumn:
+    return BinaryColumn(np.asarray(values, dtype=bool))
+
+
+def binary_timestamp(seconds) -> BinaryColumn:
+    # Microseconds since the epoch of postgres, for `timestamp with time zone`
+    return BinaryColumn(((np.asarray(seconds, dtype=np.int64) - POSTGRES_EPOCH) * 1_000_000).astype(">i8"))
+
+
+def binary_text(values) -> BinaryColumn:
+    values = np.char.encode(np.asarray(values, dtype=str), "utf-8")
+
+    if len(values) and np.any(np.char.str_len(values) != values.dtype.itemsize):
+        raise ValueError("Binary text values must share their length")
+
+    return BinaryColumn(values)
+
+
+def binary_numeric(units, scale: int, groups: int = 4) -> BinaryColumn:
+    """The function `binary_numeric` encodes non-negative decimals as the
+    `numeric` type, with a fixed amount of base 10000 digits so every value
+    has the same size. The leading and trailing zero digits are dropped by
+    postgres.
+
+    Parameters
+    ----------
+    units
+        The values in units of `10 ** -scale`, such as cents for a scale of 2.
+    scale : int
+        The amount of decimals of the values.
+    groups : int
+        The amount of base 10000 digits, integer and fractional ones.
+
+    Returns
+    -------
+        the column of encoded values.
+    """
+
+    units = np.asarray(units, dtype=np.int64)
+    fraction_groups = -(-scale // 4)
+    integer_groups = groups - fraction_groups
+
+    whole, fraction = np.divmod(units, 10**scale)
+
+    if np.any(units < 0) or np.any(whole >= NUMERIC_BASE**integer_groups):
+        raise ValueError("Numeric values out of the range of the encoding")
+
+    # The fraction padded to whole digits, 0.16 with a scale of 6 is the digits 1600 0000
+    fraction = fraction * 10 ** (4 * fraction_groups - scale)
+    digits = [
+        *(whole // NUMERIC_BASE**power % NUMERIC_BASE for power in reversed(range(integer_groups))),
+        *(fraction // NUMERIC_BASE**power % NUMERIC_BASE for power in reversed(range(fraction_groups))),
+    ]
+
+    dtype = np.dtype(
+        [("ndigits", ">i2"), ("weight", ">i2"), ("sign", ">u2"), ("dscale", ">i2"), ("digits", ">i2", (groups,))]
+    )
+    values = np.zeros(len(units), dtype=dtype)
+    values["ndigits"] = groups
+    values["weight"] = integer_groups - 1
+    values["dscale"] = scale
+    values["digits"] = np.stack(digits, axis=1) if len(units) else 0
+
+    return BinaryColumn(values)
+
+
+def copy_binary(conn: Connection, table: str, columns: dict[str, BinaryColumn]) -> int:
+    """The function `copy_binary` writes columns of arrays into a table with
+    `COPY ... FROM STDIN WITH (FORMAT binary)`. The rows are built as one
+    structured array, without rendering or parsing any text, several times
+    faster than the text format for numbers and timestamps.
+
+    Parameters
+    ----------
+    conn : Connection
+        A connection of the sync engine, the caller owns the transaction.
+    table : str
+        The name of the target table.
+    columns : dict[str, BinaryColumn]
+        The values of every column, all of the same length.
+
+    Returns
+    -------
+        the amount of copied rows.
+    """
+
+    # Every field is preceded by its length, every row by its amount of fields
+    dtype = np.dtype(
+        [
+            ("fields", ">i2"),
+            *(
+                (field, dtype)
+                for name, column in columns.items()
+                for field, dtype in ((f"{name}_length", ">i4"), (name, column.dtype))
+            ),
+        ]
+    )
+    rows = np.zeros(len(next(iter(columns.values())).values), dtype=dtype)
+    rows["fields"] = len(columns)
+
+    for name, column in columns.items():
+        rows[f"{name}_length"] = column.dtype.itemsize
+        rows[name] = column.values  # noqa: PD011
+
+    statement = f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT binary)"
+
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(statement, io.BytesIO(COPY_SIGNATURE + rows.tobytes() + COPY_TRAILER), size=COPY_BUFFER_SIZE)
+        return cursor.rowcount
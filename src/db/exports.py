@@ -0,0 +1,70 @@
+import csv
+import io
+from collections.abc import AsyncIterator
+from typing import Literal
+
+from pydantic import BaseModel
+from sqlalchemy import Select
+
+from db.session import open_read_session
+
+EXPORT_BATCH_SIZE = 1000
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def render_csv(schema: type[BaseModel], records: list[BaseModel], *, header: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    if header:
+        writer.writerow(schema.model_fields)
+
+    writer.writerows(record.model_dump(mode="json").values() for record in records)
+    return buffer.getvalue()
+
+
+def render_ndjson(records: list[BaseModel]) -> str:
+    return "".join(record.model_dump_json() + "\n" for record in records)
+
+
+async def stream_export(
+    query: Select, schema: type[BaseModel], file_format: ExportFormat, *, primary: bool = False
+) -> AsyncIterator[str]:
+    """The function `stream_export` renders the records of a query as CSV or
+    NDJSON while they're read from a server-side cursor, so memory stays
+    constant whatever the size of the table.
+
+    The export opens its own session, the request's one is closed before a
+    `StreamingResponse` starts sending the body.
+
+    Parameters
+    ----------
+    query : Select
+        The filtered and ordered select statement of an ORM model.
+    schema : type[BaseModel]
+        The schema each record is converted to.
+    file_format : ExportFormat
+        `csv` for a file with a header row, `ndjson` for one JSON object per line.
+    primary : bool
+        Read from the primary even when there are replicas.
+
+    Returns
+    -------
+        an async generator of text chunks, one per batch of records.
+    """
+
+    if file_format == "csv":
+        yield render_csv(schema, [], header=True)
+
+    async with await open_read_session(primary=primary) as db:
+        result = await db.stream_scalars(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+
+        async for partition in result.partitions():
+            records = [schema(**item.dict()) for item in partition]
+            yield render_csv(schema, records) if file_format == "csv" else render_ndjson(records)
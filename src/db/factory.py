@@ -0,0 +1,430 @@
+import time
+from collections.abc import Callable
+from contextlib import nullcontext
+from datetime import UTC, date, datetime
+from datetime import time as clock
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import Connection, func, select, text
+
+from core.utils.amortization import amortize
+from core.utils.datetime import LocalTime
+from db.aging import due_dates
+from db.copy import (
+    binary_boolean,
+    binary_integer,
+    binary_numeric,
+    binary_text,
+    binary_timestamp,
+    copy_binary,
+    copy_rows,
+)
+from db.models import CustomerORM, LoanORM, PaymentsORM
+from db.names import FIRST_NAMES as FIRST_NAME_LIST
+from db.names import LAST_NAMES as LAST_NAME_LIST
+from db.session import engine
+
+FIRST_NAMES = np.array(FIRST_NAME_LIST.split())
+LAST_NAMES = np.array(LAST_NAME_LIST.split())
+
+# Terms in months and their shares, the short loans are the common ones
+TERMS = np.array([3, 6, 12, 18, 24, 36])
+TERM_SHARES = np.array([0.10, 0.25, 0.35, 0.10, 0.15, 0.05])
+
+# Share of the loans amortized with the german method, the french one is the common one
+GERMAN_SHARE = 0.2
+
+GENERATED_TABLES = ("customers", "loans", "payments", "customer_summary", "loan_schedules")
+
+# Tables written with COPY, loaded without their indexes and triggers when the database is empty
+COPIED_TABLES = ("customers", "loans", "loan_schedules", "payments")
+
+# Indexes and constraints rebuilt after a bulk load, the primary keys stay
+DEFERRED_INDEXES = """
+SELECT pg_get_indexdef(i.indexrelid), format('DROP INDEX %I', i.indexrelid::regclass)
+FROM pg_index i
+WHERE i.indrelid = ANY(CAST(:tables AS regclass[]))
+    AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = i.indexrelid)
+"""
+
+DEFERRED_CONSTRAINTS = """
+SELECT
+    format('ALTER TABLE %s ADD CONSTRAINT %I %s', conrelid::regclass, conname, pg_get_constraintdef(oid)),
+    format('ALTER TABLE %s DROP CONSTRAINT %I', conrelid::regclass, conname)
+FROM pg_constraint
+WHERE conrelid = ANY(CAST(:tables AS regclass[])) AND contype IN ('f', 'u')
+ORDER BY contype = 'u'
+"""
+
+# Memory of the sorts that build the indexes of a bulk load
+BULK_MEMORY = "256MB"
+
+DAY = 86_400
+
+# Customers or loans generated at once. Every chunk draws from its own stream, a different size would change the records
+CHUNK_SIZE = 100_000
+
+# Streams of the generator, one per chunk of every table
+CUSTOMERS_STREAM, LOANS_STREAM = 1, 2
+
+
+class FactoryReport(BaseModel):
+    customers: int = 0
+    loans: int = 0
+    payments: int = 0
+    bulk: bool = False
+    elapsed: float = 0
+    rows_per_second: float = 0
+
+
+def loans_per_customer(rng: np.random.Generator, customers: int, skew: float, max_loans: int) -> np.ndarray:
+    # Zipf distributed, most customers have one or two loans and a few have dozens
+    if skew <= 1:
+        return rng.integers(1, max_loans + 1, customers)
+
+    return np.minimum(rng.zipf(skew, customers), max_loans)
+
+
+def generate_customers(  # noqa: PLR0913
+    conn: Connection, seed: int, chunk: int, ids: np.ndarray, created: np.ndarray, active_share: float
+) -> int:
+    rng = np.random.default_rng([seed, CUSTOMERS_STREAM, chunk])
+
+    first = FIRST_NAMES[rng.integers(0, len(FIRST_NAMES), len(ids))].tolist()
+    last = LAST_NAMES[rng.integers(0, len(LAST_NAMES), len(ids))].tolist()
+    active = (rng.random(len(ids)) < active_share).tolist()
+    timestamps = np.datetime_as_string(created.astype("datetime64[s]"), timezone="UTC").tolist()
+
+    # Text COPY, the names and emails don't have a fixed size
+    return copy_rows(
+        conn,
+        "customers",
+        ("id", "full_name", "email", "status", "created", "modified"),
+        (
+            (key, f"{name} {surname}", f"{name.lower()}.{surname.lower()}{key}@example.com", status, moment, moment)
+            for key, name, surname, status, moment in zip(ids.tolist(), first, last, active, timestamps, strict=True)
+        ),
+    )
+
+
+def generate_loans(  # noqa: PLR0913
+    conn: Connection,
+    seed: int,
+    chunk: int,
+    ids: np.ndarray,
+    owners: np.ndarray,
+    issued: np.ndarray,
+    first_payment: int,
+    as_of: date,
+    delinquency: float,
+    active_share: float,
+    *,
+    bulk: bool,
+) -> tuple[int, np.ndarray, np.ndarray, np.ndarray]:
+    """The function `generate_loans` writes a chunk of loans along with their
+    schedules and the payments made on them up to `as_of`.
+
+    Every payment covers one installment, the delinquent loans stop paying
+    after a random amount of installments and age past due. In bulk mode the
+    triggers are disabled and the balances of the loans are written with them.
+
+    Returns
+    -------
+        the amount of payments written, and the cents lent, paid and
+    outstanding of every loan, as the summaries count them: zero for the
+    disabled loans.
+    """
+
+    rng = np.random.default_rng([seed, LOANS_STREAM, chunk])
+    size = len(ids)
+
+    # Log-normal amounts, from a few hundreds to tens of thousands
+    cents = np.clip(np.round(rng.lognormal(np.log(5_000), 0.8, size)) * 100, 50_000, 10_000_000).astype(np.int64)
+    term = rng.choice(TERMS, size, p=TERM_SHARES)
+    rate = np.round(rng.uniform(0.08, 0.45, size), 4)
+    german = rng.random(size) < GERMAN_SHARE
+    tax_rate = np.full(size, 0.16)
+    active = rng.random(size) < active_share
+
+    result = amortize(cents, rate, term, german, tax_rate, periods=True)
+    installments = (result.principal + result.interest + result.tax).astype(np.int64)
+    timestamps = binary_timestamp(issued)
+
+    # Installments due so far, the delinquent loans pay only part of them
+    due = due_dates(issued.astype("datetime64[s]").astype("datetime64[D]"), installments.shape[1])
+    elapsed = np.minimum(np.count_nonzero(due <= np.datetime64(as_of, "D"), axis=1), term)
+    paid = np.where(rng.random(size) < delinquency, rng.integers(0, elapsed + 1), elapsed)
+
+    total = int(paid.sum())
+    paid_cents = np.take_along_axis(np.cumsum(installments, axis=1), np.maximum(paid - 1, 0)[:, None], axis=1)[:, 0]
+    paid_cents = np.where(paid > 0, paid_cents, 0)
+    totals = (
+        np.where(active, cents, 0),
+        np.where(active, paid_cents, 0),
+        np.where(active, result.total_payment - paid_cents, 0),
+    )
+
+    # Written along with the loans when the triggers are disabled, the triggers apply the payments otherwise
+    balances = {
+        "paid_total": binary_numeric(paid_cents if bulk else np.zeros(size), scale=2),
+        "outstanding": binary_numeric(result.total_payment - paid_cents if bulk else np.zeros(size), scale=2),
+    }
+
+    copy_binary(
+        conn,
+        "loans",
+        {
+            "id": binary_integer(ids),
+            "customer_id": binary_integer(owners),
+            "amount": binary_numeric(cents, scale=2),
+            "issued": timestamps,
+            "status": binary_boolean(active),
+            "rate": binary_numeric(np.round(rate * 1_000_000), scale=6, groups=3),
+            "term": binary_integer(term),
+            # Both methods have six letters
+            "method": binary_text(np.where(german, "german", "french")),
+            "tax_rate": binary_numeric(np.round(tax_rate * 1_000_000), scale=6, groups=3),
+            **balances,
+            "created": timestamps,
+            "modified": timestamps,
+        },
+    )
+
+    copy_binary(
+        conn,
+        "loan_schedules",
+        {
+            "loan_id": binary_integer(ids),
+            "installment": binary_numeric(result.installment, scale=2),
+            "total_interest": binary_numeric(result.total_interest, scale=2),
+            "total_tax": binary_numeric(result.total_tax, scale=2),
+            "total_payment": binary_numeric(result.total_payment, scale=2),
+        },
+    )
+
+    if not total:
+        return 0, *totals
+
+    # One row per paid installment, the period of every row counted from the start of its loan
+    loan = np.repeat(np.arange(size), paid)
+    period = np.arange(total) - np.repeat(np.cumsum(paid) - paid, paid)
+
+    # A few days early or late, within the day of `as_of`
+    end = int(datetime.combine(as_of, clock.max, UTC).timestamp())
+    moments = due[loan, period].astype("datetime64[s]").astype(np.int64)
+    moments = np.minimum(moments + rng.integers(-7 * DAY, 3 * DAY, total), end)
+
+    # Numbered in the order they were made within the chunk, as the identity would
+    order = np.argsort(moments, kind="stable")
+    loan, period, moments = loan[order], period[order], moments[order]
+    timestamps = binary_timestamp(moments)
+
+    copied = copy_binary(
+        conn,
+        "payments",
+        {
+            "id": binary_integer(np.arange(first_payment, first_payment + total)),
+            "loan_id": binary_integer(ids[loan]),
+            "amount": binary_numeric(installments[loan, period], scale=2),
+            "issued": timestamps,
+            "status": binary_boolean(np.ones(total, dtype=bool)),
+            "created": timestamps,
+            "modified": timestamps,
+        },
+    )
+
+    return copied, *totals
+
+
+def defer_indexes(conn: Connection) -> list[str]:
+    """The function `defer_indexes` drops the secondary indexes, the unique
+    and the foreign key constraints of the copied tables and disables their
+    summary triggers, as `pg_restore` does. Building an index once costs a
+    fraction of updating it row by row, a constraint added back is validated
+    with a single join, and the load writes the summaries itself.
+
+    Parameters
+    ----------
+    conn : Connection
+        A connection of the sync engine, in the transaction of the load.
+
+    Returns
+    -------
+        the statements that restore the tables, in order.
+    """
+
+    tables = list(COPIED_TABLES)
+    constraints = conn.execute(text(DEFERRED_CONSTRAINTS), {"tables": tables}).all()
+
+    # The indexes of the unique constraints go along with them
+    for _, drop in constraints:
+        conn.execute(text(drop))
+
+    indexes = conn.execute(text(DEFERRED_INDEXES), {"tables": tables}).all()
+
+    for _, drop in indexes:
+        conn.execute(text(drop))
+
+    for table in tables:
+        conn.execute(text(f"ALTER TABLE {table} DISABLE TRIGGER USER"))
+
+    conn.execute(text(f"SET LOCAL maintenance_work_mem = '{BULK_MEMORY}'"))
+
+    return [
+        *(create for create, _ in indexes),
+        *(add for add, _ in constraints),
+        *(f"ALTER TABLE {table} ENABLE TRIGGER USER" for table in tables),
+    ]
+
+
+def generate(  # noqa: PLR0913
+    customers: int,
+    skew: float = 2.5,
+    max_loans: int = 100,
+    seed: int = 0,
+    delinquency: float = 0.1,
+    history_days: int = 730,
+    as_of: Optional[date] = None,
+    *,
+    truncate: bool = False,
+    conn: Optional[Connection] = None,
+    progress: Optional[Callable[[float], None]] = None,
+) -> FactoryReport:
+    """The function `generate` fills the database with synthetic customers,
+    loans with their schedules, and payments, streamed with COPY in chunks.
+
+    The loans per customer follow a Zipf distribution and the loans are
+    numbered in the order they were issued over the history. The same seed
+    and `as_of` write the same records, the ids start after the existing
+    ones. An empty database is loaded in bulk, its indexes, constraints and
+    summaries are built once the records are in.
+
+    Parameters
+    ----------
+    customers : int
+        The amount of customers, the scale of the data set.
+    skew : float
+        The exponent of the Zipf distribution of the loans per customer, the
+    larger the fewer loans, 1 or less for a uniform distribution.
+    max_loans : int
+        The most loans of a customer.
+    seed : int
+        The seed of the generator.
+    delinquency : float
+        The share of loans that stop paying before their last installment due.
+    history_days : int
+        The days before `as_of` the loans are issued over.
+    as_of : date, optional
+        The day the data set ends, today by default.
+    truncate : bool
+        Whether to remove the customers, loans and payments first.
+    conn : Connection, optional
+        A connection to write with, in the transaction of the caller. The
+    records are committed at once on a new connection by default.
+    progress : Callable, optional
+        Called with the share of the loans written after every chunk.
+
+    Returns
+    -------
+        the report of the generation.
+    """
+
+    as_of = as_of or LocalTime.today()
+    report = FactoryReport()
+    started = time.perf_counter()
+
+    # A single transaction, a failed load leaves neither records nor dropped indexes behind
+    with nullcontext(conn) if conn is not None else engine.begin() as conn:
+        if truncate:
+            conn.execute(text(f"TRUNCATE {', '.join(GENERATED_TABLES)} RESTART IDENTITY CASCADE"))
+
+        offsets = [
+            conn.scalar(select(func.coalesce(func.max(model.id), 0))) for model in (CustomerORM, LoanORM, PaymentsORM)
+        ]
+
+        report.bulk = not any(offsets)
+        restore = defer_indexes(conn) if report.bulk else []
+
+        rng = np.random.default_rng(seed)
+
+        # The owners of the loans in random order, the loans of a customer are spread over the history
+        counts = loans_per_customer(rng, customers, skew, max_loans)
+        owners = rng.permutation(np.repeat(np.arange(customers), counts))
+
+        end = int(datetime.combine(as_of, clock.min, UTC).timestamp())
+        issued = np.sort(rng.integers(end - history_days * DAY, end, len(owners)))
+
+        # Customers sign up a few weeks before their first loan
+        first_loan = np.full(customers, end, dtype=np.int64)
+        np.minimum.at(first_loan, owners, issued)
+        created = first_loan - rng.integers(0, 60 * DAY, customers)
+
+        customer_ids = np.arange(offsets[0] + 1, offsets[0] + customers + 1)
+
+        for chunk, start in enumerate(range(0, customers, CHUNK_SIZE)):
+            window = slice(start, start + CHUNK_SIZE)
+            report.customers += generate_customers(conn, seed, chunk, customer_ids[window], created[window], 0.95)
+
+        loan_ids = np.arange(offsets[1] + 1, offsets[1] + len(owners) + 1)
+        owner_ids = customer_ids[owners]
+
+        # Cents lent, paid and outstanding, and active loans of every customer
+        summaries = np.zeros((4, customers))
+
+        for chunk, start in enumerate(range(0, len(owners), CHUNK_SIZE)):
+            window = slice(start, start + CHUNK_SIZE)
+            payments, lent, paid, outstanding = generate_loans(
+                conn,
+                seed,
+                chunk,
+                loan_ids[window],
+                owner_ids[window],
+                issued[window],
+                offsets[2] + report.payments + 1,
+                as_of,
+                delinquency,
+                0.95,
+                bulk=report.bulk,
+            )
+            report.payments += payments
+            report.loans += len(loan_ids[window])
+
+            for row, weights in enumerate((lent, paid, outstanding, lent > 0)):
+                summaries[row] += np.bincount(owners[window], weights=weights, minlength=customers)
+
+            logger.info(f"{report.loans} loans and {report.payments} payments generated")
+
+            if progress is not None:
+                progress(report.loans / len(owners))
+
+        if report.bulk:
+            # The triggers are disabled, the totals of the records generated are the summaries
+            copy_binary(
+                conn,
+                "customer_summary",
+                {
+                    "customer_id": binary_integer(customer_ids),
+                    "total_lent": binary_numeric(summaries[0], scale=2),
+                    "total_paid": binary_numeric(summaries[1], scale=2),
+                    "outstanding": binary_numeric(summaries[2], scale=2),
+                    "active_loans": binary_integer(summaries[3]),
+                },
+            )
+
+        for statement in restore:
+            conn.execute(text(statement))
+
+        # The ids were given explicitly, the identities continue after them
+        for model in (CustomerORM, LoanORM, PaymentsORM):
+            table = model.__tablename__
+            sequence = f"pg_get_serial_sequence('{table}', 'id')"
+            conn.execute(text(f"SELECT setval({sequence}, max(id)) FROM {table} HAVING count(*) > 0"))  # noqa: S608
+
+    report.elapsed = round(time.perf_counter() - started, 3)
+    rows = report.customers + report.loans * 2 + report.payments
+    report.rows_per_second = round(rows / report.elapsed, 1) if report.elapsed else 0
+
+    return report
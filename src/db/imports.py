@@ -0,0 +1,360 @@
+import csv
+import json
+import time
+from collections.abc import Callable, Iterator
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Literal, Optional, TextIO
+
+from email_validator import EmailNotValidError, validate_email
+from pydantic import BaseModel
+from sqlalchemy import text
+
+from core.cache import cache
+from core.utils.datetime import LocalTime
+from db.copy import copy_rows
+from db.models import LoanORM
+from db.schedules import LOAN_TERMS, UNSCHEDULED, write_schedules
+from db.session import engine
+
+MAX_REPORTED_REJECTS = 1000
+
+# Records read between two calls of the progress callback of an import
+PROGRESS_RECORDS = 10_000
+
+ImportEntity = Literal["customers", "loans", "payments"]
+ImportFormat = Literal["csv", "ndjson"]
+
+
+class ImportReject(BaseModel):
+    line: int
+    error: str
+
+
+class ImportReport(BaseModel):
+    entity: str
+    read: int = 0
+    imported: int = 0
+    rejected: int = 0
+    elapsed: float = 0
+    rows_per_second: float = 0
+    rejects: list[ImportReject] = []
+
+    def reject(self, line: int, error: str) -> None:
+        self.rejected += 1
+
+        # Keep the report bounded whatever the size of the file
+        if len(self.rejects) < MAX_REPORTED_REJECTS:
+            self.rejects.append(ImportReject(line=line, error=error))
+
+
+def parse_bool(value, *, default: bool = True) -> bool:
+    if value is None or value == "":
+        return default
+
+    if isinstance(value, bool):
+        return value
+
+    if str(value).lower() in ("true", "t", "1", "yes"):
+        return True
+
+    if str(value).lower() in ("false", "f", "0", "no"):
+        return False
+
+    raise ValueError(f"Invalid boolean '{value}'")
+
+
+def parse_int(record: dict, field: str) -> int:
+    value = record.get(field)
+
+    if value is None or value == "":
+        raise ValueError("Missing parameter")
+
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid {field} '{value}'") from None
+
+
+def parse_amount(record: dict) -> Decimal:
+    value = record.get("amount")
+
+    if value is None or value == "":
+        raise ValueError("Missing parameter")
+
+    try:
+        amount = Decimal(str(value))
+    except InvalidOperation:
+        raise ValueError(f"Invalid amount '{value}'") from None
+
+    if not amount.is_finite() or amount <= 0:
+        raise ValueError(f"Invalid amount '{value}'")
+
+    return round(amount, 2)
+
+
+def parse_issued(record: dict):
+    value = record.get("issued")
+
+    if value is None or value == "":
+        return LocalTime.now()
+
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        raise ValueError(f"Invalid issued date '{value}'") from None
+
+
+def validate_customer(record: dict) -> tuple:
+    if not record.get("full_name") or not record.get("email"):
+        raise ValueError("Missing parameter")
+
+    try:
+        email = validate_email(str(record["email"]), check_deliverability=False)
+    except EmailNotValidError:
+        raise ValueError("Invalid email address") from None
+
+    return str(record["full_name"]), email.normalized, parse_bool(record.get("status"))
+
+
+def validate_loan(record: dict) -> tuple:
+    return (
+        parse_int(record, "customer_id"),
+        parse_amount(record),
+        parse_issued(record),
+        parse_bool(record.get("status")),
+    )
+
+
+def validate_payment(record: dict) -> tuple:
+    return parse_int(record, "loan_id"), parse_amount(record), parse_issued(record), parse_bool(record.get("status"))
+
+
+class ImportSpec(BaseModel):
+    table: str
+    columns: tuple[str, ...]
+    parse: Callable[[dict], tuple]
+    # Staging columns looked up by the checks
+    indexes: tuple[str, ...] = ()
+    # Statements removing the staged rows that break a relational rule, with the error reported for them
+    checks: tuple[tuple[str, str], ...]
+    # Cached entities whose records the imported rows change, through the triggers
+    invalidates: tuple[str, ...] = ()
+
+
+SPECS: dict[str, ImportSpec] = {
+    "customers": ImportSpec(
+        table="customers",
+        columns=("full_name", "email", "status"),
+        parse=validate_customer,
+        indexes=("email",),
+        checks=(
+            (
+                "DELETE FROM import_staging s USING import_staging d "
+                "WHERE d.email = s.email AND d.line < s.line RETURNING s.line",
+                "Email duplicated in file",
+            ),
+            (
+                "DELETE FROM import_staging s USING customers c WHERE c.email = s.email RETURNING s.line",
+                "Email already registered",
+            ),
+        ),
+    ),
+    "loans": ImportSpec(
+        table="loans",
+        columns=("customer_id", "amount", "issued", "status"),
+        parse=validate_loan,
+        checks=(
+            (
+                "DELETE FROM import_staging s WHERE NOT EXISTS "
+                "(SELECT 1 FROM customers c WHERE c.id = s.customer_id) RETURNING s.line",
+                "Customer not found",
+            ),
+        ),
+    ),
+    "payments": ImportSpec(
+        table="payments",
+        columns=("loan_id", "amount", "issued", "status"),
+        parse=validate_payment,
+        invalidates=("loans",),
+        checks=(
+            (
+                "DELETE FROM import_staging s WHERE NOT EXISTS "
+                "(SELECT 1 FROM loans l WHERE l.id = s.loan_id) RETURNING s.line",
+                "Loan not found",
+            ),
+        ),
+    ),
+}
+
+
+def detect_format(filename: str | None) -> ImportFormat:
+    if filename and filename.lower().endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+
+    return "csv"
+
+
+def read_records(stream: TextIO, file_format: ImportFormat) -> Iterator[tuple[int, dict | None]]:
+    """The function `read_records` parses a CSV or NDJSON stream one record at a
+    time.
+
+    Parameters
+    ----------
+    stream : TextIO
+        The text stream of the file.
+    file_format : ImportFormat
+        `csv` for files with a header row, `ndjson` for one JSON object per line.
+
+    Returns
+    -------
+        a generator of the line number and the record, `None` when the line
+    can't be parsed.
+    """
+
+    if file_format == "csv":
+        reader = csv.DictReader(stream)
+
+        for record in reader:
+            yield reader.line_num, record
+
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError:
+            record = None
+
+        yield line_number, record if isinstance(record, dict) else None
+
+
+def validate_records(
+    stream: TextIO,
+    file_format: ImportFormat,
+    spec: ImportSpec,
+    report: ImportReport,
+    progress: Optional[Callable[[int], None]] = None,
+) -> Iterator[tuple]:
+    """The function `validate_records` yields the staging row of every valid
+    record and reports the rejected ones.
+
+    Parameters
+    ----------
+    stream : TextIO
+        The text stream of the file.
+    file_format : ImportFormat
+        The format of the file.
+    spec : ImportSpec
+        The rules of the imported entity.
+    report : ImportReport
+        The report that receives the counters and the rejects.
+    progress : Callable, optional
+        Called with the amount of records read every `PROGRESS_RECORDS`
+    records.
+
+    Returns
+    -------
+        a generator of tuples with the line number followed by the columns of
+    the entity.
+    """
+
+    for line, record in read_records(stream, file_format):
+        report.read += 1
+
+        if progress is not None and report.read % PROGRESS_RECORDS == 0:
+            progress(report.read)
+
+        if record is None:
+            report.reject(line, "Malformed record")
+            continue
+
+        try:
+            yield (line, *spec.parse(record))
+        except ValueError as exc:
+            report.reject(line, str(exc))
+
+
+def import_stream(
+    entity: ImportEntity, stream: TextIO, file_format: ImportFormat, progress: Optional[Callable[[int], None]] = None
+) -> ImportReport:
+    """The function `import_stream` loads a CSV or NDJSON file into a table with
+    `COPY ... FROM STDIN`. The records are validated while they're streamed
+    into a temporary staging table, the relational rules are then checked with
+    set based statements before moving the valid rows into the table. The
+    schedules of the imported loans are computed in the same transaction.
+
+    Parameters
+    ----------
+    entity : ImportEntity
+        The table to load, `customers`, `loans` or `payments`.
+    stream : TextIO
+        The text stream of the file, it's read once and never held in memory.
+    file_format : ImportFormat
+        `csv` or `ndjson`.
+    progress : Callable, optional
+        Called with the amount of records read, between the chunks pulled by
+    the COPY and once more before the rows are moved into the table. An
+    exception it raises aborts the import, nothing is written.
+
+    Returns
+    -------
+        the report of the import, with the throughput and the rejected lines.
+    """
+
+    spec = SPECS[entity]
+    report = ImportReport(entity=entity)
+    columns = ", ".join(spec.columns)
+    started = time.perf_counter()
+
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                f"CREATE TEMP TABLE import_staging ON COMMIT DROP AS "  # noqa: S608
+                f"SELECT 0::bigint AS line, {columns} FROM {spec.table} WITH NO DATA"
+            )
+        )
+
+        copy_rows(
+            conn,
+            "import_staging",
+            ("line", *spec.columns),
+            validate_records(stream, file_format, spec, report, progress),
+        )
+
+        for column in spec.indexes:
+            conn.execute(text(f"CREATE INDEX ON import_staging ({column})"))
+
+        conn.execute(text("ANALYZE import_staging"))
+
+        for statement, error in spec.checks:
+            for (line,) in conn.exec_driver_sql(statement):
+                report.reject(line, error)
+
+        if progress is not None:
+            progress(report.read)
+
+        report.imported, first, last = conn.execute(
+            text(
+                f"WITH imported AS (INSERT INTO {spec.table} ({columns}, created, modified) "  # noqa: S608
+                f"SELECT {columns}, now(), now() FROM import_staging ORDER BY line RETURNING id) "
+                f"SELECT count(*), min(id), max(id) FROM imported"
+            )
+        ).one()
+
+        if entity == "loans" and report.imported:
+            # The schedules of the new loans are committed with them, their balances start at the total to pay
+            write_schedules(conn, LOAN_TERMS.where(LoanORM.id.between(first, last), UNSCHEDULED))
+
+    if report.imported:
+        # Committed, the balances moved by the imported payments are read again
+        cache.clear(*spec.invalidates)
+
+    report.rejects.sort(key=lambda reject: reject.line)
+    report.elapsed = round(time.perf_counter() - started, 3)
+    report.rows_per_second = round(report.imported / report.elapsed, 1) if report.elapsed else 0
+
+    return report
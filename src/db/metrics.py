@@ -0,0 +1,113 @@
+import hashlib
+import re
+import time
+
+from loguru import logger
+from sqlalchemy import Engine, event
+
+from core.metrics import registry
+from core.metrics.timing import record_query
+from core.settings import settings
+from db.pool import pool_status
+
+# Statement latencies in seconds, finer than the request ones
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5)
+
+QUERIES = registry.counter("db_queries_total", "SQL statements executed", ("engine",))
+QUERY_ERRORS = registry.counter("db_query_errors_total", "SQL statements that raised an error", ("engine",))
+QUERY_LATENCY = registry.histogram(
+    "db_query_duration_seconds", "SQL statement latency in seconds", ("engine",), buckets=QUERY_BUCKETS
+)
+
+POOL_SIZE = registry.gauge("db_pool_size", "Connections kept by the pool", ("engine",))
+POOL_CHECKED_OUT = registry.gauge("db_pool_checked_out", "Connections in use", ("engine",))
+POOL_OVERFLOW = registry.gauge("db_pool_overflow", "Connections opened beyond the pool size", ("engine",))
+POOL_CHECKOUTS = registry.gauge("db_pool_checkouts_total", "Connections handed out by the pool", ("engine",))
+POOL_WAIT = registry.gauge("db_pool_wait_seconds_total", "Time spent waiting for a connection", ("engine",))
+POOL_TIMEOUTS = registry.gauge("db_pool_timeouts_total", "Checkouts that timed out", ("engine",))
+
+ENGINES: dict[str, Engine] = {}
+
+# Literals and bind placeholders of the drivers (asyncpg `$1`, psycopg2 `%(name)s`)
+LITERALS = re.compile(r"'(?:[^']|'')*'|\$\d+|%\(\w+\)s|%s|\b\d+(?:\.\d+)?\b")
+VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> tuple[str, str]:
+    """The function `fingerprint` normalizes a statement so every execution of
+    the same query, whatever its values, is logged under the same key.
+
+    Parameters
+    ----------
+    statement : str
+        The SQL sent to the driver.
+
+    Returns
+    -------
+        a tuple with a short hash of the normalized statement and the
+    normalized statement.
+    """
+
+    normalized = LITERALS.sub("?", statement)
+    normalized = VALUE_LISTS.sub("(...)", normalized)
+    normalized = WHITESPACE.sub(" ", normalized).strip()
+
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest(), normalized
+
+
+def instrument_engine(name: str, engine: Engine) -> None:
+    """The function `instrument_engine` counts and times the statements run by
+    an engine and reports its pool on every scrape.
+
+    Parameters
+    ----------
+    name : str
+        The value of the `engine` label.
+    engine : Engine
+        A sync engine, or the `sync_engine` of an async one.
+    """
+
+    ENGINES[name] = engine
+    queries, errors, latency = QUERIES.labels(name), QUERY_ERRORS.labels(name), QUERY_LATENCY.labels(name)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001, PLR0913
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):  # noqa: ARG001, PLR0913
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+
+        queries.inc()
+        latency.observe(elapsed)
+        record_query(elapsed)
+
+        if elapsed >= settings.SLOW_QUERY_SECONDS:
+            key, normalized = fingerprint(statement)
+            logger.warning(f"Slow query {key} on {name} took {elapsed * 1000:.1f}ms: {normalized}")
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+
+        if started:
+            started.pop()
+
+        errors.inc()
+
+
+@registry.collector
+def collect_pools() -> None:
+    for name, engine in ENGINES.items():
+        status = pool_status(engine)
+
+        if status.size is not None:
+            POOL_SIZE.labels(name).set(status.size)
+            POOL_CHECKED_OUT.labels(name).set(status.checked_out)
+            POOL_OVERFLOW.labels(name).set(max(status.overflow, 0))
+
+        if status.metrics is not None:
+            POOL_CHECKOUTS.labels(name).set(status.metrics.checkouts)
+            POOL_WAIT.labels(name).set(status.metrics.wait_time)
+            POOL_TIMEOUTS.labels(name).set(status.metrics.timeouts)
@@ -0,0 +1,41 @@
+-- Schema of the service before the migrations, the customers with their loans and payments. Every statement is
+-- idempotent, so the databases created by `create_all` adopt it without changes.
+
+CREATE TABLE IF NOT EXISTS customers (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY (START WITH 1),
+    full_name VARCHAR(200) NOT NULL,
+    email VARCHAR(100) NOT NULL,
+    status BOOLEAN NOT NULL,
+    created TIMESTAMP WITH TIME ZONE,
+    modified TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id),
+    UNIQUE (email)
+);
+
+CREATE TABLE IF NOT EXISTS loans (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY (START WITH 1),
+    customer_id INTEGER NOT NULL,
+    amount NUMERIC(19, 2) NOT NULL,
+    issued TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    status BOOLEAN NOT NULL,
+    created TIMESTAMP WITH TIME ZONE,
+    modified TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(customer_id) REFERENCES customers (id) DEFERRABLE INITIALLY DEFERRED
+);
+
+CREATE INDEX IF NOT EXISTS ix_loans_customer_id ON loans (customer_id);
+
+CREATE TABLE IF NOT EXISTS payments (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY (START WITH 1),
+    loan_id INTEGER NOT NULL,
+    amount NUMERIC(19, 2) NOT NULL,
+    issued TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+    status BOOLEAN NOT NULL,
+    created TIMESTAMP WITH TIME ZONE,
+    modified TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id),
+    FOREIGN KEY(loan_id) REFERENCES loans (id) DEFERRABLE INITIALLY DEFERRED
+);
+
+CREATE INDEX IF NOT EXISTS ix_payments_loan_id ON payments (loan_id);
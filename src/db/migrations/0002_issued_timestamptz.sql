@@ -0,0 +1,7 @@
+-- The issue dates are written as aware datetimes by the async driver. The naive values were stored in the time zone
+-- of the session, the same one the conversion reads them in. Converting a column that is already timestamptz is a
+-- no-op.
+
+ALTER TABLE loans ALTER COLUMN issued TYPE TIMESTAMP WITH TIME ZONE;
+
+ALTER TABLE payments ALTER COLUMN issued TYPE TIMESTAMP WITH TIME ZONE;
@@ -0,0 +1,14 @@
+-- Indexes of the keyset pagination on (created, id) and of the validators of the lists, which read the last
+-- modification of a page from the index only.
+
+CREATE INDEX IF NOT EXISTS ix_customers_created_id ON customers (created, id);
+
+CREATE INDEX IF NOT EXISTS ix_customers_id_modified ON customers (id) INCLUDE (modified);
+
+CREATE INDEX IF NOT EXISTS ix_loans_created_id ON loans (created, id);
+
+CREATE INDEX IF NOT EXISTS ix_loans_id_modified ON loans (id) INCLUDE (modified);
+
+CREATE INDEX IF NOT EXISTS ix_payments_created_id ON payments (created, id);
+
+CREATE INDEX IF NOT EXISTS ix_payments_id_modified ON payments (id) INCLUDE (modified);
@@ -0,0 +1,7 @@
+-- Trigram indexes of the name and email filters of the customers, which match substrings with ILIKE.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_customers_full_name_trgm ON customers USING gin (full_name gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS ix_customers_email_trgm ON customers USING gin (email gin_trgm_ops);
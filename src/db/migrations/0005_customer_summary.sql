@@ -0,0 +1,174 @@
+-- Customers with the summary of their loans and payments, maintained by statement triggers on customers, loans and
+-- payments. The customers registered before it are backfilled.
+
+CREATE TABLE IF NOT EXISTS customer_summary (
+    customer_id INTEGER NOT NULL,
+    total_lent NUMERIC(19, 2) DEFAULT '0' NOT NULL,
+    total_paid NUMERIC(19, 2) DEFAULT '0' NOT NULL,
+    outstanding NUMERIC(19, 2) GENERATED ALWAYS AS (total_lent - total_paid) STORED,
+    active_loans INTEGER DEFAULT '0' NOT NULL,
+    modified TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (customer_id),
+    FOREIGN KEY(customer_id) REFERENCES customers (id) ON DELETE CASCADE
+);
+
+CREATE OR REPLACE FUNCTION customer_summary_customers_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO customer_summary (customer_id) SELECT id FROM new_rows ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_insert
+AFTER INSERT ON customers
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_customers_insert();
+
+CREATE OR REPLACE FUNCTION customer_summary_loans_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT r.customer_id, r.amount, (SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status), 1 FROM new_rows r WHERE r.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_insert
+AFTER insert ON loans
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_loans_insert();
+
+CREATE OR REPLACE FUNCTION customer_summary_loans_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT r.customer_id, -r.amount, -(SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status), -1 FROM (SELECT o.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.customer_id, o.amount, o.status) IS DISTINCT FROM (n.customer_id, n.amount, n.status)) r WHERE r.status UNION ALL SELECT r.customer_id, r.amount, (SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status), 1 FROM (SELECT n.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.customer_id, o.amount, o.status) IS DISTINCT FROM (n.customer_id, n.amount, n.status)) r WHERE r.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_update
+AFTER update ON loans
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_loans_update();
+
+CREATE OR REPLACE FUNCTION customer_summary_loans_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT r.customer_id, -r.amount, -(SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status), -1 FROM old_rows r WHERE r.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_delete
+AFTER delete ON loans
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_loans_delete();
+
+CREATE OR REPLACE FUNCTION customer_summary_payments_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT l.customer_id, 0, r.amount, 0 FROM new_rows r JOIN loans l ON l.id = r.loan_id WHERE r.status AND l.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_insert
+AFTER insert ON payments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_payments_insert();
+
+CREATE OR REPLACE FUNCTION customer_summary_payments_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT l.customer_id, 0, -r.amount, 0 FROM (SELECT o.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.loan_id, o.amount, o.status) IS DISTINCT FROM (n.loan_id, n.amount, n.status)) r JOIN loans l ON l.id = r.loan_id WHERE r.status AND l.status UNION ALL SELECT l.customer_id, 0, r.amount, 0 FROM (SELECT n.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.loan_id, o.amount, o.status) IS DISTINCT FROM (n.loan_id, n.amount, n.status)) r JOIN loans l ON l.id = r.loan_id WHERE r.status AND l.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_update
+AFTER update ON payments
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_payments_update();
+
+CREATE OR REPLACE FUNCTION customer_summary_payments_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(loans) AS loans
+        FROM (SELECT l.customer_id, 0, -r.amount, 0 FROM old_rows r JOIN loans l ON l.id = r.loan_id WHERE r.status AND l.status) AS c (customer_id, lent, paid, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_delete
+AFTER delete ON payments
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_payments_delete();
+
+INSERT INTO customer_summary (customer_id, total_lent, total_paid, active_loans)
+SELECT c.id, coalesce(t.lent, 0), coalesce(t.paid, 0), coalesce(t.loans, 0)
+FROM customers c
+LEFT JOIN LATERAL (
+    SELECT sum(r.amount) AS lent, sum((SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status)) AS paid, count(*) AS loans
+    FROM loans r
+    WHERE r.customer_id = c.id AND r.status
+) AS t ON true
+WHERE NOT EXISTS (SELECT 1 FROM customer_summary s WHERE s.customer_id = c.id)
+ON CONFLICT DO NOTHING;
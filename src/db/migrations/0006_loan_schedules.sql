@@ -0,0 +1,35 @@
+-- Terms of the loans and their amortization schedules. The existing loans take the default terms, their schedules
+-- are computed by `python -m commands.recompute_schedules --missing`.
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS rate NUMERIC(7, 6) DEFAULT '0.15' NOT NULL;
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS term INTEGER DEFAULT '12' NOT NULL;
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS method VARCHAR(10) DEFAULT 'french' NOT NULL;
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS tax_rate NUMERIC(7, 6) DEFAULT '0.16' NOT NULL;
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ck_loans_term') THEN
+        ALTER TABLE loans ADD CONSTRAINT ck_loans_term CHECK (term >= 1);
+    END IF;
+
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'ck_loans_method') THEN
+        ALTER TABLE loans ADD CONSTRAINT ck_loans_method CHECK (method IN ('french', 'german'));
+    END IF;
+END
+$$;
+
+CREATE TABLE IF NOT EXISTS loan_schedules (
+    loan_id INTEGER NOT NULL,
+    installment NUMERIC(19, 2) NOT NULL,
+    total_interest NUMERIC(19, 2) NOT NULL,
+    total_tax NUMERIC(19, 2) NOT NULL,
+    total_payment NUMERIC(19, 2) NOT NULL,
+    computed TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    PRIMARY KEY (loan_id),
+    FOREIGN KEY(loan_id) REFERENCES loans (id) ON DELETE CASCADE
+);
+
+ALTER TABLE loan_schedules SET (fillfactor = 70);
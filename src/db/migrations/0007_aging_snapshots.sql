@@ -0,0 +1,26 @@
+-- Daily aging snapshots of the portfolio, computed by `python -m commands.compute_aging`.
+
+CREATE TABLE IF NOT EXISTS aging_snapshots (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY (START WITH 1),
+    as_of DATE NOT NULL,
+    computed TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    elapsed FLOAT NOT NULL,
+    loans INTEGER NOT NULL,
+    outstanding BIGINT NOT NULL,
+    past_due BIGINT NOT NULL,
+    delinquent_loans INTEGER NOT NULL,
+    delinquent_outstanding BIGINT NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (as_of)
+);
+
+CREATE TABLE IF NOT EXISTS aging_buckets (
+    snapshot_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    bucket VARCHAR(10) NOT NULL,
+    loans INTEGER NOT NULL,
+    outstanding BIGINT NOT NULL,
+    past_due BIGINT NOT NULL,
+    PRIMARY KEY (snapshot_id, position),
+    FOREIGN KEY(snapshot_id) REFERENCES aging_snapshots (id) ON DELETE CASCADE
+);
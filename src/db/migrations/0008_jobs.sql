@@ -0,0 +1,22 @@
+-- Background jobs, claimed by the runners of the workers.
+
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER GENERATED BY DEFAULT AS IDENTITY (START WITH 1),
+    type VARCHAR(30) NOT NULL,
+    status VARCHAR(10) DEFAULT 'queued' NOT NULL,
+    params JSONB DEFAULT '{}' NOT NULL,
+    progress FLOAT,
+    message TEXT,
+    error TEXT,
+    cancel_requested BOOLEAN DEFAULT 'false' NOT NULL,
+    result JSONB,
+    result_path TEXT,
+    result_media_type VARCHAR(100),
+    result_filename VARCHAR(255),
+    created TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    started TIMESTAMP WITH TIME ZONE,
+    finished TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (id)
+);
+
+CREATE INDEX IF NOT EXISTS ix_jobs_type_id_queued ON jobs (type, id) WHERE status = 'queued';
@@ -0,0 +1,106 @@
+-- Running balance of the loans, maintained by statement triggers on the payments and the schedules. Every statement
+-- is idempotent, so the databases created by `create_all` adopt it without changes.
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS paid_total NUMERIC(19, 2) DEFAULT '0' NOT NULL;
+
+ALTER TABLE loans ADD COLUMN IF NOT EXISTS outstanding NUMERIC(19, 2) DEFAULT '0' NOT NULL;
+
+CREATE OR REPLACE FUNCTION loan_balance_payments_insert() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET paid_total = l.paid_total + d.paid,
+        outstanding = l.outstanding - d.paid,
+        modified = now()
+    FROM (
+        SELECT loan_id, sum(paid) AS paid
+        FROM (SELECT r.loan_id, r.amount FROM new_rows r WHERE r.status) AS c (loan_id, paid)
+        GROUP BY loan_id
+    ) AS d
+    WHERE l.id = d.loan_id AND d.paid <> 0;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_insert
+AFTER insert ON payments
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_payments_insert();
+
+CREATE OR REPLACE FUNCTION loan_balance_payments_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET paid_total = l.paid_total + d.paid,
+        outstanding = l.outstanding - d.paid,
+        modified = now()
+    FROM (
+        SELECT loan_id, sum(paid) AS paid
+        FROM (SELECT r.loan_id, -r.amount FROM (SELECT o.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.loan_id, o.amount, o.status) IS DISTINCT FROM (n.loan_id, n.amount, n.status)) r WHERE r.status UNION ALL SELECT r.loan_id, r.amount FROM (SELECT n.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE (o.loan_id, o.amount, o.status) IS DISTINCT FROM (n.loan_id, n.amount, n.status)) r WHERE r.status) AS c (loan_id, paid)
+        GROUP BY loan_id
+    ) AS d
+    WHERE l.id = d.loan_id AND d.paid <> 0;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_update
+AFTER update ON payments
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_payments_update();
+
+CREATE OR REPLACE FUNCTION loan_balance_payments_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET paid_total = l.paid_total + d.paid,
+        outstanding = l.outstanding - d.paid,
+        modified = now()
+    FROM (
+        SELECT loan_id, sum(paid) AS paid
+        FROM (SELECT r.loan_id, -r.amount FROM old_rows r WHERE r.status) AS c (loan_id, paid)
+        GROUP BY loan_id
+    ) AS d
+    WHERE l.id = d.loan_id AND d.paid <> 0;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_delete
+AFTER delete ON payments
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_payments_delete();
+
+CREATE OR REPLACE FUNCTION loan_balance_schedules() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET outstanding = r.total_payment - l.paid_total,
+        modified = now()
+    FROM new_rows r
+    WHERE l.id = r.loan_id AND l.outstanding <> r.total_payment - l.paid_total;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_insert
+AFTER INSERT ON loan_schedules
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_schedules();
+
+CREATE OR REPLACE TRIGGER loan_balance_update
+AFTER UPDATE ON loan_schedules
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_schedules();
+
+-- Balances of the existing loans, only the ones that differ are written. The loans without a schedule owe their
+-- principal until `python -m commands.recompute_schedules --missing` computes it
+UPDATE loans l
+SET paid_total = b.paid, outstanding = b.total - b.paid, modified = now()
+FROM (
+    SELECT l.id, coalesce(p.paid, 0) AS paid, coalesce(s.total_payment, l.amount) AS total
+    FROM loans l
+    LEFT JOIN loan_schedules s ON s.loan_id = l.id
+    LEFT JOIN (SELECT loan_id, sum(amount) AS paid FROM payments WHERE status GROUP BY loan_id) AS p ON p.loan_id = l.id
+) AS b
+WHERE l.id = b.id AND (l.paid_total, l.outstanding) IS DISTINCT FROM (b.paid, b.total - b.paid);
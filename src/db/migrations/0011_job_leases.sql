@@ -0,0 +1,7 @@
+-- Leases of the running jobs, so the jobs of a runner that died are queued again, and the claims of every job.
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS heartbeat TIMESTAMP WITH TIME ZONE;
+
+ALTER TABLE jobs ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT '0' NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_jobs_heartbeat_running ON jobs (heartbeat) WHERE status = 'running';
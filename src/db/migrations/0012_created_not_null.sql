@@ -0,0 +1,14 @@
+-- The creation dates order the keyset pages, a NULL one would drop its row out of them. The rows written without one
+-- take their last modification, or the time of the upgrade, and the database fills the date of the next ones.
+
+UPDATE customers SET created = coalesce(modified, now()) WHERE created IS NULL;
+
+UPDATE loans SET created = coalesce(modified, now()) WHERE created IS NULL;
+
+UPDATE payments SET created = coalesce(modified, now()) WHERE created IS NULL;
+
+ALTER TABLE customers ALTER COLUMN created SET DEFAULT now(), ALTER COLUMN created SET NOT NULL;
+
+ALTER TABLE loans ALTER COLUMN created SET DEFAULT now(), ALTER COLUMN created SET NOT NULL;
+
+ALTER TABLE payments ALTER COLUMN created SET DEFAULT now(), ALTER COLUMN created SET NOT NULL;
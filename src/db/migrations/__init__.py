@@ -0,0 +1,154 @@
+"""Versioned migrations of the schema.
+
+Every migration is a `NNNN_name.sql` file of this package, applied in the
+order of its version by `python -m commands.migrate`, in its own transaction
+along with its record in `schema_migrations`. The first one is the schema
+before the migrations existed, every change of the models since is a new
+version. The statements are written to be idempotent (`IF NOT EXISTS`,
+`CREATE OR REPLACE`), the development databases created by `create_all`
+already have part of them."""
+
+import re
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from sqlalchemy import Connection, Engine, text
+
+from db.session import engine
+
+MIGRATIONS_DIR = Path(__file__).parent
+
+MIGRATION_NAME = re.compile(r"^(\d{4})_(\w+)\.sql$")
+
+# Key of the advisory lock held while migrating, the deploys running at once wait for each other
+LOCK_KEY = 7_341_002
+
+CREATE_TABLE = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version integer PRIMARY KEY,
+    name text NOT NULL,
+    applied timestamp with time zone NOT NULL DEFAULT now(),
+    elapsed float NOT NULL
+)
+"""
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    path: Path
+    applied: Optional[datetime] = None
+
+    @property
+    def label(self) -> str:
+        return f"{self.version:04d}_{self.name}"
+
+
+def available() -> list[Migration]:
+    migrations = sorted(
+        (
+            Migration(int(match[1]), match[2], path)
+            for path in MIGRATIONS_DIR.iterdir()
+            if (match := MIGRATION_NAME.match(path.name))
+        ),
+        key=lambda migration: migration.version,
+    )
+
+    versions = [migration.version for migration in migrations]
+
+    if len(versions) != len(set(versions)):
+        raise ValueError("Two migrations share a version")
+
+    return migrations
+
+
+def applied(conn: Connection) -> dict[int, datetime]:
+    conn.execute(text(CREATE_TABLE))
+    return dict(conn.execute(text("SELECT version, applied FROM schema_migrations")).tuples().all())
+
+
+def status(bind: Optional[Engine] = None) -> list[Migration]:
+    """The function `status` lists the migrations with the moment each one was
+    applied, `None` for the pending ones.
+
+    Parameters
+    ----------
+    bind : Engine, optional
+        The database to inspect, the one of the settings by default.
+
+    Returns
+    -------
+        the migrations, in order.
+    """
+
+    with (bind or engine).begin() as conn:
+        done = applied(conn)
+
+    migrations = available()
+
+    for migration in migrations:
+        migration.applied = done.get(migration.version)
+
+    return migrations
+
+
+def migrate(target: Optional[int] = None, bind: Optional[Engine] = None) -> list[Migration]:
+    """The function `migrate` applies the pending migrations in order.
+
+    Parameters
+    ----------
+    target : int, optional
+        The last version to apply, every pending one by default.
+    bind : Engine, optional
+        The database to migrate, the one of the settings by default.
+
+    Returns
+    -------
+        the migrations applied, in order.
+    """
+
+    done = []
+
+    with (bind or engine).connect() as conn:
+        # Held by the session across the transactions of the migrations
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+        conn.commit()
+
+        try:
+            with conn.begin():
+                versions = applied(conn)
+
+            pending = [
+                migration
+                for migration in available()
+                if migration.version not in versions and (target is None or migration.version <= target)
+            ]
+
+            for migration in pending:
+                started = time.perf_counter()
+
+                with conn.begin():
+                    conn.exec_driver_sql(migration.path.read_text())
+                    conn.execute(
+                        text(
+                            "INSERT INTO schema_migrations (version, name, elapsed) VALUES (:version, :name, :elapsed)"
+                        ),
+                        {
+                            "version": migration.version,
+                            "name": migration.name,
+                            "elapsed": round(time.perf_counter() - started, 3),
+                        },
+                    )
+
+                logger.info(f"Migration {migration.label} applied in {time.perf_counter() - started:.3f}s")
+                done.append(migration)
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+            conn.commit()
+
+    return done
@@ -1 +1,6 @@
+from .balances import *  # noqa: F403
+from .jobs import *  # noqa: F403
 from .models import *  # noqa: F403
+from .reports import *  # noqa: F403
+from .schedules import *  # noqa: F403
+from .summary import *  # noqa: F403
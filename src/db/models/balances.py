@@ -0,0 +1,96 @@
+from sqlalchemy import DDL, event
+
+from db.models.base import Base
+from db.models.summary import CHANGED_ROWS, TRANSITION_TABLES
+
+# Amounts of the active payments of a transition table, as (loan_id, paid)
+PAYMENT_CHANGES = {
+    "new_rows": "SELECT r.loan_id, r.amount FROM new_rows r WHERE r.status",
+    "old_rows": "SELECT r.loan_id, -r.amount FROM old_rows r WHERE r.status",
+}
+
+# Columns the balances depend on, the updates leaving them untouched cancel out
+PAYMENT_COLUMNS = ("loan_id", "amount", "status")
+
+APPLY_PAYMENTS = """
+CREATE OR REPLACE FUNCTION loan_balance_payments_{operation}() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET paid_total = l.paid_total + d.paid,
+        outstanding = l.outstanding - d.paid,
+        modified = now()
+    FROM (
+        SELECT loan_id, sum(paid) AS paid
+        FROM ({changes}) AS c (loan_id, paid)
+        GROUP BY loan_id
+    ) AS d
+    WHERE l.id = d.loan_id AND d.paid <> 0;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_{operation}
+AFTER {operation} ON payments
+REFERENCING {references}
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_payments_{operation}();
+"""
+
+# The total of a new or recomputed schedule is what remains to be paid of the loan
+APPLY_SCHEDULES = """
+CREATE OR REPLACE FUNCTION loan_balance_schedules() RETURNS trigger AS $$
+BEGIN
+    UPDATE loans l
+    SET outstanding = r.total_payment - l.paid_total,
+        modified = now()
+    FROM new_rows r
+    WHERE l.id = r.loan_id AND l.outstanding <> r.total_payment - l.paid_total;
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER loan_balance_insert
+AFTER INSERT ON loan_schedules
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_schedules();
+
+CREATE OR REPLACE TRIGGER loan_balance_update
+AFTER UPDATE ON loan_schedules
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION loan_balance_schedules();
+"""
+
+
+def balance_triggers() -> str:
+    statements = []
+
+    for operation, transition_tables in TRANSITION_TABLES.items():
+        references = " ".join(f"{name.split('_')[0].upper()} TABLE AS {name}" for name in transition_tables)
+        selected = [PAYMENT_CHANGES[name] for name in transition_tables]
+
+        if operation == "update":
+            # Skip the rows whose update doesn't move the balance
+            changed = {
+                name: CHANGED_ROWS.format(
+                    side=name[0],
+                    old=", ".join(f"o.{column}" for column in PAYMENT_COLUMNS),
+                    new=", ".join(f"n.{column}" for column in PAYMENT_COLUMNS),
+                )
+                for name in transition_tables
+            }
+            selected = [
+                PAYMENT_CHANGES[name].replace(f"FROM {name} r", f"FROM {changed[name]} r") for name in transition_tables
+            ]
+
+        statements.append(
+            APPLY_PAYMENTS.format(operation=operation, references=references, changes=" UNION ALL ".join(selected))
+        )
+
+    statements.append(APPLY_SCHEDULES)
+
+    return "\n".join(statements)
+
+
+# Runs after every create_all, the statements are idempotent
+event.listen(Base.metadata, "after_create", DDL(balance_triggers()))
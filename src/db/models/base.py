@@ -16,7 +16,8 @@ class UUIDMixin:
 
 
 class TimeStampedMixin:
-    created = Column(DateTime(timezone=True), default=LocalTime.now)
+    # Orders the keyset pages, which would skip the rows without one
+    created = Column(DateTime(timezone=True), nullable=False, default=LocalTime.now, server_default=func.now())
     modified = Column(DateTime(timezone=True), default=LocalTime.now, onupdate=func.now())
 
 
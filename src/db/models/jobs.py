@@ -0,0 +1,51 @@
+from sqlalchemy import (
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    Identity,
+    Index,
+    Integer,
+    String,
+    Text,
+    func,
+)
+from sqlalchemy.dialects.postgresql import JSONB
+
+from db.models.base import Base
+
+
+class JobORM(Base):
+    """Background job submitted through the API. The runners claim the queued
+    jobs of this table, so the queue survives restarts and is shared by every
+    process of the service."""
+
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Queued jobs of a type in submission order, the claim query of the runners
+        Index("ix_jobs_type_id_queued", "type", "id", postgresql_where="status = 'queued'"),
+        # Running jobs by lease, the ones whose runner died
+        Index("ix_jobs_heartbeat_running", "heartbeat", postgresql_where="status = 'running'"),
+    )
+
+    id = Column(Integer, Identity(start=1), primary_key=True)  # noqa: A003
+    type = Column(String(length=30), nullable=False)  # noqa: A003
+    status = Column(String(length=10), nullable=False, server_default="queued")
+    params = Column(JSONB, nullable=False, server_default="{}")
+    progress = Column(Float)
+    message = Column(Text)
+    error = Column(Text)
+    cancel_requested = Column(Boolean, nullable=False, server_default="false")
+    result = Column(JSONB)
+    result_path = Column(Text)
+    result_media_type = Column(String(length=100))
+    result_filename = Column(String(length=255))
+    created = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    started = Column(DateTime(timezone=True))
+    finished = Column(DateTime(timezone=True))
+    # Lease of the runner of a running job, renewed while it runs, and claims of the job so far
+    heartbeat = Column(DateTime(timezone=True))
+    attempts = Column(Integer, nullable=False, server_default="0")
+
+    def __str__(self) -> str:
+        return f"Job(id='{self.id}', type='{self.type}', status='{self.status}')"
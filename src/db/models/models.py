@@ -1,10 +1,45 @@
-from sqlalchemy import Column, ForeignKey, Numeric, String, Integer, Identity, Boolean, DateTime
+from sqlalchemy import (
+    DDL,
+    Boolean,
+    CheckConstraint,
+    Column,
+    DateTime,
+    ForeignKey,
+    Identity,
+    Index,
+    Integer,
+    Numeric,
+    String,
+    event,
+)
 from sqlalchemy.orm import relationship
 
-from db.models.base import BaseModel
+from core.utils.amortization import (
+    DEFAULT_METHOD,
+    DEFAULT_RATE,
+    DEFAULT_TAX_RATE,
+    DEFAULT_TERM,
+)
+from core.utils.datetime import LocalTime
+from db.models.base import Base, BaseModel
+
+# Trigram operators backing the customer name/email search indexes
+event.listen(Base.metadata, "before_create", DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
 
 class CustomerORM(BaseModel):
     __tablename__ = "customers"
+    __table_args__ = (
+        Index("ix_customers_created_id", "created", "id"),
+        # Covers the id/modified lookups of the conditional requests
+        Index("ix_customers_id_modified", "id", postgresql_include=["modified"]),
+        Index(
+            "ix_customers_full_name_trgm",
+            "full_name",
+            postgresql_using="gin",
+            postgresql_ops={"full_name": "gin_trgm_ops"},
+        ),
+        Index("ix_customers_email_trgm", "email", postgresql_using="gin", postgresql_ops={"email": "gin_trgm_ops"}),
+    )
 
     id = Column(Integer, Identity(start=1), primary_key=True)
     full_name = Column(String(length=200), nullable=False)
@@ -21,16 +56,32 @@ class CustomerORM(BaseModel):
 
 class LoanORM(BaseModel):
     __tablename__ = "loans"
+    __table_args__ = (
+        Index("ix_loans_created_id", "created", "id"),
+        Index("ix_loans_id_modified", "id", postgresql_include=["modified"]),
+        CheckConstraint("term >= 1", name="ck_loans_term"),
+        CheckConstraint("method IN ('french', 'german')", name="ck_loans_method"),
+    )
 
     id = Column(Integer, Identity(start=1), primary_key=True)
     customer_id = Column(ForeignKey(CustomerORM.id, deferrable=True, initially="DEFERRED"), nullable=False, index=True)
     amount = Column(Numeric(19, 2), nullable=False)
-    issued = Column(DateTime, nullable=False)
+    issued = Column(DateTime(timezone=True), nullable=False, default=LocalTime.now)
     status = Column(Boolean, nullable=False, default=True)
 
+    # Amortization terms, server defaults so the COPY imports get them too
+    rate = Column(Numeric(7, 6), nullable=False, server_default=str(DEFAULT_RATE))
+    term = Column(Integer, nullable=False, server_default=str(DEFAULT_TERM))
+    method = Column(String(length=10), nullable=False, server_default=DEFAULT_METHOD)
+    tax_rate = Column(Numeric(7, 6), nullable=False, server_default=str(DEFAULT_TAX_RATE))
+
+    # Running balance, maintained by the triggers of the payments and the schedules in the same transaction
+    paid_total = Column(Numeric(19, 2), nullable=False, server_default="0")
+    outstanding = Column(Numeric(19, 2), nullable=False, server_default="0")
+
     customer = relationship("CustomerORM", back_populates="loans", primaryjoin="LoanORM.customer_id == CustomerORM.id")
 
-    payments = relationship("PaymentsORM", back_populates="loans", cascade="all, delete-orphan")
+    payments = relationship("PaymentsORM", back_populates="loan", cascade="all, delete-orphan")
 
     class Config:
         orm_mode = True
@@ -40,11 +91,15 @@ class LoanORM(BaseModel):
 
 class PaymentsORM(BaseModel):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_created_id", "created", "id"),
+        Index("ix_payments_id_modified", "id", postgresql_include=["modified"]),
+    )
 
     id = Column(Integer, Identity(start=1), primary_key=True)
     loan_id = Column(ForeignKey(LoanORM.id, deferrable=True, initially="DEFERRED"), nullable=False, index=True)
     amount = Column(Numeric(19, 2), nullable=False)
-    issued = Column(DateTime, nullable=False)
+    issued = Column(DateTime(timezone=True), nullable=False, default=LocalTime.now)
     status = Column(Boolean, nullable=False, default=True)
 
     loan = relationship("LoanORM", back_populates="payments", primaryjoin="PaymentsORM.loan_id == LoanORM.id")
@@ -0,0 +1,56 @@
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    Float,
+    ForeignKey,
+    Identity,
+    Integer,
+    String,
+    func,
+)
+from sqlalchemy.orm import relationship
+
+from db.models.base import Base
+
+
+class AgingSnapshotORM(Base):
+    """Aging of the active loans as of a day, computed by the batch job so the
+    reports don't scan the portfolio. One snapshot per day, a new run of the
+    same day replaces it. Every amount is in cents."""
+
+    __tablename__ = "aging_snapshots"
+
+    id = Column(Integer, Identity(start=1), primary_key=True)  # noqa: A003
+    as_of = Column(Date, nullable=False, unique=True)
+    computed = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    elapsed = Column(Float, nullable=False)
+    loans = Column(Integer, nullable=False)
+    outstanding = Column(BigInteger, nullable=False)
+    past_due = Column(BigInteger, nullable=False)
+    delinquent_loans = Column(Integer, nullable=False)
+    delinquent_outstanding = Column(BigInteger, nullable=False)
+
+    buckets = relationship(
+        "AgingBucketORM", back_populates="snapshot", cascade="all, delete-orphan", order_by="AgingBucketORM.position"
+    )
+
+    def __str__(self) -> str:
+        return f"AgingSnapshot(as_of='{self.as_of}', loans='{self.loans}')"
+
+
+class AgingBucketORM(Base):
+    __tablename__ = "aging_buckets"
+
+    snapshot_id = Column(ForeignKey(AgingSnapshotORM.id, ondelete="CASCADE"), primary_key=True)
+    position = Column(Integer, primary_key=True)
+    bucket = Column(String(length=10), nullable=False)
+    loans = Column(Integer, nullable=False)
+    outstanding = Column(BigInteger, nullable=False)
+    past_due = Column(BigInteger, nullable=False)
+
+    snapshot = relationship("AgingSnapshotORM", back_populates="buckets")
+
+    def __str__(self) -> str:
+        return f"AgingBucket(bucket='{self.bucket}', loans='{self.loans}')"
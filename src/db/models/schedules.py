@@ -0,0 +1,27 @@
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, Numeric, event, func
+
+from db.models.base import Base
+from db.models.models import LoanORM
+
+
+class LoanScheduleORM(Base):
+    """Totals of the amortization schedule of every loan, computed from its
+    terms by the schedule engine. Kept apart from the loans so a recompute of
+    the portfolio only rewrites the loans whose totals changed, to move their
+    outstanding balance."""
+
+    __tablename__ = "loan_schedules"
+
+    loan_id = Column(ForeignKey(LoanORM.id, ondelete="CASCADE"), primary_key=True)
+    installment = Column(Numeric(19, 2), nullable=False)
+    total_interest = Column(Numeric(19, 2), nullable=False)
+    total_tax = Column(Numeric(19, 2), nullable=False)
+    total_payment = Column(Numeric(19, 2), nullable=False)
+    computed = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __str__(self) -> str:
+        return f"LoanSchedule(loan_id='{self.loan_id}', installment='{self.installment}')"
+
+
+# Room on every page for the updates of a recompute, they stay HOT since no index covers the totals
+event.listen(LoanScheduleORM.__table__, "after_create", DDL("ALTER TABLE loan_schedules SET (fillfactor = 70)"))
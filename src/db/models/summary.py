@@ -0,0 +1,160 @@
+from sqlalchemy import DDL, Column, DateTime, ForeignKey, Integer, Numeric, event, func
+
+from db.models.base import Base
+from db.models.models import CustomerORM
+
+
+class CustomerSummaryORM(Base):
+    """Read model with the portfolio totals of every customer. The rows are
+    maintained by statement triggers on customers, loans and payments, in the
+    same transaction as the writes, so every write path (API, bulk, COPY
+    imports) keeps it up to date.
+
+    The outstanding is the sum of the running balances of the loans, the
+    totals of their schedules minus what was paid, so it includes the
+    interest and the taxes the lent amount doesn't. Disabled loans and
+    payments don't count towards the totals."""
+
+    __tablename__ = "customer_summary"
+
+    customer_id = Column(ForeignKey(CustomerORM.id, ondelete="CASCADE"), primary_key=True)
+    total_lent = Column(Numeric(19, 2), nullable=False, server_default="0")
+    total_paid = Column(Numeric(19, 2), nullable=False, server_default="0")
+    outstanding = Column(Numeric(19, 2), nullable=False, server_default="0")
+    active_loans = Column(Integer, nullable=False, server_default="0")
+    modified = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+
+    def __str__(self) -> str:
+        return f"CustomerSummary(customer_id='{self.customer_id}', outstanding='{self.outstanding}')"
+
+
+# Active payments of the loan `r`
+LOAN_PAID = "(SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = r.id AND p.status)"
+
+# Contributions of the rows of a transition table, as (customer_id, lent, paid, outstanding, loans). The payments
+# move the outstanding through the balances of their loans, which update the loans
+CONTRIBUTIONS = {
+    "loans": {
+        "new_rows": f"SELECT r.customer_id, r.amount, {LOAN_PAID}, r.outstanding, 1 "  # noqa: S608
+        "FROM new_rows r WHERE r.status",
+        "old_rows": f"SELECT r.customer_id, -r.amount, -{LOAN_PAID}, -r.outstanding, -1 "  # noqa: S608
+        "FROM old_rows r WHERE r.status",
+    },
+    "payments": {
+        "new_rows": "SELECT l.customer_id, 0, r.amount, 0, 0 FROM new_rows r JOIN loans l ON l.id = r.loan_id "
+        "WHERE r.status AND l.status",
+        "old_rows": "SELECT l.customer_id, 0, -r.amount, 0, 0 FROM old_rows r JOIN loans l ON l.id = r.loan_id "
+        "WHERE r.status AND l.status",
+    },
+}
+
+# Columns the contributions of a table depend on, the updates leaving them untouched cancel out
+CONTRIBUTING_COLUMNS = {
+    "loans": ("customer_id", "amount", "status", "outstanding"),
+    "payments": ("loan_id", "amount", "status"),
+}
+
+# Side of the updated rows whose contributing columns changed
+CHANGED_ROWS = "(SELECT {side}.* FROM new_rows n JOIN old_rows o ON o.id = n.id WHERE ({old}) IS DISTINCT FROM ({new}))"
+
+TRANSITION_TABLES = {
+    "insert": ("new_rows",),
+    "update": ("old_rows", "new_rows"),
+    "delete": ("old_rows",),
+}
+
+APPLY_CONTRIBUTIONS = """
+CREATE OR REPLACE FUNCTION customer_summary_{table}_{operation}() RETURNS trigger AS $$
+BEGIN
+    UPDATE customer_summary s
+    SET total_lent = s.total_lent + d.lent,
+        total_paid = s.total_paid + d.paid,
+        outstanding = s.outstanding + d.outstanding,
+        active_loans = s.active_loans + d.loans,
+        modified = now()
+    FROM (
+        SELECT customer_id, sum(lent) AS lent, sum(paid) AS paid, sum(outstanding) AS outstanding, sum(loans) AS loans
+        FROM ({contributions}) AS c (customer_id, lent, paid, outstanding, loans)
+        GROUP BY customer_id
+    ) AS d
+    WHERE s.customer_id = d.customer_id AND (d.lent <> 0 OR d.paid <> 0 OR d.outstanding <> 0 OR d.loans <> 0);
+
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_{operation}
+AFTER {operation} ON {table}
+REFERENCING {references}
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_{table}_{operation}();
+"""
+
+REGISTER_CUSTOMERS = """
+CREATE OR REPLACE FUNCTION customer_summary_customers_insert() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO customer_summary (customer_id) SELECT id FROM new_rows ON CONFLICT DO NOTHING;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER customer_summary_insert
+AFTER INSERT ON customers
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION customer_summary_customers_insert();
+"""
+
+# Customers without a summary, registered before the read model existed
+BACKFILL = """
+INSERT INTO customer_summary (customer_id, total_lent, total_paid, outstanding, active_loans)
+SELECT c.id, coalesce(t.lent, 0), coalesce(t.paid, 0), coalesce(t.outstanding, 0), coalesce(t.loans, 0)
+FROM customers c
+LEFT JOIN LATERAL (
+    SELECT sum(r.amount) AS lent, sum(LOAN_PAID) AS paid, sum(r.outstanding) AS outstanding, count(*) AS loans
+    FROM loans r
+    WHERE r.customer_id = c.id AND r.status
+) AS t ON true
+WHERE NOT EXISTS (SELECT 1 FROM customer_summary s WHERE s.customer_id = c.id)
+ON CONFLICT DO NOTHING;
+""".replace(
+    "LOAN_PAID", LOAN_PAID
+)
+
+
+def summary_triggers() -> str:
+    statements = [REGISTER_CUSTOMERS]
+
+    for table, contributions in CONTRIBUTIONS.items():
+        for operation, transition_tables in TRANSITION_TABLES.items():
+            references = " ".join(f"{name.split('_')[0].upper()} TABLE AS {name}" for name in transition_tables)
+            selected = [contributions[name] for name in transition_tables]
+
+            if operation == "update":
+                # Skip the rows whose update doesn't move the totals, such as a change of the terms of a loan
+                columns = CONTRIBUTING_COLUMNS[table]
+                changed = {
+                    name: CHANGED_ROWS.format(
+                        side=name[0],
+                        old=", ".join(f"o.{column}" for column in columns),
+                        new=", ".join(f"n.{column}" for column in columns),
+                    )
+                    for name in transition_tables
+                }
+                selected = [
+                    contributions[name].replace(f"FROM {name} r", f"FROM {changed[name]} r")
+                    for name in transition_tables
+                ]
+
+            statements.append(
+                APPLY_CONTRIBUTIONS.format(
+                    table=table,
+                    operation=operation,
+                    references=references,
+                    contributions=" UNION ALL ".join(selected),
+                )
+            )
+
+    return "\n".join(statements)
+
+
+# Runs after every create_all, the statements are idempotent
+event.listen(Base.metadata, "after_create", DDL(summary_triggers() + BACKFILL))
@@ -0,0 +1,3 @@
+# Names combined into the full names of the generated and benchmark customers, space separated for SQL string_to_array
+FIRST_NAMES = "Juan Maria Luis Ana Pedro Laura Carlos Sofia Daniel Elena Jorge Lucia Miguel Paula Diego Carmen"
+LAST_NAMES = "Perez Rodriguez Martinez Garcia Lopez Sanchez Gomez Diaz Martin Fernandez Torres Ramirez Flores Cruz"
@@ -0,0 +1,92 @@
+import time
+from typing import Optional
+
+from pydantic import BaseModel
+from sqlalchemy import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+class PoolMetrics(BaseModel):
+    checkouts: int = 0
+    waits: int = 0
+    wait_time: float = 0
+    max_wait_time: float = 0
+    timeouts: int = 0
+
+
+class PoolStatus(BaseModel):
+    pool: str
+    size: Optional[int] = None
+    checked_in: Optional[int] = None
+    checked_out: Optional[int] = None
+    overflow: Optional[int] = None
+    metrics: Optional[PoolMetrics] = None
+
+
+# Checkouts faster than this were served by an idle connection
+WAIT_THRESHOLD = 0.001
+
+
+class InstrumentedPoolMixin:
+    """Times every checkout of a queue pool, so the time spent waiting for a
+    free connection and the checkouts that timed out can be reported."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.metrics = PoolMetrics()
+
+    def _do_get(self):
+        started = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            self.metrics.timeouts += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self.metrics.checkouts += 1
+            self.metrics.wait_time += elapsed
+            self.metrics.max_wait_time = max(self.metrics.max_wait_time, elapsed)
+
+            if elapsed >= WAIT_THRESHOLD:
+                self.metrics.waits += 1
+
+
+class InstrumentedQueuePool(InstrumentedPoolMixin, QueuePool):
+    pass
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_status(engine: Engine) -> PoolStatus:
+    """The function `pool_status` reports the occupation of the connection pool
+    of an engine and the checkout metrics of the instrumented pools.
+
+    Parameters
+    ----------
+    engine : Engine
+        A sync engine, or the `sync_engine` of an async one.
+
+    Returns
+    -------
+        the status of the pool, the counters are `None` for pools without a
+    queue such as `NullPool`.
+    """
+
+    pool: Pool = engine.pool
+    status = PoolStatus(pool=type(pool).__name__)
+
+    if isinstance(pool, QueuePool):
+        status.size = pool.size()
+        status.checked_in = pool.checkedin()
+        status.checked_out = pool.checkedout()
+        status.overflow = pool.overflow()
+
+    if isinstance(pool, InstrumentedPoolMixin):
+        status.metrics = pool.metrics.model_copy()
+
+    return status
@@ -0,0 +1,109 @@
+import itertools
+import time
+from typing import Optional
+
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+
+from db.pool import PoolStatus, pool_status
+
+READ_PRIMARY_HEADER = "x-read-primary"
+READ_PRIMARY_COOKIE = "read_primary"
+
+
+class ReplicaStatus(BaseModel):
+    host: str
+    healthy: bool
+    ejected_for: float = 0
+    failures: int = 0
+    pool: PoolStatus
+
+
+class Replica:
+    def __init__(self, url: str, engine_options: dict) -> None:
+        self.url = make_url(url).set(drivername="postgresql+asyncpg")
+        self.engine: AsyncEngine = create_async_engine(self.url, **engine_options)
+        self.ejected_until = 0.0
+        self.failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return self.ejected_until <= time.monotonic()
+
+
+class ReplicaRouter:
+    """Spreads the read-only sessions over the replicas with a round-robin.
+
+    A replica that fails to hand out a connection is ejected for
+    `ejection_seconds`, the reads go to the next healthy one, or to the
+    primary when none is left."""
+
+    def __init__(self, urls: list[str], engine_options: dict, ejection_seconds: float) -> None:
+        self.replicas = [Replica(url, engine_options) for url in urls]
+        self.ejection_seconds = ejection_seconds
+        self.rotation = itertools.cycle(self.replicas)
+
+    def __bool__(self) -> bool:
+        return bool(self.replicas)
+
+    def candidates(self) -> list[Replica]:
+        # One full turn of the rotation, starting with the next replica
+        replicas = [next(self.rotation) for _ in self.replicas]
+        return [replica for replica in replicas if replica.healthy]
+
+    def eject(self, replica: Replica, error: Exception) -> None:
+        replica.failures += 1
+        replica.ejected_until = time.monotonic() + self.ejection_seconds
+        logger.warning(f"Replica {replica.url.host} ejected for {self.ejection_seconds}s: {error}")
+
+    async def session(self, sessionmaker: async_sessionmaker) -> Optional[AsyncSession]:
+        """The function `session` opens a session on the next healthy replica.
+
+        The connection is checked out right away, so an unreachable replica is
+        ejected before the request uses it.
+
+        Parameters
+        ----------
+        sessionmaker : async_sessionmaker
+            The factory of the sessions, bound to the primary by default.
+
+        Returns
+        -------
+            a session bound to a replica, `None` when every replica is ejected.
+        """
+
+        for replica in self.candidates():
+            db = sessionmaker(bind=replica.engine)
+
+            try:
+                await db.connection()
+            except (DBAPIError, PoolTimeoutError, OSError) as exc:
+                await db.close()
+                self.eject(replica, exc)
+            else:
+                return db
+
+        return None
+
+    def status(self) -> list[ReplicaStatus]:
+        now = time.monotonic()
+
+        return [
+            ReplicaStatus(
+                host=f"{replica.url.host}:{replica.url.port or 5432}/{replica.url.database}",
+                healthy=replica.healthy,
+                ejected_for=round(max(replica.ejected_until - now, 0), 3),
+                failures=replica.failures,
+                pool=pool_status(replica.engine.sync_engine),
+            )
+            for replica in self.replicas
+        ]
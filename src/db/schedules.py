@@ -0,0 +1,242 @@
+import time
+from collections.abc import Callable, Sequence
+from typing import Optional
+
+import numpy as np
+from loguru import logger
+from pydantic import BaseModel
+from sqlalchemy import (
+    BigInteger,
+    Connection,
+    Float,
+    Integer,
+    Select,
+    func,
+    select,
+    text,
+    update,
+)
+
+from core.cache import cache
+from core.utils.amortization import amortize, from_cents, to_cents
+from db.copy import copy_query, copy_rows
+from db.models import LoanORM, LoanScheduleORM
+from db.session import engine
+
+SCHEDULE_COLUMNS = ("loan_id", "installment", "total_interest", "total_tax", "total_payment")
+
+# Terms of the loans as the engine consumes them, the amounts in cents
+LOAN_TERMS = select(
+    LoanORM.id,
+    (LoanORM.amount * 100).cast(BigInteger).label("cents"),
+    LoanORM.rate.cast(Float).label("rate"),
+    LoanORM.term,
+    (LoanORM.method == "german").cast(Integer).label("german"),
+    LoanORM.tax_rate.cast(Float).label("tax_rate"),
+)
+
+# Loans without a schedule yet
+UNSCHEDULED = ~select(LoanScheduleORM.loan_id).where(LoanScheduleORM.loan_id == LoanORM.id).exists()
+
+TERMS_DTYPE = [
+    ("id", np.int64),
+    ("cents", np.int64),
+    ("rate", np.float64),
+    ("term", np.int64),
+    ("german", bool),
+    ("tax_rate", np.float64),
+]
+
+CREATE_BATCH_TABLE = """
+CREATE TEMPORARY TABLE loan_schedules_batch (
+    loan_id integer, installment bigint, total_interest bigint, total_tax bigint, total_payment bigint
+) ON COMMIT DROP
+"""
+
+# The totals travel in cents, the division by a numeric literal is exact. The unchanged rows aren't rewritten, a
+# recompute after a rate change only pays for the loans it affects
+UPSERT_BATCH = """
+INSERT INTO loan_schedules (loan_id, installment, total_interest, total_tax, total_payment, computed)
+SELECT loan_id, installment / 100.0, total_interest / 100.0, total_tax / 100.0, total_payment / 100.0, now()
+FROM loan_schedules_batch
+ON CONFLICT (loan_id) DO UPDATE SET
+    installment = excluded.installment,
+    total_interest = excluded.total_interest,
+    total_tax = excluded.total_tax,
+    total_payment = excluded.total_payment,
+    computed = excluded.computed
+WHERE (
+    loan_schedules.installment, loan_schedules.total_interest, loan_schedules.total_tax, loan_schedules.total_payment
+) IS DISTINCT FROM (excluded.installment, excluded.total_interest, excluded.total_tax, excluded.total_payment)
+"""
+
+
+class RecomputeReport(BaseModel):
+    loans: int = 0
+    chunks: int = 0
+    elapsed: float = 0
+    loans_per_second: float = 0
+
+
+def schedule_values(loans: Sequence) -> list[dict]:
+    """The function `schedule_values` computes the schedule totals of a few
+    loans, to be inserted along with them.
+
+    Parameters
+    ----------
+    loans : Sequence
+        Records with the `id`, `amount`, `rate`, `term`, `method` and
+    `tax_rate` of every loan.
+
+    Returns
+    -------
+        the values of the `loan_schedules` rows.
+    """
+
+    if not loans:
+        return []
+
+    result = amortize(
+        [to_cents(loan.amount) for loan in loans],
+        [float(loan.rate) for loan in loans],
+        [loan.term for loan in loans],
+        [loan.method == "german" for loan in loans],
+        [float(loan.tax_rate) for loan in loans],
+    )
+
+    return [
+        {
+            "loan_id": loan.id,
+            "installment": from_cents(result.installment[index]),
+            "total_interest": from_cents(result.total_interest[index]),
+            "total_tax": from_cents(result.total_tax[index]),
+            "total_payment": from_cents(result.total_payment[index]),
+        }
+        for index, loan in enumerate(loans)
+    ]
+
+
+def write_schedules(conn: Connection, query: Select) -> int:
+    """The function `write_schedules` computes the schedules of the loans
+    selected by a query and upserts them, in the transaction of the
+    connection. Called once per transaction, the batch table is dropped on
+    commit.
+
+    Parameters
+    ----------
+    conn : Connection
+        The connection, within a transaction.
+    query : Select
+        The `LOAN_TERMS` of the loans to compute.
+
+    Returns
+    -------
+        the amount of loans computed.
+    """
+
+    # Read with COPY straight into the arrays, fetching the rows costs twice as much
+    rows = copy_query(conn, query)
+
+    if not rows.getvalue():
+        return 0
+
+    terms = np.loadtxt(rows, dtype=TERMS_DTYPE, delimiter="\t", ndmin=1)
+
+    result = amortize(terms["cents"], terms["rate"], terms["term"], terms["german"], terms["tax_rate"])
+
+    conn.execute(text(CREATE_BATCH_TABLE))
+    copy_rows(
+        conn,
+        "loan_schedules_batch",
+        SCHEDULE_COLUMNS,
+        zip(
+            terms["id"].tolist(),
+            *(
+                values.astype(np.int64).tolist()
+                for values in (result.installment, result.total_interest, result.total_tax, result.total_payment)
+            ),
+            strict=True,
+        ),
+    )
+    conn.execute(text(UPSERT_BATCH))
+
+    return len(terms)
+
+
+def recompute_schedules(
+    *,
+    chunk_size: int = 100_000,
+    rate: Optional[float] = None,
+    missing: bool = False,
+    progress: Optional[Callable[[float], None]] = None,
+) -> RecomputeReport:
+    """The function `recompute_schedules` recomputes the schedule totals of the
+    whole portfolio. The terms are read in ranges of ids with COPY, computed
+    with the vectorized engine and written back with COPY and one upsert per
+    range.
+
+    Parameters
+    ----------
+    chunk_size : int
+        The width of the ranges of ids computed at once.
+    rate : float, optional
+        A new annual rate for the active loans, applied along with the
+    recompute of every range.
+    missing : bool
+        Whether to only compute the loans without a schedule, such as the
+    ones of a database upgraded from before the schedules.
+    progress : Callable, optional
+        Called with the share of the ids done after every range, an exception
+    it raises stops the recompute, the ranges done stay committed.
+
+    Returns
+    -------
+        the report of the recompute.
+    """
+
+    report = RecomputeReport()
+    started = time.perf_counter()
+
+    with engine.connect() as conn:
+        first, last = conn.execute(select(func.min(LoanORM.id), func.max(LoanORM.id))).one()
+
+    # Ranges of ids rather than pages, so the reads are index range scans whatever the gaps
+    for start in range(first or 0, (last or -1) + 1, chunk_size):
+        query = LOAN_TERMS.where(LoanORM.id >= start, LoanORM.id < start + chunk_size)
+
+        if missing:
+            query = query.where(UNSCHEDULED)
+
+        with engine.begin() as conn:
+            # The new rate and the schedules it leads to are committed together
+            if rate is not None:
+                conn.execute(
+                    update(LoanORM)
+                    .where(
+                        LoanORM.id >= start,
+                        LoanORM.id < start + chunk_size,
+                        LoanORM.status,
+                        LoanORM.rate.is_distinct_from(rate),
+                    )
+                    .values(rate=rate, modified=func.now())
+                )
+
+            loans = write_schedules(conn, query)
+
+        if not loans:
+            continue
+
+        # The balances and terms of the range are committed, drop their cached copies
+        cache.clear("loans")
+
+        report.loans += loans
+        report.chunks += 1
+        logger.info(f"{report.loans} loans recomputed")
+
+        if progress is not None:
+            progress(min((start + chunk_size - first) / (last - first + 1), 1))
+
+    report.elapsed = round(time.perf_counter() - started, 3)
+    report.loans_per_second = round(report.loans / report.elapsed, 1) if report.elapsed else 0
+
+    return report
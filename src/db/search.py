@@ -0,0 +1,105 @@
+from sqlalchemy import ColumnElement, Select, func, or_
+
+from db.models import CustomerORM
+
+# Columns covered by the pg_trgm GIN indexes of the customers table
+CUSTOMER_SEARCH_COLUMNS = (CustomerORM.full_name, CustomerORM.email)
+
+
+def escape_like(term: str) -> str:
+    """The function `escape_like` escapes the LIKE wildcards of a user term so
+    it's matched literally.
+
+    Parameters
+    ----------
+    term : str
+        The text received in the `filter` parameter.
+
+    Returns
+    -------
+        the term with `\\`, `%` and `_` escaped.
+    """
+
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_clause(term: str, *columns) -> ColumnElement:
+    """The function `search_clause` builds the substring predicate of a search.
+    An `ILIKE '%term%'` over a column with a `gin_trgm_ops` index is resolved
+    with a bitmap index scan instead of a sequential scan.
+
+    Parameters
+    ----------
+    term : str
+        The text to look for.
+    columns
+        The columns to search, any of them may match.
+
+    Returns
+    -------
+        the OR of the ILIKE predicates of every column.
+    """
+
+    pattern = f"%{escape_like(term)}%"
+    return or_(*[column.ilike(pattern, escape="\\") for column in columns])
+
+
+def search_rank(term: str, *columns) -> ColumnElement:
+    """The function `search_rank` computes the relevance of a record, the best
+    trigram similarity between the term and any of the columns.
+
+    Parameters
+    ----------
+    term : str
+        The text to look for.
+    columns
+        The columns to compare against the term.
+
+    Returns
+    -------
+        a float expression between 0 and 1, higher is more relevant.
+    """
+
+    return func.greatest(*[func.similarity(column, term) for column in columns])
+
+
+def apply_customer_search(query: Select, term: str) -> Select:
+    """The function `apply_customer_search` filters a statement joined with the
+    customers table by the customer's name or email.
+
+    Parameters
+    ----------
+    query : Select
+        A statement that selects from or joins `CustomerORM`.
+    term : str
+        The text to look for.
+
+    Returns
+    -------
+        the filtered statement.
+    """
+
+    return query.filter(search_clause(term, *CUSTOMER_SEARCH_COLUMNS))
+
+
+def order_by_relevance(query: Select, term: str, *tiebreakers) -> Select:
+    """The function `order_by_relevance` replaces the order of a customer search
+    with the relevance of every record, most relevant first.
+
+    Parameters
+    ----------
+    query : Select
+        A statement filtered with `apply_customer_search`.
+    term : str
+        The text looked for.
+    tiebreakers
+        Columns that keep the order stable between records with the same
+    relevance.
+
+    Returns
+    -------
+        the sorted statement.
+    """
+
+    rank = search_rank(term, *CUSTOMER_SEARCH_COLUMNS)
+    return query.order_by(None).order_by(rank.desc(), *tiebreakers)
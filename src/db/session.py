@@ -1,13 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
 from types import TracebackType
 
+from fastapi import Request
 from loguru import logger
-from sqlalchemy import Engine, create_engine
+from sqlalchemy import Engine, create_engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool
 
 from core.settings import settings
+from db.metrics import instrument_engine
+from db.pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+from db.replicas import READ_PRIMARY_COOKIE, READ_PRIMARY_HEADER, ReplicaRouter
 
 application_name = settings.PROJECT_NAME.replace(" ", "-").lower()
-engine = create_engine(settings.POSTGRESQL_URL.unicode_string(), connect_args={"application_name": application_name})
+
+
+def pool_options(poolclass: type) -> dict:
+    return {
+        "poolclass": poolclass,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+# Sync engine, used by schema management, data population (db.utils) and COPY imports
+engine = create_engine(
+    settings.POSTGRESQL_URL.unicode_string(),
+    connect_args={"application_name": application_name},
+    **pool_options(InstrumentedQueuePool),
+)
+
+# Async engine used by the API request path
+async_url = make_url(settings.POSTGRESQL_URL.unicode_string()).set(drivername="postgresql+asyncpg")
+async_engine_options = {
+    "connect_args": {"server_settings": {"application_name": application_name}},
+    **pool_options(InstrumentedAsyncAdaptedQueuePool),
+}
+
+if (settings.ENVIRONMENT or "").lower() == "testing":
+    # TestClient runs every request on its own event loop, pooled asyncpg connections can't be shared between them
+    async_engine_options = {
+        "connect_args": async_engine_options["connect_args"],
+        "poolclass": NullPool,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+async_engine = create_async_engine(async_url, **async_engine_options)
+
+# Read-only sessions, spread over the replicas when there are any
+replicas = ReplicaRouter(
+    [url.strip() for url in settings.POSTGRESQL_REPLICA_URLS.split(",") if url.strip()],
+    async_engine_options,
+    settings.REPLICA_EJECTION_SECONDS,
+)
+
+# Statement and pool metrics, labeled by engine
+instrument_engine("async", async_engine.sync_engine)
+instrument_engine("sync", engine)
+
+for index, replica in enumerate(replicas.replicas):
+    instrument_engine(f"replica-{index}", replica.engine.sync_engine)
 
 
 class DatabaseSessionManager:
@@ -44,12 +101,48 @@ def use_session() -> Session:
 
 
 DBSession = sessionmaker(bind=engine, autocommit=False)
+AsyncDBSession = async_sessionmaker(bind=async_engine, autocommit=False, expire_on_commit=False)
 
 
-def get_session():
-    db = DBSession()
+@asynccontextmanager
+async def session_scope(db: AsyncSession):
     try:
         yield db
     except Exception as ex:
-        db.rollback()
+        await db.rollback()
         logger.exception(ex.__str__())
+        raise
+    finally:
+        # A cancelled request must still hand its connection back to the pool
+        await asyncio.shield(db.close())
+
+
+async def get_session():
+    async with session_scope(AsyncDBSession()) as db:
+        yield db
+
+
+def reads_primary(request: Request) -> bool:
+    # Read-your-writes: set by the client, or by the cookie issued after a write
+    forced = request.headers.get(READ_PRIMARY_HEADER, "").lower() in ("1", "true")
+    return forced or READ_PRIMARY_COOKIE in request.cookies
+
+
+def bound_to_primary(db: AsyncSession) -> bool:
+    # Sessions on a replica may lag behind the primary, their rows must not be cached
+    return db.bind is async_engine
+
+
+async def open_read_session(*, primary: bool = False) -> AsyncSession:
+    if replicas and not primary:
+        db = await replicas.session(AsyncDBSession)
+
+        if db is not None:
+            return db
+
+    return AsyncDBSession()
+
+
+async def get_read_session(request: Request):
+    async with session_scope(await open_read_session(primary=reads_primary(request))) as db:
+        yield db
@@ -1,14 +1,19 @@
+from sqlalchemy.orm import sessionmaker
+
+from core.settings import settings
+from db.models import CustomerORM, LoanORM
 from db.models.base import Base
 from db.models.models import *  # noqa: F403
+from db.schedules import LOAN_TERMS, UNSCHEDULED, write_schedules
 from db.session import engine
 
-from db.models import CustomerORM, LoanORM
-from sqlalchemy.orm import sessionmaker
-
 
 def init_db():
-    Base.metadata.create_all(engine)
-    populate_db(engine)
+    if settings.DB_CREATE_SCHEMA:
+        Base.metadata.create_all(engine)
+
+    if settings.DB_SEED:
+        populate_db(engine)
 
 
 def drop_db():
@@ -88,4 +93,8 @@ def populate_db(conn):
         # Insert loans linked to customers in DB
         session.commit()
 
+        # Insert the schedules of the loans, their balances start at the total to pay
+        write_schedules(session.connection(), LOAN_TERMS.where(UNSCHEDULED))
+        session.commit()
+
     session.close()
@@ -1,34 +1,70 @@
+import json
+from collections.abc import Callable
 from contextlib import asynccontextmanager
+from pathlib import Path
 
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.openapi.utils import get_openapi
 from fastapi_pagination import add_pagination
 from loguru import logger
 
 from api import routers
+from core.jobs import runner
 from core.middlewares.catcher import CatcherExceptionMiddleware
+from core.middlewares.metrics import MetricsMiddleware
+from core.middlewares.read_your_writes import ReadYourWritesMiddleware
+from core.middlewares.server_timing import ServerTimingMiddleware
 from core.middlewares.trailing_slash import TrailingSlashMiddleware
 from core.settings import settings
 from core.utils.validations import validation_pydantic_field
+from db.session import replicas
 from db.utils import init_db
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):  # noqa: ARG001
     logger.success("Start app")
+    # Nothing to do in production, the schema comes from `python -m commands.migrate`
     init_db()
+
+    if settings.JOBS_ENABLED:
+        await runner.start()
+
     yield
 
+    # Running jobs are interrupted and queued again
+    await runner.stop()
+
+
+def prebuilt_openapi(application: FastAPI, path: Path) -> Callable[[], dict]:
+    def openapi() -> dict:
+        if application.openapi_schema is None:
+            if path.exists():
+                application.openapi_schema = json.loads(path.read_text())
+            else:
+                logger.warning(f"OpenAPI document {path} not found, building it")
+                FastAPI.openapi(application)
+
+        return application.openapi_schema
+
+    return openapi
+
 
 def create_application() -> FastAPI:
+    # The OpenAPI document is built on the first request of the docs, and cached
     application = FastAPI(
+        title=settings.PROJECT_NAME,
+        description=settings.DESCRIPTION,
+        version=settings.VERSION,
         lifespan=lifespan,
         docs_url="/docs",
         redoc_url="/redoc",
         swagger_ui_parameters={"syntaxHighlight.theme": "obsidian"},
         middleware=[
+            # Ahead of the catcher, so the errors it renders are counted with their status
+            Middleware(MetricsMiddleware),
+            Middleware(ServerTimingMiddleware),
             Middleware(CatcherExceptionMiddleware),
             Middleware(TrailingSlashMiddleware),
         ],
@@ -41,17 +77,19 @@ def create_application() -> FastAPI:
         allow_methods=["*"],
         allow_headers=["*"],
     )
+
+    if replicas:
+        # Reads following a write skip the replicas for a few seconds
+        application.add_middleware(ReadYourWritesMiddleware)
+
     application.include_router(routers.healthcheck_router)
+    application.include_router(routers.monitoring_router)
     application.include_router(routers.api_v1_router)
     add_pagination(application)
 
-    openapi_schema = get_openapi(
-        title=settings.PROJECT_NAME,
-        description=settings.DESCRIPTION,
-        version=settings.VERSION,
-        routes=application.routes,
-    )
-    application.openapi_schema = openapi_schema
+    if settings.OPENAPI_FILE:
+        # Built along with the image by `python -m commands.build_openapi`
+        application.openapi = prebuilt_openapi(application, Path(settings.OPENAPI_FILE))
 
     return application
 
@@ -0,0 +1,69 @@
+import unittest
+
+from sqlalchemy import func, insert, select, update
+
+from db.balances import reconcile_balances
+from db.models import CustomerORM, LoanORM, LoanScheduleORM
+from db.models.base import Base
+from db.schedules import recompute_schedules
+from db.session import engine
+from db.utils import populate_db
+
+
+class TestReconcileBalances(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        Base.metadata.create_all(engine)
+
+        # Fill DB with data
+        populate_db(engine)
+
+    def balance(self, loan_id: int) -> tuple:
+        with engine.connect() as conn:
+            return tuple(
+                conn.execute(select(LoanORM.paid_total, LoanORM.outstanding).where(LoanORM.id == loan_id)).one()
+            )
+
+    def test_reconcile(self):
+        self.assertEqual(reconcile_balances(workers=1, loans_per_task=3).drifted, 0)
+
+        with engine.begin() as conn:
+            loan_id = conn.scalar(select(func.max(LoanORM.id)))
+            expected = self.balance(loan_id)
+
+            # Written behind the back of the triggers
+            conn.execute(update(LoanORM).where(LoanORM.id == loan_id).values(paid_total=LoanORM.paid_total + 5))
+
+        report = reconcile_balances(workers=2, loans_per_task=3)
+
+        self.assertEqual((report.drifted, report.repaired), (1, 0))
+        self.assertNotEqual(self.balance(loan_id), expected)
+
+        report = reconcile_balances(repair=True, workers=1, loans_per_task=3)
+
+        self.assertEqual((report.drifted, report.repaired), (1, 1))
+        self.assertEqual(self.balance(loan_id), expected)
+        self.assertEqual(reconcile_balances(workers=1).drifted, 0)
+
+    def test_unscheduled(self):
+        # The seeded loans come with their schedules
+        self.assertEqual(reconcile_balances(workers=1).unscheduled, 0)
+
+        # Written behind the back of the write paths, without a schedule
+        with engine.begin() as conn:
+            customer_id = conn.scalar(select(func.min(CustomerORM.id)))
+            loan_id = conn.scalar(
+                insert(LoanORM).values(customer_id=customer_id, amount=100, status=True).returning(LoanORM.id)
+            )
+
+        report = reconcile_balances(workers=1, loans_per_task=3)
+
+        self.assertEqual((report.drifted, report.unscheduled), (0, 1))
+
+        recompute_schedules(missing=True)
+
+        with engine.connect() as conn:
+            total = conn.scalar(select(LoanScheduleORM.total_payment).where(LoanScheduleORM.loan_id == loan_id))
+
+        self.assertEqual(self.balance(loan_id), (0, total))
+        self.assertEqual(reconcile_balances(workers=1).unscheduled, 0)
@@ -0,0 +1,140 @@
+import unittest
+from datetime import UTC, date, datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from db.balances import DRIFTED_LOANS
+from db.factory import generate
+from db.models.base import Base
+from db.session import engine
+
+AS_OF = date(2026, 1, 31)
+
+# Every generated column but the timestamps of the schedules and the modified ones of the loans, set by the database
+FINGERPRINT = """
+SELECT md5(string_agg(row::text, ',' ORDER BY row::text))
+FROM (
+    SELECT c::text AS row FROM customers c WHERE c.id > :customer
+    UNION ALL SELECT (l.id, l.customer_id, l.amount, l.issued, l.status, l.rate, l.term, l.method, l.tax_rate,
+        l.paid_total, l.outstanding, l.created)::text
+    FROM loans l WHERE l.id > :loan
+    UNION ALL SELECT p::text FROM payments p WHERE p.id > :payment
+    UNION ALL SELECT (s.loan_id, s.installment, s.total_interest, s.total_tax, s.total_payment)::text
+    FROM loan_schedules s WHERE s.loan_id > :loan
+) AS rows
+"""
+
+# The summaries as the triggers compute them
+EXPECTED_SUMMARY = """
+SELECT count(*)
+FROM customer_summary s
+JOIN (
+    SELECT c.id, coalesce(sum(l.amount), 0) AS lent, coalesce(sum(p.paid), 0) AS paid,
+        coalesce(sum(l.outstanding), 0) AS outstanding, count(l.id) AS loans
+    FROM customers c
+    LEFT JOIN loans l ON l.customer_id = c.id AND l.status
+    LEFT JOIN (SELECT loan_id, sum(amount) AS paid FROM payments WHERE status GROUP BY loan_id) p ON p.loan_id = l.id
+    GROUP BY c.id
+) AS e ON e.id = s.customer_id
+WHERE (s.total_lent, s.total_paid, s.outstanding, s.active_loans)
+    IS DISTINCT FROM (e.lent, e.paid, e.outstanding, e.loans)
+"""
+
+
+@pytest.mark.factory(customers=2_000, seed=7, as_of=AS_OF, truncate=True)
+@pytest.mark.usefixtures("factory_data")
+class TestFactoryBulk(unittest.TestCase):
+    def test_counts(self):
+        counts = self.conn.execute(
+            text(
+                "SELECT (SELECT count(*) FROM customers), (SELECT count(*) FROM loans), (SELECT count(*) FROM payments)"
+            )
+        ).one()
+
+        self.assertTrue(self.report.bulk)
+        self.assertEqual(tuple(counts), (self.report.customers, self.report.loans, self.report.payments))
+        self.assertEqual(self.report.customers, 2_000)
+
+        # The identities continue after the generated ids
+        next_id = self.conn.scalar(text("SELECT nextval(pg_get_serial_sequence('loans', 'id'))"))
+        self.assertEqual(next_id, self.report.loans + 1)
+
+    def test_loans_per_customer(self):
+        loans = np.array(self.conn.scalars(text("SELECT count(*) FROM loans GROUP BY customer_id")).all())
+
+        # Zipf: most customers have a single loan, a few have many
+        self.assertEqual(len(loans), 2_000)
+        self.assertGreater(np.mean(loans == 1), 0.5)
+        self.assertGreaterEqual(loans.max(), 10)
+
+    def test_consistency(self):
+        orphans = self.conn.scalar(
+            text(
+                "SELECT count(*) FROM loans l WHERE NOT EXISTS (SELECT 1 FROM loan_schedules s WHERE s.loan_id = l.id)"
+            )
+        )
+        overpaid = self.conn.scalar(
+            text(
+                "SELECT count(*) FROM loans l JOIN loan_schedules s ON s.loan_id = l.id "
+                "WHERE (SELECT count(*) FROM payments p WHERE p.loan_id = l.id) > l.term "
+                "OR (SELECT coalesce(sum(p.amount), 0) FROM payments p WHERE p.loan_id = l.id) > s.total_payment"
+            )
+        )
+        late = self.conn.scalar(
+            text("SELECT count(*) FROM payments WHERE issued >= :day"),
+            {"day": datetime(2026, 2, 1, tzinfo=UTC)},
+        )
+
+        self.assertEqual((orphans, overpaid, late), (0, 0, 0))
+        self.assertEqual(self.conn.scalar(text(EXPECTED_SUMMARY)), 0)
+        self.assertEqual(self.conn.scalars(text(DRIFTED_LOANS.format(loans="true"))).all(), [])
+
+    def test_indexes_restored(self):
+        indexes = set(self.conn.scalars(text("SELECT indexname FROM pg_indexes WHERE tablename = 'payments'")).all())
+        triggers = self.conn.scalar(
+            text(
+                "SELECT count(*) FROM pg_trigger "
+                "WHERE tgrelid = 'payments'::regclass AND NOT tgisinternal AND tgenabled = 'O'"
+            )
+        )
+
+        self.assertTrue({"ix_payments_loan_id", "ix_payments_created_id", "ix_payments_id_modified"} <= indexes)
+        self.assertEqual(triggers, 6)
+
+
+class TestFactoryAppend(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        Base.metadata.create_all(engine)
+
+    def fingerprint(self, **options) -> str:
+        with engine.connect() as conn:
+            transaction = conn.begin()
+            offsets = conn.execute(
+                text(
+                    "SELECT (SELECT coalesce(max(id), 0) FROM customers), (SELECT coalesce(max(id), 0) FROM loans), "
+                    "(SELECT coalesce(max(id), 0) FROM payments)"
+                )
+            ).one()
+
+            # Appended to the existing records, the triggers keep the summaries and the balances
+            report = generate(conn=conn, **options)
+            self.assertEqual(conn.scalar(text(EXPECTED_SUMMARY)), 0)
+            self.assertEqual(
+                conn.scalars(text(DRIFTED_LOANS.format(loans="l.id > :loan")), {"loan": offsets[1]}).all(), []
+            )
+
+            fingerprint = conn.scalar(
+                text(FINGERPRINT), {"customer": offsets[0], "loan": offsets[1], "payment": offsets[2]}
+            )
+            transaction.rollback()
+
+        return report.payments, fingerprint
+
+    def test_deterministic(self):
+        first = self.fingerprint(customers=300, seed=3, as_of=AS_OF)
+
+        self.assertEqual(first, self.fingerprint(customers=300, seed=3, as_of=AS_OF))
+        self.assertNotEqual(first, self.fingerprint(customers=300, seed=4, as_of=AS_OF))
@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+
+from sqlalchemy import text
+from sqlalchemy.pool import NullPool
+from starlette.requests import Request
+
+from core.settings import settings
+from db.replicas import ReplicaRouter
+from db.session import AsyncDBSession, reads_primary
+
+# Point POSTGRESQL_REPLICA_URLS to a second instance to run against a real replica
+REPLICA_URLS = [url for url in settings.POSTGRESQL_REPLICA_URLS.split(",") if url] or [
+    settings.POSTGRESQL_URL.unicode_string()
+]
+UNREACHABLE_URL = "postgresql://postgres@127.0.0.1:1/unreachable"
+
+
+def request(headers: dict) -> Request:
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+class TestReplicaRouter(unittest.TestCase):
+    def test_round_robin_ejection(self):
+        router = ReplicaRouter([UNREACHABLE_URL, *REPLICA_URLS], {"poolclass": NullPool}, ejection_seconds=60)
+
+        async def read() -> str:
+            db = await router.session(AsyncDBSession)
+
+            async with db:
+                return (await db.execute(text("SELECT current_setting('port')"))).scalar()
+
+        async def run() -> list[str]:
+            return [await read() for _ in range(len(router.replicas) * 2)]
+
+        ports = asyncio.run(run())
+        status = router.status()
+
+        self.assertEqual(len(ports), len(router.replicas) * 2)
+        self.assertFalse(status[0].healthy)
+        self.assertEqual(status[0].failures, 1)
+        self.assertTrue(all(replica.healthy for replica in status[1:]))
+
+    def test_every_replica_ejected(self):
+        router = ReplicaRouter([UNREACHABLE_URL], {"poolclass": NullPool}, ejection_seconds=60)
+
+        self.assertIsNone(asyncio.run(router.session(AsyncDBSession)))
+        self.assertEqual(router.candidates(), [])
+
+    def test_reads_primary(self):
+        self.assertFalse(reads_primary(request({})))
+        self.assertTrue(reads_primary(request({"X-Read-Primary": "true"})))
+        self.assertTrue(reads_primary(request({"Cookie": "read_primary=1"})))
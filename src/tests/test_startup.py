@@ -0,0 +1,139 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, inspect, text
+
+from db.migrations import available, migrate, status
+from db.models.base import Base
+from db.session import engine
+from main import create_application, prebuilt_openapi
+
+
+class TestMigrations(unittest.TestCase):
+    def test_migrate(self):
+        migrate()
+
+        self.assertTrue(all(migration.applied for migration in status()))
+        self.assertEqual(
+            [migration.version for migration in status()], [migration.version for migration in available()]
+        )
+        self.assertTrue(
+            {"customers", "loans", "payments", "schema_migrations"} <= set(inspect(engine).get_table_names())
+        )
+
+        # Nothing left to apply
+        self.assertEqual(migrate(), [])
+
+
+class TestUpgrade(unittest.TestCase):
+    """Upgrades a database built with the schema before the migrations."""
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        Base.metadata.create_all(engine)
+
+        cls.database = f"{engine.url.database}_upgrade"
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"DROP DATABASE IF EXISTS {cls.database} WITH (FORCE)")
+            conn.exec_driver_sql(f"CREATE DATABASE {cls.database}")
+
+        cls.engine = create_engine(engine.url.set(database=cls.database))
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.engine.dispose()
+
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.exec_driver_sql(f"DROP DATABASE IF EXISTS {cls.database} WITH (FORCE)")
+
+    def test_upgrade(self):
+        self.assertEqual([migration.version for migration in migrate(1, bind=self.engine)], [1])
+
+        with self.engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO customers (full_name, email, status) VALUES ('Ada Lovelace', 'ada@example.com', true);"
+                    "INSERT INTO loans (customer_id, amount, issued, status) "
+                    "VALUES (1, 1000, '2024-01-15 10:30', true);"
+                    "INSERT INTO payments (loan_id, amount, issued, status) VALUES (1, 250, '2024-02-15 10:30', true);"
+                )
+            )
+
+        migrate(bind=self.engine)
+
+        self.assertTrue(all(migration.applied for migration in status(self.engine)))
+
+        # Same columns, types and nullability as the models
+        upgraded, created = inspect(self.engine), inspect(engine)
+
+        def columns(inspector, table: str) -> dict:
+            return {
+                column["name"]: (str(column["type"]), column["nullable"]) for column in inspector.get_columns(table)
+            }
+
+        for table in Base.metadata.sorted_tables:
+            self.assertEqual(
+                columns(upgraded, table.name),
+                columns(created, table.name),
+                table.name,
+            )
+            self.assertEqual(
+                {index["name"] for index in upgraded.get_indexes(table.name)},
+                {index["name"] for index in created.get_indexes(table.name)},
+                table.name,
+            )
+
+        # The existing rows are kept, with the defaults of the new columns and backfilled read models
+        with self.engine.connect() as conn:
+            self.assertEqual(
+                conn.execute(text("SELECT term, method, paid_total FROM loans WHERE id = 1")).one(), (12, "french", 250)
+            )
+            self.assertEqual(
+                conn.execute(
+                    text("SELECT total_lent, total_paid, outstanding, active_loans FROM customer_summary")
+                ).one(),
+                (1000, 250, 750, 1),
+            )
+            self.assertEqual(
+                conn.scalar(text("SELECT to_char(issued, 'YYYY-MM-DD HH24:MI') FROM payments WHERE id = 1")),
+                "2024-02-15 10:30",
+            )
+            # Written without a creation date before the upgrade
+            self.assertEqual(conn.scalar(text("SELECT count(*) FROM payments WHERE created IS NULL")), 0)
+
+        self.assertEqual(migrate(bind=self.engine), [])
+
+
+class TestOpenAPI(unittest.TestCase):
+    def test_lazy(self):
+        application = create_application()
+
+        self.assertIsNone(application.openapi_schema)
+
+        response = TestClient(application).get("/openapi.json")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("/v1/loans/list", response.json()["paths"])
+        self.assertIsNotNone(application.openapi_schema)
+
+    def test_prebuilt(self):
+        application = create_application()
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / "openapi.json"
+            path.write_text(json.dumps({"openapi": "3.1.0", "info": {"title": "Prebuilt"}, "paths": {}}))
+            application.openapi = prebuilt_openapi(application, path)
+
+            response = TestClient(application).get("/openapi.json")
+
+        self.assertEqual(response.json()["info"]["title"], "Prebuilt")
+
+        # A missing document is built from the routes
+        application = create_application()
+        application.openapi = prebuilt_openapi(application, Path("missing.json"))
+
+        self.assertIn("/v1/loans/list", application.openapi()["paths"])